@@ -0,0 +1,202 @@
+from typing import Any, Dict, Hashable, Optional, Tuple, Mapping
+from collections import OrderedDict
+import glob
+import hashlib
+import json
+import numbers
+import os
+import sys
+import numpy as np
+import torch
+from hearth.containers import TensorDict
+from hearth._file_utils import dtype_name, load_json, mkdirs_if_not_exist, save_json, tensor_bytes
+
+MISSING = object()
+_ALIGNMENT = 64
+_CONFIG_FILE = 'cache.json'
+# bump when the on disk format or key encoding changes so old caches are invalidated.
+_FORMAT_VERSION = 2
+
+
+def nbytes(obj: Any) -> int:
+    """approximate size in bytes of tensors, arrays and containers of them."""
+    if isinstance(obj, torch.Tensor):
+        return obj.element_size() * obj.nelement()
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, Mapping):
+        return sum(nbytes(v) for v in obj.values())
+    if isinstance(obj, (tuple, list)):
+        return sum(nbytes(v) for v in obj)
+    return sys.getsizeof(obj)
+
+
+class MemoryCache:
+    """a least recently used cache bounded by the total size in bytes of its values."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._data: 'OrderedDict[Hashable, Tuple[Any, int]]' = OrderedDict()
+
+    def get(self, key: Hashable) -> Any:
+        found = self._data.get(key, MISSING)
+        if found is MISSING:
+            return MISSING
+        self._data.move_to_end(key)
+        return found[0]  # type: ignore
+
+    def put(self, key: Hashable, value: Any):
+        size = nbytes(value)
+        if size > self.max_bytes:
+            return
+        if key in self._data:
+            self.size -= self._data.pop(key)[1]
+        self._data[key] = (value, size)
+        self.size += size
+        while self.size > self.max_bytes:
+            _, (_, evicted_size) = self._data.popitem(last=False)
+            self.size -= evicted_size
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def encode_key(key: Hashable) -> str:
+    """a typed string encoding of a key so that, for instance, ``0`` and ``'0'`` differ.
+
+    integers of any type (such as numpy integers) encode the same as python ints.
+    """
+    if isinstance(key, tuple):
+        return '(' + ', '.join(map(encode_key, key)) + ',)'
+    if isinstance(key, numbers.Integral) and not isinstance(key, bool):
+        return repr(int(key))
+    return repr(key)
+
+
+def config_hash(config: str) -> str:
+    return hashlib.sha256(config.encode('utf-8')).hexdigest()
+
+
+class DiskCache:
+    """an append only on disk cache for tensors and TensorDicts that persists across runs.
+
+    each process appends raw tensor bytes to its own shard (``<pid>.bin``) and a json line per
+    entry to ``<pid>.idx`` so DataLoader workers can share a directory without locking. values
+    are read back as views of memory mapped shards. on a miss the index files are read again
+    from where they were last read, so entries written by other processes (such as the workers
+    of an earlier epoch) are found and never written twice.
+
+    ``config`` describes whatever produced the cached values (such as the repr of a transform),
+    its hash is kept in the directory and all entries are removed when it changes.
+    """
+
+    def __init__(self, path: str, config: str = ''):
+        self.path = path
+        mkdirs_if_not_exist(path)
+        self._check_config(config)
+        self._index: Dict[str, Tuple[str, Dict]] = {}
+        # how many bytes of each shard's index have been read.
+        self._offsets: Dict[str, int] = {}
+        self._maps: Dict[str, torch.Tensor] = {}
+        self._writer: Optional[Tuple[int, Any, Any]] = None
+        self._refresh()
+
+    def _refresh(self):
+        """index the entries appended to any shard since it was last read."""
+        for idx_path in sorted(glob.glob(os.path.join(self.path, '*.idx'))):
+            shard = os.path.splitext(os.path.basename(idx_path))[0]
+            offset = self._offsets.get(shard, 0)
+            if os.path.getsize(idx_path) == offset:
+                continue
+            with open(idx_path, 'rb') as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        # still being written by another process.
+                        break
+                    entry = json.loads(line)
+                    self._index[entry['key']] = (shard, entry)
+                    offset += len(line)
+            self._offsets[shard] = offset
+
+    def _check_config(self, config: str):
+        expected = {'version': _FORMAT_VERSION, 'config': config_hash(config)}
+        config_path = os.path.join(self.path, _CONFIG_FILE)
+        if os.path.exists(config_path) and load_json(config_path) == expected:
+            return
+        for pattern in ('*.bin', '*.idx'):
+            for stale in glob.glob(os.path.join(self.path, pattern)):
+                os.remove(stale)
+        save_json(expected, config_path)
+
+    def _mapped(self, shard: str, end: int) -> torch.Tensor:
+        mapped = self._maps.get(shard)
+        if mapped is None or len(mapped) < end:
+            data_path = os.path.join(self.path, f'{shard}.bin')
+            size = os.path.getsize(data_path)
+            if not size:
+                return torch.empty(0, dtype=torch.uint8)
+            mapped = torch.from_file(data_path, shared=False, size=size, dtype=torch.uint8)
+            self._maps[shard] = mapped
+        return mapped
+
+    def get(self, key: Hashable) -> Any:
+        encoded = encode_key(key)
+        if encoded not in self._index:
+            self._refresh()
+        found = self._index.get(encoded)
+        if found is None:
+            return MISSING
+        shard, entry = found
+        mapped = self._mapped(shard, entry['end'])
+        fields = {}
+        for name, spec in entry['fields'].items():
+            dtype = getattr(torch, spec['dtype'])
+            data = mapped.narrow(0, spec['offset'], spec['nbytes'])
+            fields[name] = data.view(dtype).view(spec['shape'])
+        if entry['type'] == 'tensor':
+            return fields['']
+        return TensorDict(fields)
+
+    def _get_writer(self):
+        pid = os.getpid()
+        if self._writer is None or self._writer[0] != pid:
+            data = open(os.path.join(self.path, f'{pid}.bin'), 'ab')
+            idx = open(os.path.join(self.path, f'{pid}.idx'), 'a')
+            self._writer = (pid, data, idx)
+        return self._writer
+
+    def put(self, key: Hashable, value: Any) -> bool:
+        """write value to the cache, returns ``False`` if the value is not supported."""
+        if isinstance(value, TensorDict):
+            kind, tensors = 'tensordict', dict(value)
+        elif isinstance(value, torch.Tensor):
+            kind, tensors = 'tensor', {'': value}
+        else:
+            return False
+        if encode_key(key) in self._index:
+            return True
+        pid, data, idx = self._get_writer()
+        fields = {}
+        for name, tensor in tensors.items():
+            tensor = tensor.detach().cpu().contiguous()
+            data.write(b'\0' * (-data.tell() % _ALIGNMENT))
+            fields[name] = {
+                'offset': data.tell(),
+                'nbytes': tensor.element_size() * tensor.nelement(),
+                'dtype': dtype_name(tensor.dtype),
+                'shape': list(tensor.shape),
+            }
+            if tensor.nelement():
+                data.write(tensor_bytes(tensor))
+        entry = {'key': encode_key(key), 'type': kind, 'end': data.tell(), 'fields': fields}
+        # data is flushed before the index so entries never point at partial writes.
+        data.flush()
+        idx.write(json.dumps(entry) + '\n')
+        idx.flush()
+        self._index[entry['key']] = (str(pid), entry)
+        return True
+
+    def __len__(self) -> int:
+        return len(self._index)
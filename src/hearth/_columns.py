@@ -0,0 +1,144 @@
+from typing import Any, Dict, Iterator, List, Mapping, Sequence, Tuple
+from collections import abc
+import numbers
+import threading
+import numpy as np
+
+_MIN_CAPACITY = 16
+
+
+def flatten(row: Mapping, prefix: str = '') -> Iterator[Tuple[str, Any]]:
+    """yield dotted keys and values of the leaves of nested mappings."""
+    for key, value in row.items():
+        if isinstance(value, (dict, abc.Mapping)):
+            yield from flatten(value, prefix=f'{prefix}{key}.')
+        else:
+            yield f'{prefix}{key}', value
+
+
+_DTYPES = {
+    bool: np.dtype(bool),
+    int: np.dtype(np.int64),
+    float: np.dtype(np.float64),
+    str: np.dtype(object),
+    type(None): np.dtype(object),
+}
+_FLOAT = _DTYPES[float]
+_OBJECT = _DTYPES[str]
+
+
+def _dtype(value: Any) -> np.dtype:
+    dtype = _DTYPES.get(type(value))
+    if dtype is not None:
+        return dtype
+    if isinstance(value, (bool, np.bool_)):
+        return _DTYPES[bool]
+    if isinstance(value, numbers.Integral):
+        return _DTYPES[int]
+    if isinstance(value, numbers.Real):
+        return _FLOAT
+    return _OBJECT
+
+
+def _promote(a: np.dtype, b: np.dtype) -> np.dtype:
+    if a is b or a == b:
+        return a
+    if a == _OBJECT or b == _OBJECT:
+        return _OBJECT
+    return np.result_type(a, b)
+
+
+class Column:
+    """a growable typed array of values.
+
+    the dtype is that of the first value and is promoted as needed, missing values are nan in
+    numeric columns (promoting integer and bool columns to float) and None otherwise.
+    """
+
+    def __init__(self, dtype: np.dtype):
+        self._data = np.empty(_MIN_CAPACITY, dtype=dtype)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self._data.dtype
+
+    def _next(self, dtype: np.dtype) -> int:
+        if dtype != self._data.dtype:
+            self._data = self._data.astype(dtype)
+        if self._size == len(self._data):
+            grown = np.empty(2 * len(self._data), dtype=self._data.dtype)
+            grown[: self._size] = self._data
+            self._data = grown
+        self._size += 1
+        return self._size - 1
+
+    def append(self, value: Any):
+        # _next may replace the array so it must be called before indexing it.
+        i = self._next(_promote(self.dtype, _dtype(value)))
+        self._data[i] = value
+
+    def append_missing(self):
+        if self.dtype == _OBJECT:
+            i = self._next(self.dtype)
+            self._data[i] = None
+        else:
+            i = self._next(_promote(self.dtype, _FLOAT))
+            self._data[i] = np.nan
+
+    def values(self) -> np.ndarray:
+        """a read only view of the values."""
+        values = self._data[: self._size]
+        values.flags.writeable = False
+        return values
+
+
+class Columns:
+    """columns of the flattened values of a growing sequence of nested rows.
+
+    rows are added with :meth:`update` which only reads rows it hasn't seen, so rows must not
+    change once added.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self._columns: Dict[str, Column] = {}
+        self._lock = threading.Lock()
+
+    def keys(self) -> List[str]:
+        return list(self._columns)
+
+    def _add(self, row: Mapping):
+        values = dict(flatten(row))
+        for key, column in self._columns.items():
+            if key not in values:
+                column.append_missing()
+        for key, value in values.items():
+            column = self._columns.get(key)
+            if column is None:
+                column = self._columns[key] = Column(_dtype(value))
+                for _ in range(self.rows):
+                    column.append_missing()
+            column.append(value)
+        self.rows += 1
+
+    def update(self, rows: Sequence[Mapping]):
+        """add any rows after the ones already added."""
+        with self._lock:
+            for i in range(self.rows, len(rows)):
+                self._add(rows[i])
+
+    def __getitem__(self, key: str) -> np.ndarray:
+        return self._columns[key].values()
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
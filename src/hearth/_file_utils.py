@@ -1,10 +1,57 @@
+from typing import BinaryIO, Iterator
+from contextlib import contextmanager
 import json
+import os
 import pathlib
+import threading
+import torch
+
+
+@contextmanager
+def atomic_path(path: str) -> Iterator[str]:
+    """yields a temporary path in the same directory as ``path`` which is renamed to ``path`` on
+    success, so readers never see a partially written file."""
+    directory, name = os.path.split(os.path.abspath(path))
+    tmp_path = os.path.join(directory, f'.{name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def dtype_name(dtype: torch.dtype) -> str:
+    """the name of ``dtype`` such as ``'float32'``, ``getattr(torch, name)`` gives it back."""
+    return str(dtype).replace('torch.', '')
+
+
+def tensor_bytes(tensor: torch.Tensor) -> memoryview:
+    """the raw bytes of ``tensor`` as a contiguous cpu tensor.
+
+    for a contiguous cpu tensor this is a view of its memory, so it can also be read into.
+    """
+    tensor = tensor.detach().cpu().contiguous().reshape(-1)
+    return memoryview(tensor.view(torch.uint8).numpy())
+
+
+def read_exactly(f: BinaryIO, buffer: memoryview, path: str):
+    """fill ``buffer`` from the file ``f`` read from ``path``, raising an EOFError if the file
+    ends first."""
+    filled = 0
+    while filled < len(buffer):
+        n = f.readinto(buffer[filled:])
+        if not n:
+            raise EOFError(
+                f'{path} is truncated, only {filled} of {len(buffer)} bytes could be read.'
+            )
+        filled += n
 
 
 def save_json(obj, path: str):
-    with open(path, 'w') as f:
-        json.dump(obj, f)
+    with atomic_path(path) as tmp_path:
+        with open(tmp_path, 'w') as f:
+            json.dump(obj, f)
 
 
 def load_json(path: str):
@@ -13,6 +60,11 @@ def load_json(path: str):
     return obj
 
 
+def save_torch(obj, path: str):
+    with atomic_path(path) as tmp_path:
+        torch.save(obj, tmp_path)
+
+
 def mkdirs_if_not_exist(path, verbose: bool = False):
     path = pathlib.Path(path)
     if not path.exists():
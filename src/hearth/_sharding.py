@@ -0,0 +1,68 @@
+from typing import Optional, Tuple, Iterable, Iterator, TypeVar
+from itertools import chain, cycle, islice
+import torch
+from torch.utils.data import get_worker_info
+
+T = TypeVar('T')
+
+
+def _sharding_seed(num_replicas: int, seed: Optional[int]) -> Optional[int]:
+    """every replica must agree on the shuffled order so sharding defaults to a seed of 0."""
+    if seed is None and num_replicas > 1:
+        return 0
+    return seed
+
+
+class ShardingMixin:
+    """shared sharding and seeding logic for samplers and iterable datasets."""
+
+    def _init_sharding(self, num_replicas: Optional[int], rank: Optional[int], seed: Optional[int]):
+        num_replicas = 1 if num_replicas is None else num_replicas
+        rank = 0 if rank is None else rank
+        if not 0 <= rank < num_replicas:
+            raise ValueError(f'rank must be in [0, {num_replicas}) but got {rank}.')
+        self.num_replicas = num_replicas
+        self.rank = rank
+        self.seed = _sharding_seed(num_replicas, seed)
+        self.epoch = 0
+
+    def set_epoch(self, epoch: int):
+        """set the epoch used to seed the next iteration.
+
+        the epoch is advanced automatically on each iteration so this is only needed when
+        resuming or to keep samplers in separate processes in lockstep.
+        """
+        self.epoch = epoch
+
+    def _get_shard(self) -> Tuple[int, int]:
+        """get the total number of shards and the index of the shard for this process/worker."""
+        worker = get_worker_info()
+        if worker is None:
+            return self.num_replicas, self.rank
+        return self.num_replicas * worker.num_workers, self.rank * worker.num_workers + worker.id
+
+    def _next_generator(self) -> Optional[torch.Generator]:
+        if self.seed is None:
+            return None
+        generator = torch.Generator()
+        generator.manual_seed(self.seed + self.epoch)
+        self.epoch += 1
+        return generator
+
+    def _shard(self, items: Iterable[T], n: int) -> Iterator[T]:
+        """split ``n`` items round robin over replicas.
+
+        like :class:`torch.utils.data.DistributedSampler` the items are padded by repeating
+        items from the start so that every replica gets exactly :meth:`_shard_len` items, a
+        replica getting fewer batches than the others would stall distributed training.
+        """
+        if self.num_replicas == 1:
+            return iter(items)
+        items = iter(items)
+        pad = self._shard_len(n) * self.num_replicas - n
+        head = list(islice(items, pad))
+        padded = chain(head, items, islice(cycle(head), pad))
+        return islice(padded, self.rank, None, self.num_replicas)
+
+    def _shard_len(self, n: int) -> int:
+        return -(-n // self.num_replicas)
@@ -14,6 +14,7 @@ from .learning_rate import (
     CosineAnnealingLRCallback,
     ReduceLROnPlateauCallback,
 )
+from .profiling import TransformProfiler
 
 __all__ = [
     'Callback',
@@ -32,4 +33,5 @@ __all__ = [
     'ExponentialLRCallback',
     'CosineAnnealingLRCallback',
     'ReduceLROnPlateauCallback',
+    'TransformProfiler',
 ]
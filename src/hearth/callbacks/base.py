@@ -37,6 +37,10 @@ class Callback:
         """This will be called on when each epoch ends."""
         pass
 
+    def on_loop_end(self, loop):
+        """This will be called once when the loop returns, after the last epoch ends."""
+        pass
+
     def on_batch_start(self, loop):
         """this will be called before the batch is passed to the model on each stage"""
         pass
@@ -119,6 +123,10 @@ class CallbackManager(Callback):
         for callback in self:
             callback.on_epoch_end(loop)
 
+    def on_loop_end(self, loop):
+        for callback in self:
+            callback.on_loop_end(loop)
+
     def on_batch_start(self, loop):
         for callback in self:
             callback.on_batch_start(loop)
@@ -1,13 +1,185 @@
-from typing import Sequence, Type, Optional, Callable
+from typing import Any, Dict, Iterator, List, Mapping, Sequence, Tuple, Type, Optional, Callable
 import os
+import shutil
+from itertools import chain
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
+from functools import partial
 from copy import deepcopy
 import torch
+from torch import nn
 from hearth.events import MonitoringEvent
 from hearth.callbacks import Callback
 from hearth.events import Improvement, CheckpointSaved
 from hearth.modules import BaseModule
-from hearth._file_utils import mkdirs_if_not_exist
+from hearth.modules.base import _save_state
+from hearth.optimizers import compact_optimizer_state, save_optimizer_state
+from hearth.store import CheckpointStore
+from hearth._file_utils import atomic_path, load_json, mkdirs_if_not_exist, save_json
+
+_STALE_FILES = ('state.pt', 'state.tensors', 'optimizer_state.pt')
+
+
+class _StagingBuffer:
+    """cpu tensors that snapshots of tensors in nested containers are copied into.
+
+    buffers are kept by their position in the container and reused by later snapshots when shape
+    and dtype match, so repeated snapshots of the same state don't allocate.
+    """
+
+    def __init__(self):
+        self._buffers: Dict[Tuple, torch.Tensor] = {}
+
+    def _stage(self, tensor: torch.Tensor, path: Tuple) -> torch.Tensor:
+        buffer = self._buffers.get(path)
+        if buffer is None or buffer.shape != tensor.shape or buffer.dtype != tensor.dtype:
+            # pinned buffers let copies from the gpu run asynchronously.
+            buffer = torch.empty(tensor.shape, dtype=tensor.dtype, pin_memory=tensor.is_cuda)
+            self._buffers[path] = buffer
+        return buffer.copy_(tensor.detach(), non_blocking=tensor.is_cuda)
+
+    def _snapshot(self, obj: Any, path: Tuple) -> Any:
+        if isinstance(obj, torch.Tensor):
+            return self._stage(obj, path)
+        if isinstance(obj, Mapping):
+            out = type(obj)((k, self._snapshot(v, path + (k,))) for k, v in obj.items())
+            if hasattr(obj, '_metadata'):
+                # state dicts carry module versions used when loading.
+                out._metadata = obj._metadata  # type: ignore
+            return out
+        if isinstance(obj, (tuple, list)):
+            return type(obj)(self._snapshot(v, path + (i,)) for i, v in enumerate(obj))
+        return deepcopy(obj)
+
+    def snapshot(self, obj: Any, name: str) -> Any:
+        """copy all tensors in ``obj`` to staging buffers."""
+        out = self._snapshot(obj, (name,))
+        if torch.cuda.is_available():
+            torch.cuda.synchronize()
+        return out
+
+
+def _tensors(model: nn.Module) -> Iterator[torch.Tensor]:
+    for module in model.modules():
+        for tensor in chain(module._parameters.values(), module._buffers.values()):
+            if tensor is not None:
+                yield tensor
+
+
+def _clone_with(model: nn.Module, replace: Callable[[torch.Tensor], torch.Tensor]) -> nn.Module:
+    """copy the module structure of ``model`` with each parameter and buffer replaced."""
+    memo = {id(tensor): replace(tensor) for tensor in _tensors(model)}
+    return deepcopy(model, memo)
+
+
+def _share(source: torch.Tensor, like: torch.Tensor) -> torch.Tensor:
+    # a new tensor object on the same storage, so requires_grad changes don't leak back.
+    if isinstance(like, nn.Parameter):
+        return nn.Parameter(source.detach(), requires_grad=like.requires_grad)
+    return source.detach()
+
+
+def _copy(tensor: torch.Tensor) -> torch.Tensor:
+    if isinstance(tensor, nn.Parameter):
+        return nn.Parameter(tensor.detach().clone(), requires_grad=tensor.requires_grad)
+    return tensor.clone()
+
+
+def _meta(tensor: torch.Tensor) -> torch.Tensor:
+    return _share(torch.empty_like(tensor, device='meta'), tensor)
+
+
+def _changed(meta: torch.Tensor, source: torch.Tensor, version: int) -> bool:
+    # in place ops bump the version, conversions like half() replace the data of the meta tensor.
+    return (
+        meta._version != version
+        or not meta.is_meta
+        or meta.dtype != source.dtype
+        or meta.shape != source.shape
+    )
+
+
+def _materialize(model: nn.Module, sources: Dict[int, torch.Tensor]) -> bool:
+    """replace meta tensors in ``model`` with shares of their ``sources`` in place.
+
+    returns ``False`` if ``model`` has meta tensors without a source.
+    """
+    for module in model.modules():
+        for tensors in (module._parameters, module._buffers):
+            for name, tensor in tensors.items():
+                if tensor is None or not tensor.is_meta:
+                    continue
+                if id(tensor) not in sources:
+                    return False
+                tensors[name] = _share(sources[id(tensor)], tensor)
+    return True
+
+
+def _ranked(values: Dict[int, Optional[float]], lower_is_better: bool) -> List[int]:
+    """versions ordered from best to worst, newer versions first between equal values and
+    versions without a value last."""
+    sign = 1 if lower_is_better else -1
+
+    def key(version: int) -> Tuple[bool, float, int]:
+        value = values[version]
+        return (value is None, 0.0 if value is None else sign * value, -version)
+
+    return sorted(values, key=key)
+
+
+def _link(source: str, path: str):
+    with atomic_path(path) as tmp_path:
+        try:
+            os.link(source, tmp_path)
+        except OSError:
+            # file systems without hard links.
+            shutil.copy2(source, tmp_path)
+
+
+class _VersionedDirectories:
+    """numbered checkpoint directories in ``root`` each with the value they are ranked by.
+
+    directories are written under a temporary name and renamed once complete and are renamed
+    again before being removed, so a directory with a version number is always complete.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, version: int) -> str:
+        return os.path.join(self.root, f'{version:06d}')
+
+    def values(self) -> Dict[int, Optional[float]]:
+        if not os.path.isdir(self.root):
+            return {}
+        names = [name for name in os.listdir(self.root) if name.isdigit()]
+        return {
+            int(name): load_json(os.path.join(self.root, name, 'checkpoint.json'))['value']
+            for name in names
+        }
+
+    def add(self, write: Callable[[str], None], value: float) -> int:
+        """create a new version by calling ``write`` with its directory."""
+        version = max(self.values(), default=-1) + 1
+        tmp_path = os.path.join(self.root, f'.{version:06d}.tmp')
+        if os.path.exists(tmp_path):
+            # left by a crash while saving.
+            shutil.rmtree(tmp_path)
+        mkdirs_if_not_exist(tmp_path)
+        write(tmp_path)
+        save_json({'version': version, 'value': value}, os.path.join(tmp_path, 'checkpoint.json'))
+        os.rename(tmp_path, self.path(version))
+        return version
+
+    def remove(self, version: int):
+        pruned_path = os.path.join(self.root, f'.{version:06d}.pruned')
+        os.rename(self.path(version), pruned_path)
+        shutil.rmtree(pruned_path)
+
+    def link(self, version: int, directory: str):
+        """hard link the files of ``version`` into ``directory``."""
+        for name in os.listdir(self.path(version)):
+            _link(os.path.join(self.path(version), name), os.path.join(directory, name))
 
 
 @dataclass
@@ -25,19 +197,66 @@ class Checkpoint(Callback):
         prepare_model: Optional callable which accepts and returns
              a :class:`BaseModule` for preparing the model to be saved.
              This function will always recieve a **copy** of the model on the loop just for
-             safety. Defaults to None.
+             safety, see ``share_tensors``. Defaults to None.
         field: If provided only save on events where field matches this field.
         stage: If provided only save on events where stage matches this stage.
         save_history: if True save the loop history at this step to the model dir. Defaults to True
         save_optimizer: if True save the optimizer state dict to the model dir. Defaults to True.
+        asynchronous: if True model, history and optimizer state are snapshotted to cpu staging
+            buffers (reused between saves) and written by a background thread so the loop
+            isn't blocked. :class:`hearth.events.CheckpointSaved` is emitted once the write
+            completes, use :meth:`wait` to block until then. the loop waits for the last write
+            before it returns and errors from the writer are raised in the loop.
+            Defaults to False.
+        incremental: if True model and optimizer state are saved as new versions in a
+            :class:`hearth.store.CheckpointStore` in ``model_dir/store`` instead of
+            ``state.pt`` and ``optimizer_state.pt``, so only tensors that changed since the last
+            checkpoint are written and every checkpoint is kept.
+            :meth:`hearth.modules.BaseModule.load` loads the latest model from ``model_dir``
+            and the optimizer state is in ``checkpoint.store.load()['optimizer']``.
+            Defaults to False.
+        keep_top_k: if given keep the ``keep_top_k`` best checkpoints ranked by the ``best``
+            value of the events that triggered them rather than only the last. each checkpoint
+            is saved to a new numbered directory in ``model_dir/checkpoints`` and the files of
+            the best one are hard linked into ``model_dir``, so it can still be loaded from
+            there. lower values are better unless the event's ``improvement_on`` is ``'gt'``
+            (see :class:`hearth.callbacks.ImprovementMonitor`). with ``incremental`` versions of
+            the store are kept instead.
+            Defaults to None.
+        history_format: format the history is saved in, see
+            :meth:`hearth.callbacks.History.save`. ``'jsonl'`` only appends rows added since the
+            last checkpoint, with ``keep_top_k`` it is appended to in ``model_dir`` rather than
+            saved with each numbered checkpoint. Defaults to ``'json'``.
+        history_fsync: how often to make sure ``'jsonl'`` history rows are on disk, see
+            :meth:`hearth.callbacks.History.save`. Defaults to None.
+        optimizer_dtype: optional floating point dtype such as ``torch.bfloat16`` to save
+            per parameter optimizer state (such as adam's moments) in. use
+            :func:`hearth.optimizers.load_optimizer_state` to load it with its original dtypes.
+            Defaults to None.
+        optimizer_compression: optionally compress the saved optimizer state with ``'zlib'`` or
+            ``'lzma'`` in a worker thread, see :func:`hearth.optimizers.save_optimizer_state`.
+            not supported with ``incremental``. Defaults to None.
+        share_tensors: if True ``prepare_model`` recieves a copy of the model in which only the
+            tensors it modifies are copied, the others share memory with the model on the loop.
+            to find them it is first run on a meta device copy, so it may be called twice per
+            save and must be deterministic. modifications through ``tensor.data`` are not
+            detected and must not be used. Defaults to False.
+
+    Note:
+        files are always written atomically, a crash while saving leaves the previous checkpoint
+        intact.
 
     **Active On:**
         - registration
         - event
+        - batch_end (if asynchronous)
+        - epoch_start (if asynchronous)
         - epoch_end
+        - loop_end (if asynchronous)
 
     **Events Listened For:**
         - :class:`hearth.events.Improvement` (default)
+        - any event with a ``best`` value (if keep_top_k is given)
 
     **Events Emitted:**
         - :class:`hearth.events.ModelSaved`
@@ -59,9 +278,28 @@ class Checkpoint(Callback):
     stage: Optional[str] = None
     save_history: bool = True
     save_optimizer: bool = True
+    asynchronous: bool = False
+    incremental: bool = False
+    keep_top_k: Optional[int] = None
+    history_format: str = 'json'
+    history_fsync: Optional[float] = None
+    optimizer_dtype: Optional[torch.dtype] = None
+    optimizer_compression: Optional[str] = None
+    share_tensors: bool = False
 
     def __post_init__(self):
+        if self.incremental and self.optimizer_compression is not None:
+            raise ValueError('optimizer_compression is not supported with incremental checkpoints.')
+        if self.keep_top_k is not None and self.keep_top_k < 1:
+            raise ValueError(f'keep_top_k must be at least 1 but got {self.keep_top_k}.')
         self._should_save = False
+        self._value: Optional[float] = None
+        self._lower_is_better = True
+        self._versions = _VersionedDirectories(os.path.join(self.model_dir, 'checkpoints'))
+        self._store: Optional[CheckpointStore] = None
+        self._staging = _StagingBuffer()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending: Optional[Future] = None
 
     def on_registration(self, loop):
         # check model
@@ -86,33 +324,199 @@ class Checkpoint(Callback):
             return True
         return False
 
-    def _save_model(self, model):
-        save_model = deepcopy(model)
-        if self.prepare_model is not None:
-            save_model = self.prepare_model(save_model)
-        save_model.save(self.model_dir)
+    def _prepared_model(self, model):
+        if self.prepare_model is None:
+            return model
+        if not self.share_tensors:
+            return self.prepare_model(deepcopy(model))
+        # run prepare_model on a meta device clone first to find the tensors it touches.
+        clones = []
+
+        def to_meta(tensor):
+            meta = _meta(tensor)
+            clones.append((meta, tensor, meta._version))
+            return meta
+
+        try:
+            prepared = self.prepare_model(_clone_with(model, to_meta))
+        except (NotImplementedError, RuntimeError):
+            # prepare_model needs actual values (for instance moving devices), copy everything.
+            touched = {id(source) for _, source, _ in clones}
+        else:
+            touched = {
+                id(source) for meta, source, version in clones if _changed(meta, source, version)
+            }
+            if not touched and _materialize(prepared, {id(meta): src for meta, src, _ in clones}):
+                return prepared
+        # otherwise run it again on a clone where only touched tensors are copied.
+        return self.prepare_model(
+            _clone_with(model, lambda t: _copy(t) if id(t) in touched else _share(t, t))
+        )
+
+    def _save_model(self, model, directory: Optional[str] = None):
+        self._prepared_model(model).save(directory or self.model_dir)
+
+    def _save_history(self, history, directory: Optional[str] = None):
+        if self.keep_top_k is not None and self.history_format == 'jsonl':
+            # numbered checkpoints are new directories, appending needs the same file each time.
+            directory = None
+        history.save(
+            directory or self.model_dir, format=self.history_format, fsync=self.history_fsync
+        )
+
+    def _save_optimizer_state(self, state_dict, directory: str):
+        save_optimizer_state(
+            state_dict,
+            os.path.join(directory, 'optimizer_state.pt'),
+            dtype=self.optimizer_dtype,
+            compression=self.optimizer_compression,
+        )
+
+    def _save_optimizer(self, optimizer, directory: Optional[str] = None):
+        self._save_optimizer_state(optimizer.state_dict(), directory or self.model_dir)
 
-    def _save_history(self, history):
-        history.save(self.model_dir)
+    def _save_files(self, loop, directory: str):
+        self._save_model(loop.model, directory)
+        if self.save_optimizer:
+            self._save_optimizer(loop.optimizer, directory)
+        if self.save_history:
+            self._save_history(loop.history, directory)
+
+    def _write_files(self, snapshot: Dict[str, Any], directory: str):
+        # like BaseModule.save this removes state saved in other formats which would be loaded.
+        _save_state(snapshot['state'], directory, 'torch')
+        save_json(snapshot['config'], os.path.join(directory, 'config.json'))
+        if 'optimizer' in snapshot:
+            self._save_optimizer_state(snapshot['optimizer'], directory)
+        if 'history' in snapshot:
+            self._save_history(snapshot['history'], directory)
 
-    def _save_optimizer(self, optimizer):
-        path = os.path.join(self.model_dir, 'optimizer_state.pt')
-        torch.save(optimizer.state_dict(), path)
+    def _save_version(self, write: Callable[[str], None], value: Optional[float]):
+        if self.keep_top_k is None:
+            write(self.model_dir)
+            return
+        self._versions.add(write, value)  # type: ignore
+        ranked = _ranked(self._versions.values(), self._lower_is_better)
+        k = self.keep_top_k
+        for version in ranked[k:]:
+            self._versions.remove(version)
+        self._versions.link(ranked[0], self.model_dir)
+
+    @property
+    def store(self) -> CheckpointStore:
+        """the store incremental checkpoints are saved in."""
+        if self._store is None:
+            self._store = CheckpointStore(os.path.join(self.model_dir, 'store'))
+        return self._store
+
+    def _save_to_store(self, state, optimizer_state, config, value: Optional[float] = None):
+        items = {'state': state}
+        if optimizer_state is not None and self.optimizer_dtype is not None:
+            optimizer_state = compact_optimizer_state(optimizer_state, self.optimizer_dtype)
+        if optimizer_state is not None:
+            items['optimizer'] = optimizer_state
+        if self.keep_top_k is None:
+            self.store.save(items)
+        else:
+            self.store.save(items, value=value)
+            values = {v: self.store.manifest(v)['meta'].get('value') for v in self.store.versions()}
+            k = self.keep_top_k
+            for version in _ranked(values, self._lower_is_better)[k:]:
+                self.store.remove(version)
+        save_json(config, os.path.join(self.model_dir, 'config.json'))
+        # state files from earlier non incremental saves would be loaded instead of the store.
+        for name in _STALE_FILES:
+            if os.path.exists(os.path.join(self.model_dir, name)):
+                os.remove(os.path.join(self.model_dir, name))
 
     def save_checkpoint(self, loop):
-        self._save_model(loop.model)
+        if self.incremental:
+            model = self._prepared_model(loop.model)
+            optimizer_state = loop.optimizer.state_dict() if self.save_optimizer else None
+            self._save_to_store(model.state_dict(), optimizer_state, model.config(), self._value)
+            if self.save_history:
+                self._save_history(loop.history)
+        else:
+            self._save_version(partial(self._save_files, loop), self._value)
+
+    def _snapshot(self, loop) -> Dict[str, Any]:
+        model = self._prepared_model(loop.model)
+        snapshot = {
+            'state': self._staging.snapshot(model.state_dict(), 'state'),
+            'config': model.config(),
+            'value': self._value,
+        }
         if self.save_history:
-            self._save_history(loop.history)
+            snapshot['history'] = loop.history.copy()
         if self.save_optimizer:
-            self._save_optimizer(loop.optimizer)
+            snapshot['optimizer'] = self._staging.snapshot(loop.optimizer.state_dict(), 'optim')
+        return snapshot
+
+    def _write(self, snapshot: Dict[str, Any]):
+        if self.incremental:
+            self._save_to_store(
+                snapshot['state'], snapshot.get('optimizer'), snapshot['config'], snapshot['value']
+            )
+            if 'history' in snapshot:
+                self._save_history(snapshot['history'])
+        else:
+            self._save_version(partial(self._write_files, snapshot), snapshot['value'])
+
+    def save_checkpoint_async(self, loop):
+        """snapshot a checkpoint and write it in a background thread."""
+        # the staging buffers are reused so the last write must finish first.
+        self.wait(loop)
+        snapshot = self._snapshot(loop)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1)
+        self._pending = self._executor.submit(self._write, snapshot)
+
+    def _fire_if_done(self, loop, block: bool = False):
+        if self._pending is not None and (block or self._pending.done()):
+            pending, self._pending = self._pending, None
+            # raises any error from the writer thread.
+            pending.result()
+            loop.fire(CheckpointSaved(self.model_dir))
+
+    def wait(self, loop):
+        """block until a pending asynchronous checkpoint has been written."""
+        self._fire_if_done(loop, block=True)
+
+    def on_batch_end(self, loop):
+        self._fire_if_done(loop)
+
+    def on_epoch_start(self, loop):
+        self._fire_if_done(loop)
+
+    def on_loop_end(self, loop):
+        # the last asynchronous checkpoint must be written before the loop returns.
+        try:
+            self.wait(loop)
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
 
     def on_epoch_end(self, loop):
+        self._fire_if_done(loop)
         if self._should_save:
-            self.save_checkpoint(loop)
-            event = CheckpointSaved(self.model_dir)
-            loop.fire(event)
+            if self.asynchronous:
+                self.save_checkpoint_async(loop)
+            else:
+                self.save_checkpoint(loop)
+                loop.fire(CheckpointSaved(self.model_dir))
             self._should_save = False
 
+    def _ranking_value(self, event) -> float:
+        if not hasattr(event, 'best'):
+            raise TypeError(
+                f'keep_top_k requires events with a best value but got {event.__class__.__name__}.'
+            )
+        self._lower_is_better = getattr(event, 'improvement_on', 'lt') == 'lt'
+        return event.best
+
     def on_event(self, loop, event):
         if self._is_save_event(event):
             self._should_save = True
+            if self.keep_top_k is not None:
+                self._value = self._ranking_value(event)
@@ -1,10 +1,73 @@
+import sys
+
+if sys.version_info < (3, 8):
+    from typing_extensions import Literal
+else:
+    from typing import Literal
 import os
-from typing import Dict
+from typing import Dict, Iterator, List, Optional, Sequence
 from pprint import pformat
+import json
+import time
+import numpy as np
 from collectionish import AttyDict
 from collections import deque
 from hearth.callbacks import Callback
-from hearth._file_utils import load_json, save_json
+from hearth._columns import Columns
+from hearth._file_utils import atomic_path, load_json, save_json
+
+_FILES = {'json': 'history.json', 'jsonl': 'history.jsonl'}
+
+
+class _RowLog:
+    """an append only file with a json row per line that remembers how much of it was written
+    so later writes only append new rows."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.rows = 0
+        self.size = 0
+        self.synced_at = -float('inf')
+
+    def read(self) -> Iterator[Dict]:
+        """yield complete rows, a partly written last row is ignored."""
+        self.rows, self.size = 0, 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                yield json.loads(line)
+                self.rows += 1
+                self.size += len(line)
+
+    def _can_append(self, rows: Sequence) -> bool:
+        # anything else writing the file (or a partly written row) means it must be rewritten.
+        return (
+            self.rows <= len(rows)
+            and os.path.exists(self.path)
+            and os.path.getsize(self.path) == self.size
+        )
+
+    def _sync(self, f, fsync: Optional[float]):
+        if fsync is not None and time.monotonic() - self.synced_at >= fsync:
+            f.flush()
+            os.fsync(f.fileno())
+            self.synced_at = time.monotonic()
+
+    def write(self, rows: Sequence, fsync: Optional[float] = None):
+        start = self.rows if self._can_append(rows) else 0
+        lines = ''.join(json.dumps(rows[i]) + '\n' for i in range(start, len(rows)))
+        if start:
+            with open(self.path, 'a') as f:
+                f.write(lines)
+                self._sync(f, fsync)
+        else:
+            with atomic_path(self.path) as tmp_path:
+                with open(tmp_path, 'w') as f:
+                    f.write(lines)
+                    self._sync(f, fsync)
+        self.rows = len(rows)
+        self.size = os.path.getsize(self.path)
 
 
 class History(Callback):
@@ -29,14 +92,26 @@ class History(Callback):
 
     @classmethod
     def load(cls, model_dir) -> 'History':
-        """load this history object from the model_dir"""
-        path = os.path.join(model_dir, 'history.json')
-        hist = load_json(path)
-        return cls(*hist)
+        """load this history object from the model_dir.
+
+        history.jsonl is read a row at a time if it exists, otherwise history.json is read.
+        """
+        path = os.path.abspath(os.path.join(model_dir, _FILES['jsonl']))
+        if not os.path.exists(path):
+            hist = load_json(os.path.join(model_dir, _FILES['json']))
+            return cls(*hist)
+        history = cls()
+        log = _RowLog(path)
+        history._history.extend(AttyDict(row) for row in log.read())
+        # saving back to the same file appends to it.
+        history._logs[path] = log
+        return history
 
     def __init__(self, *history):
         self._history = [AttyDict(row) for row in history]
         self._current_step_buffer = deque(maxlen=1)
+        self._logs: Dict[str, _RowLog] = {}
+        self._columns = Columns()
 
     @property
     def current_step(self):
@@ -69,10 +144,101 @@ class History(Callback):
     def __getitem__(self, i):
         return self._history[i]
 
-    def save(self, model_dir: str):
-        """save this history to a file history.json in ``model_dir```."""
-        path = os.path.join(model_dir, 'history.json')
-        save_json(self._history, path)
+    @property
+    def columns(self) -> List[str]:
+        """the dotted names of all columns, see :meth:`column`."""
+        self._columns.update(self._history)
+        return self._columns.keys()
+
+    def column(self, key: str) -> np.ndarray:
+        """a read only array of the values of the dotted ``key`` in every row of the history.
+
+        columns are kept as numpy arrays which are updated with new rows when read, so reading
+        a column doesn't walk the rows. missing values are nan for numeric columns and None for
+        other columns.
+
+        Example:
+            >>> from hearth.callbacks import History
+            >>>
+            >>> history = History(
+            ...     {'epoch': 0, 'val': {'loss': 0.5}},
+            ...     {'epoch': 1, 'val': {'loss': 0.3}},
+            ...     {'epoch': 2},
+            ...     {'epoch': 3, 'val': {'loss': 0.4}},
+            ... )
+            >>> history.column('val.loss')
+            array([0.5, 0.3, nan, 0.4])
+            >>> history.argbest('val.loss')
+            1
+            >>> history.rolling_mean('val.loss', 2)
+            array([0.5, 0.4, 0.3, 0.4])
+        """
+        self._columns.update(self._history)
+        return self._columns[key]
+
+    def argbest(self, key: str, mode: Literal['min', 'max'] = 'min') -> int:
+        """index of the row with the best value of ``key``, ignoring missing values.
+
+        Args:
+            key: dotted name of the column.
+            mode: if lower (``'min'``) or higher (``'max'``) values are better.
+                Defaults to ``'min'``.
+        """
+        if mode not in ('min', 'max'):
+            raise ValueError(f'mode must be one of ["min", "max"] but got {mode}')
+        values = self.column(key).astype(np.float64)
+        if np.isnan(values).all():
+            raise ValueError(f'no values for {key} in {self.__class__.__name__}.')
+        return int(np.nanargmin(values) if mode == 'min' else np.nanargmax(values))
+
+    def rolling_mean(self, key: str, window: int) -> np.ndarray:
+        """mean of the values of ``key`` over each row and the ``window - 1`` rows before it.
+
+        missing values are ignored and the first rows are averaged over fewer values.
+        """
+        values = self.column(key).astype(np.float64)
+        present = ~np.isnan(values)
+        sums = np.concatenate([[0.0], np.cumsum(np.where(present, values, 0.0))])
+        counts = np.concatenate([[0], np.cumsum(present)])
+        end = np.arange(1, len(values) + 1)
+        start = np.maximum(end - window, 0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return (sums[end] - sums[start]) / (counts[end] - counts[start])
+
+    def copy(self) -> 'History':
+        """a copy of the complete history.
+
+        rows are shared rather than copied since they don't change once complete, and saving the
+        copy as ``'jsonl'`` appends to files saved by this history.
+        """
+        history = self.__class__()
+        history._history = list(self._history)
+        history._logs = self._logs
+        return history
+
+    def save(self, model_dir: str, format: str = 'json', fsync: Optional[float] = None):
+        """save this history to a file in ``model_dir```.
+
+        Args:
+            model_dir: directory to save in.
+            format: ``'json'`` rewrites history.json with all rows on every save. ``'jsonl'``
+                writes history.jsonl with a row per line and only appends the rows added since
+                the last save of this history to the same file. Defaults to ``'json'``.
+            fsync: how often to make sure ``'jsonl'`` rows are on disk with :func:`os.fsync`.
+                None leaves it to the os, 0 syncs on every save and otherwise syncs at most
+                once every ``fsync`` seconds. Defaults to None.
+        """
+        if format not in _FILES:
+            raise ValueError(f'format must be one of {list(_FILES)} but got {format!r}.')
+        path = os.path.abspath(os.path.join(model_dir, _FILES[format]))
+        if format == 'json':
+            save_json(self._history, path)
+        else:
+            self._logs.setdefault(path, _RowLog(path)).write(self._history, fsync=fsync)
+        # history saved in the other format would be stale.
+        for name in set(_FILES.values()) - {_FILES[format]}:
+            if os.path.exists(os.path.join(model_dir, name)):
+                os.remove(os.path.join(model_dir, name))
 
     def _iter_pformat_args(self):
         if not self._history:
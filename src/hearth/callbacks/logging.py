@@ -5,20 +5,28 @@ from hearth.events import Event
 
 DEFAULT_BATCH_FMT = (
     'epoch: {loop.epoch} stage: [{loop.stage}]'
-    ' batch: {loop.batches_seen}/{loop.n_batches}'
+    ' batch: {progress}'
     ' loss: {loop.loss:0.4f}'
 )
 
 DEFAULT_METRIC_FMT = " {loop.metric:0.4f}"
 
 
+def _progress(loop) -> str:
+    # the total is left out for streaming batches with no known length.
+    if loop.n_batches is None:
+        return f'{loop.batches_seen}'
+    return f'{loop.batches_seen}/{loop.n_batches}'
+
+
 @dataclass
 class PrintLogger(Callback):
     """a very simple logging callback that just prints stuff to sdout.
 
     Args:
         batch_format: format string which will printed (single line) for each batch
-            and will passed a single argument ``loop``. Defaults to \
+            and will be passed ``loop`` and ``progress``, the batches seen so far and their
+            total when it is known (``'3/10'`` or just ``'3'``). Defaults to \
             `hearth.callbacks.logging.DEFAULT_BATCH_FMT`.
         epoch_delim: single char delimiter that will be used to seperate epochs. Defaults to ``-``.
         epoch_delim_width: width of epoch delimiter. Defaults to 80.
@@ -73,7 +81,7 @@ class PrintLogger(Callback):
             self.batch_format = self.batch_format + self.metric_format
 
     def get_batch_msg(self, loop) -> str:
-        return self.batch_format.format(loop=loop)
+        return self.batch_format.format(loop=loop, progress=_progress(loop))
 
     def on_epoch_end(self, loop):
         print(self.epoch_delim * self.epoch_delim_width)
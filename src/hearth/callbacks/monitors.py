@@ -74,12 +74,17 @@ class ImprovementMonitor(Callback):
                     steps=steps,
                     best=this_value,
                     last_best=self._last_best,
+                    improvement_on=self.improvement_on,
                 )
                 self._best_step = loop.epoch
                 self._last_best = this_value
             elif steps > self.stagnant_after:
                 event = Stagnation(
-                    field=self.field, stage=self.stage, steps=steps, best=self._last_best
+                    field=self.field,
+                    stage=self.stage,
+                    steps=steps,
+                    best=self._last_best,
+                    improvement_on=self.improvement_on,
                 )
             if event:
                 loop.fire(event)
@@ -0,0 +1,52 @@
+from dataclasses import dataclass
+from hearth.callbacks import Callback
+from hearth.transforms import Pipeline
+
+
+@dataclass
+class TransformProfiler(Callback):
+    """records the time spent in each transform of a :class:`hearth.transforms.Pipeline` \
+    during each stage to history.
+
+    the pipeline is instrumented with :meth:`hearth.transforms.Pipeline.instrument` on
+    registration if it isn't already, counts from ``DataLoader`` workers are included. stats
+    are stored under ``transforms`` for each stage in the current step of the history.
+
+    Note:
+        workers prefetch batches so counts around the boundary of stages may be attributed
+        to the neighbouring stage.
+
+    Args:
+        pipeline: the pipeline to profile.
+
+    **Active On:**
+        - registration
+        - stage_start
+        - stage_end
+
+    **Accesses Loop Attributes:**
+        - history
+        - stage
+
+    Example:
+        >>> from hearth.transforms import Pipeline, Tensorize, Normalize
+        >>> from hearth.callbacks import TransformProfiler
+        >>>
+        >>> pipeline = Pipeline(Tensorize(dtype='float32'), Normalize(mean=1.0, std=2.0))
+        >>> TransformProfiler(pipeline)
+        TransformProfiler(pipeline=Pipeline(Tensorize(dtype=torch.float32, device=None, copy=True),\
+ Normalize(mean=1.0, std=2.0)))
+    """
+
+    pipeline: Pipeline
+
+    def on_registration(self, loop):
+        if self.pipeline.stats is None:
+            self.pipeline.instrument()
+
+    def on_stage_start(self, loop):
+        self.pipeline.stats.reset()  # type: ignore
+
+    def on_stage_end(self, loop):
+        stats = self.pipeline.stats.summary()  # type: ignore
+        loop.history.current_step[loop.stage]['transforms'] = stats
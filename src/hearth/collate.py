@@ -0,0 +1,168 @@
+"""collate functions for use with \
+`torch.utils.data.DataLoader\
+ <https://pytorch.org/docs/stable/data.html#torch.utils.data.DataLoader>`_
+"""
+from typing import Any, Mapping, Optional, Sequence, Tuple, Union
+from dataclasses import dataclass
+import numpy as np
+import torch
+from torch.utils.data import get_worker_info
+from torch.utils.data.dataloader import default_collate
+
+Number = Union[int, float, bool]
+
+
+def _padded_shape(tensors: Sequence[torch.Tensor]) -> Tuple[int, ...]:
+    shape = list(tensors[0].shape)
+    for tensor in tensors[1:]:
+        if tensor.dim() != len(shape):
+            raise ValueError(
+                f'can only pad tensors with the same number of dimensions but got {len(shape)}'
+                f' and {tensor.dim()}.'
+            )
+        shape = [max(a, b) for a, b in zip(shape, tensor.shape)]
+    return tuple(shape)
+
+
+def pad_tensors(
+    tensors: Sequence[torch.Tensor], pad_value: Number = -1, shared_memory: bool = False
+) -> torch.Tensor:
+    """pad and stack tensors directly into a single preallocated tensor.
+
+    every dimension is padded to the largest size in ``tensors`` and each tensor is copied
+    exactly once into its slot of the output, there are no intermediate padded tensors.
+
+    Args:
+        tensors: tensors with the same number of dimensions, dtype and device.
+        pad_value: value to fill padding with. Defaults to -1.
+        shared_memory: if ``True`` the output is allocated in shared memory, which saves a copy
+            when collating inside ``DataLoader`` workers. Defaults to False.
+
+    Example:
+        >>> import torch
+        >>> from hearth.collate import pad_tensors
+        >>>
+        >>> pad_tensors([torch.tensor([1, 2, 3]), torch.tensor([4])])
+        tensor([[ 1,  2,  3],
+                [ 4, -1, -1]])
+    """
+    elem = tensors[0]
+    shape = _padded_shape(tensors)
+    out = torch.empty((len(tensors), *shape), dtype=elem.dtype, device=elem.device)
+    if shared_memory:
+        out.share_memory_()
+    if all(tensor.shape == shape for tensor in tensors):
+        return torch.stack(tuple(tensors), out=out)
+    out.fill_(pad_value)
+    for slot, tensor in zip(out, tensors):
+        slot[tuple(slice(0, size) for size in tensor.shape)].copy_(tensor)
+    return out
+
+
+def _is_structure(value) -> bool:
+    return isinstance(value, (Mapping, Sequence)) and not isinstance(value, str)
+
+
+def _fields(elem) -> Optional[list]:
+    if isinstance(elem, Mapping):
+        return list(elem)
+    if isinstance(elem, (tuple, list)):
+        return list(range(len(elem)))
+    return None
+
+
+def _check_pad_value(pad_value, elem, field: str = 'sample'):
+    """raise a ValueError naming the first field of ``elem`` that ``pad_value`` doesn't match."""
+    if not _is_structure(pad_value):
+        return
+    keys = _fields(elem)
+    if keys is None or isinstance(pad_value, Mapping) != isinstance(elem, Mapping):
+        raise ValueError(f'pad_value {pad_value!r} does not match the structure of {field}.')
+    if isinstance(elem, Mapping):
+        unmatched = set(keys).symmetric_difference(pad_value)
+    else:
+        unmatched = set(keys).symmetric_difference(range(len(pad_value)))
+    if unmatched:
+        raise ValueError(
+            f'pad_value {pad_value!r} does not match the fields {keys} of {field}, unmatched'
+            f' fields: {sorted(unmatched, key=repr)}.'
+        )
+    for key in keys:
+        _check_pad_value(pad_value[key], elem[key], f'{field}[{key!r}]')
+
+
+def _select_pad_value(pad_value, key):
+    if _is_structure(pad_value):
+        return pad_value[key]
+    return pad_value
+
+
+@dataclass
+class PadCollate:
+    """a collate function that pads variable length tensors with a mask value.
+
+    samples may be tensors, arrays, :class:`hearth.containers.TensorDict` or other mappings,
+    tuples or lists of these (for instance ``(x, y)`` pairs from
+    :class:`hearth.datasets.XYDataset`).
+    each tensor field is padded with :func:`pad_tensors` into a single preallocated tensor.
+    the default pad value of ``-1`` matches the default ``mask_target`` of hearth metrics and
+    ``mask_target_value`` of hearth losses, so padded targets are ignored.
+
+    Args:
+        pad_value: value to pad with, either a single number or a structure matching the samples
+            (a tuple for tuple samples or a dict for mapping samples) with a pad value for
+            each field. Defaults to -1.
+        shared_memory: allocate outputs in shared memory. Defaults to None which allocates in
+            shared memory only when called inside a ``DataLoader`` worker.
+
+    Example:
+        >>> import torch
+        >>> from hearth.collate import PadCollate
+        >>> from hearth.containers import TensorDict
+        >>>
+        >>> batch = [(TensorDict(tokens=torch.tensor([5, 3, 2])), torch.tensor([1, 0, 1])),
+        ...          (TensorDict(tokens=torch.tensor([7])), torch.tensor([0]))]
+        >>> x, y = PadCollate(pad_value=({'tokens': 0}, -1))(batch)
+        >>> x
+        TensorDict({'tokens': tensor([[5, 3, 2],
+                [7, 0, 0]])})
+        >>> y
+        tensor([[ 1,  0,  1],
+                [ 0, -1, -1]])
+    """
+
+    pad_value: Any = -1
+    shared_memory: Optional[bool] = None
+
+    def _collate(self, samples: Sequence, pad_value, shared_memory: bool):
+        elem = samples[0]
+        if isinstance(elem, np.ndarray):
+            samples = [torch.as_tensor(sample) for sample in samples]
+            elem = samples[0]
+        if isinstance(elem, torch.Tensor):
+            return pad_tensors(samples, pad_value, shared_memory=shared_memory)
+        if isinstance(elem, Mapping):
+            return type(elem)(
+                {
+                    k: self._collate(
+                        [sample[k] for sample in samples],
+                        _select_pad_value(pad_value, k),
+                        shared_memory,
+                    )
+                    for k in elem
+                }
+            )
+        if isinstance(elem, (tuple, list)):
+            fields = [
+                self._collate(list(field), _select_pad_value(pad_value, i), shared_memory)
+                for i, field in enumerate(zip(*samples))
+            ]
+            return tuple(fields) if isinstance(elem, tuple) else fields
+        return default_collate(samples)
+
+    def __call__(self, batch: Sequence):
+        shared_memory = self.shared_memory
+        if shared_memory is None:
+            shared_memory = get_worker_info() is not None
+        _check_pad_value(self.pad_value, batch[0])
+        return self._collate(batch, self.pad_value, shared_memory)
@@ -1,3 +1,5 @@
+from typing import Optional, Union
+import torch
 from collectionish import NumAttyDict
 
 
@@ -18,10 +20,57 @@ class TensorDict(NumAttyDict):
     Can handle basic python math operators since it comes from :class:`NumAttyDict`
     """
 
-    def to(self, device):
-        """move all tensors in this Tensordict to device"""
+    def _apply(self, fn) -> 'TensorDict':
+        return self.__class__({k: fn(v) for k, v in self.items()})
+
+    def to(
+        self,
+        device: Optional[Union[str, torch.device, torch.dtype]] = None,
+        dtype: Optional[torch.dtype] = None,
+        non_blocking: bool = False,
+    ) -> 'TensorDict':
+        """get a new TensorDict with all tensors moved to ``device`` and/or cast to ``dtype``.
+
+        Note:
+            just like ``nn.Module.to`` only floating point tensors will be cast to ``dtype``, so
+            integer targets and boolean masks keep their types.
+
+        Args:
+            device: the device to move tensors to. a ``torch.dtype`` may be passed here too \
+                in which case it's treated as ``dtype``.
+            dtype: optional floating point dtype to cast floating point tensors to.
+            non_blocking: if ``True`` and the source is in pinned memory the copy will be \
+                asynchronous with respect to the host. Defaults to False.
+
+        Example:
+            >>> import torch
+            >>> from hearth.containers import TensorDict
+            >>>
+            >>> td = TensorDict(a=torch.tensor([1.0, 2.0]), b=torch.tensor([0, 1]))
+            >>> td.to(torch.float16)
+            TensorDict({'a': tensor([1., 2.], dtype=torch.float16), 'b': tensor([0, 1])})
+        """
+        if isinstance(device, torch.dtype):
+            device, dtype = None, device
+
+        def move(v):
+            if dtype is not None and v.is_floating_point():
+                return v.to(device=device, dtype=dtype, non_blocking=non_blocking)
+            return v.to(device=device, non_blocking=non_blocking)
+
+        return self._apply(move)
+
+    def pin_memory(self) -> 'TensorDict':
+        """get a new TensorDict with all tensors copied to pinned memory.
+
+        this is called by ``DataLoader`` when ``pin_memory=True``.
+        """
+        return self._apply(torch.Tensor.pin_memory)
+
+    def share_memory_(self) -> 'TensorDict':
+        """move all tensors in this TensorDict to shared memory in place."""
         for v in self.values():
-            v.to(device)
+            v.share_memory_()
         return self
 
     def _idx_tensors(self, idx):
@@ -1,8 +1,25 @@
-from typing import Union, Sized
+from typing import Union, Sized, Dict, Optional, Callable, List, Iterator, Tuple
+import os
+import glob
+import random
 from dataclasses import dataclass
-from torch.utils.data import Dataset
+import torch
+from torch.utils.data import Dataset, IterableDataset
+from torch.utils.data.dataloader import default_collate
+from more_itertools import chunked
 
 from hearth.containers import TensorDict
+from hearth._file_utils import save_json, load_json, mkdirs_if_not_exist, dtype_name, tensor_bytes
+from hearth._sharding import ShardingMixin
+from hearth.transforms import Transform
+
+MEMMAP_HEADER = 'header.json'
+
+
+def _n_examples(data: Union[Sized, TensorDict]) -> int:
+    if isinstance(data, TensorDict):
+        return len(next(iter(data.values())))  # type: ignore
+    return len(data)
 
 
 @dataclass
@@ -16,9 +33,410 @@ class XYDataset(Dataset):
     y: Union[Sized, TensorDict]
 
     def __len__(self) -> int:
-        if isinstance(self.x, TensorDict):
-            return len(next(iter(self.x.values())))  # type: ignore
-        return len(self.x)
+        return _n_examples(self.x)
 
     def __getitem__(self, index):
         return self.x[index], self.y[index]
+
+
+class _FieldWriter:
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'wb')
+        self.dtype: Optional[torch.dtype] = None
+        self.shape: Optional[tuple] = None
+
+    def write(self, chunk):
+        chunk = torch.as_tensor(chunk).detach().cpu().contiguous()
+        if self.dtype is None:
+            self.dtype, self.shape = chunk.dtype, tuple(chunk.shape[1:])
+        elif (chunk.dtype, tuple(chunk.shape[1:])) != (self.dtype, self.shape):
+            raise ValueError(
+                f'all chunks written to {self.path} must have dtype {self.dtype} and'
+                f' sample shape {self.shape} but got {chunk.dtype} and {tuple(chunk.shape[1:])}.'
+            )
+        if chunk.numel():
+            self._file.write(tensor_bytes(chunk))
+
+    def spec(self) -> Dict:
+        return {
+            'file': os.path.basename(self.path),
+            'dtype': dtype_name(self.dtype),  # type: ignore
+            'shape': list(self.shape),  # type: ignore
+        }
+
+    def close(self):
+        self._file.close()
+
+
+class MemmapWriter:
+    """writes x and y chunks to a directory that can be opened by :class:`MemmapXYDataset`.
+
+    each tensor (or each field of a :class:`hearth.containers.TensorDict`) is written to its own
+    raw contiguous file and a small json header describing dtypes and shapes is written on
+    :meth:`close`, so the full dataset never needs to fit in memory.
+
+    Args:
+        path: directory to write to. it will be created if it does not exist.
+
+    Example:
+        >>> import torch
+        >>> from hearth.datasets import MemmapWriter, MemmapXYDataset
+        >>>
+        >>> path = getfixture('tmpdir').strpath
+        >>> with MemmapWriter(path) as writer:
+        ...     for i in range(3):
+        ...         writer.append(torch.ones(2, 4) * i, torch.tensor([i, i]))
+        >>> dataset = MemmapXYDataset(path)
+        >>> len(dataset)
+        6
+        >>> dataset[[0, 5]]
+        (tensor([[0., 0., 0., 0.],
+                [2., 2., 2., 2.]]), tensor([0, 2]))
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.length = 0
+        self._writers: Dict[str, Union[_FieldWriter, Dict[str, _FieldWriter]]] = {}
+        mkdirs_if_not_exist(path)
+
+    def _get_writer(self, name: str, key: Optional[str] = None) -> _FieldWriter:
+        if key is None:
+            if name not in self._writers:
+                self._writers[name] = _FieldWriter(os.path.join(self.path, f'{name}.bin'))
+            return self._writers[name]  # type: ignore
+        fields = self._writers.setdefault(name, {})
+        if key not in fields:
+            fields[key] = _FieldWriter(os.path.join(self.path, f'{name}.{key}.bin'))  # type: ignore
+        return fields[key]  # type: ignore
+
+    def _write(self, name: str, chunk):
+        if isinstance(chunk, TensorDict):
+            for key, value in chunk.items():
+                self._get_writer(name, key).write(value)
+        else:
+            self._get_writer(name).write(chunk)
+
+    def append(self, x, y):
+        """append a chunk of examples, x and y must have the same length."""
+        n = _n_examples(x)
+        if _n_examples(y) != n:
+            raise ValueError('x and y chunks must have the same length.')
+        self._write('x', x)
+        self._write('y', y)
+        self.length += n
+
+    def _spec(self, name: str) -> Dict:
+        writer = self._writers[name]
+        if isinstance(writer, dict):
+            return {'fields': {k: w.spec() for k, w in writer.items()}}
+        return writer.spec()
+
+    def _iter_field_writers(self):
+        for writer in self._writers.values():
+            if isinstance(writer, dict):
+                yield from writer.values()
+            else:
+                yield writer
+
+    def close(self):
+        """close all open files and write the header."""
+        for writer in self._iter_field_writers():
+            writer.close()
+        if not self._writers:
+            raise ValueError(f'nothing was written to {self.path}.')
+        header = {'length': self.length, 'x': self._spec('x'), 'y': self._spec('y')}
+        save_json(header, os.path.join(self.path, MEMMAP_HEADER))
+
+    def __enter__(self) -> 'MemmapWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            for writer in self._iter_field_writers():
+                writer.close()
+
+
+def _open_tensor(path: str, spec: Dict, length: int) -> torch.Tensor:
+    shape = (length, *spec['shape'])
+    numel = 1
+    for dim in shape:
+        numel *= dim
+    dtype = getattr(torch, spec['dtype'])
+    if not numel:
+        return torch.empty(shape, dtype=dtype)
+    filename = os.path.join(path, spec['file'])
+    return torch.from_file(filename, shared=False, size=numel, dtype=dtype).view(shape)
+
+
+def _open_field(path: str, spec: Dict, length: int):
+    if 'fields' in spec:
+        return TensorDict({k: _open_tensor(path, v, length) for k, v in spec['fields'].items()})
+    return _open_tensor(path, spec, length)
+
+
+class MemmapXYDataset(XYDataset):
+    """an :class:`XYDataset` backed by memory mapped files written with :class:`MemmapWriter`.
+
+    tensors are mapped lazily so indexing (including batch indexing with a list or tensor of
+    indices) only reads the pages it needs, which makes it suitable for datasets larger than
+    memory. when pickled (for instance when sent to spawned ``DataLoader`` workers) only
+    the path is serialized and the files are mapped again on the other side.
+
+    Args:
+        path: directory containing a dataset written by :class:`MemmapWriter`.
+
+    Example:
+        >>> import torch
+        >>> from hearth.containers import TensorDict
+        >>> from hearth.datasets import MemmapXYDataset
+        >>>
+        >>> path = getfixture('tmpdir').strpath
+        >>> x = TensorDict(a=torch.arange(10.0).reshape(5, 2), b=torch.arange(5))
+        >>> dataset = MemmapXYDataset.write(path, x, torch.arange(5) % 2, chunk_size=2)
+        >>> dataset  # doctest: +ELLIPSIS
+        MemmapXYDataset(path=...)
+        >>> len(dataset)
+        5
+        >>> dataset[1:3]
+        (TensorDict({'a': tensor([[2., 3.],
+                [4., 5.]]), 'b': tensor([1, 2])}), tensor([1, 0]))
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        header = load_json(os.path.join(path, MEMMAP_HEADER))
+        self.x = _open_field(path, header['x'], header['length'])
+        self.y = _open_field(path, header['y'], header['length'])
+
+    @classmethod
+    def write(cls, path: str, x, y, chunk_size: int = 65536) -> 'MemmapXYDataset':
+        """write ``x`` and ``y`` to ``path`` in chunks of ``chunk_size`` and open the result.
+
+        Args:
+            path: directory to write the dataset to.
+            x: tensor, array or :class:`hearth.containers.TensorDict` of inputs.
+            y: tensor, array or :class:`hearth.containers.TensorDict` of targets.
+            chunk_size: number of examples to convert and write at a time. Defaults to 65536.
+        """
+        n = _n_examples(x)
+        with MemmapWriter(path) as writer:
+            for start in range(0, max(n, 1), chunk_size):
+                stop = start + chunk_size
+                writer.append(x[start:stop], y[start:stop])
+        return cls(path)
+
+    def __getstate__(self):
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'])
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}(path={self.path})'
+
+
+def _windows(series: torch.Tensor, length: int) -> torch.Tensor:
+    # a (n_windows, length, *feature_dims) view of series, no data is copied.
+    return series.unfold(0, length, 1).movedim(-1, 1)
+
+
+class WindowedXYDataset(XYDataset):
+    """an :class:`XYDataset` of overlapping windows over contiguous series ``x`` and ``y``.
+
+    the item at index ``i`` is the subsequence starting at timestep ``i`` so this dataset is
+    indexed by window start offsets such as those yielded by
+    :class:`hearth.samplers.BatchSubsequenceSampler` with ``output='starts'``. windows are strided
+    views of the underlying series so indexing with a tensor of starts produces a whole batch of
+    shape ``(batch_size, sequence_length, ...)`` in a single gather.
+
+    Args:
+        x: series of inputs with time as the first dimension, may be a
+            :class:`hearth.containers.TensorDict`.
+        y: series of targets with time as the first dimension, may be a
+            :class:`hearth.containers.TensorDict`.
+        sequence_length: the length of each window.
+
+    Example:
+        >>> import torch
+        >>> from hearth.datasets import WindowedXYDataset
+        >>>
+        >>> dataset = WindowedXYDataset(torch.arange(20.0).reshape(10, 2), torch.arange(10), 3)
+        >>> len(dataset)
+        8
+        >>> dataset.series_length
+        10
+        >>> x, y = dataset[torch.tensor([0, 5])]
+        >>> x
+        tensor([[[ 0.,  1.],
+                 [ 2.,  3.],
+                 [ 4.,  5.]],
+        <BLANKLINE>
+                [[10., 11.],
+                 [12., 13.],
+                 [14., 15.]]])
+        >>> y
+        tensor([[0, 1, 2],
+                [5, 6, 7]])
+    """
+
+    def __init__(self, x, y, sequence_length: int):
+        self.series_length = _n_examples(x)
+        if _n_examples(y) != self.series_length:
+            raise ValueError('x and y series must have the same length.')
+        if not 0 < sequence_length <= self.series_length:
+            raise ValueError(
+                f'sequence_length must be between 1 and the series length ({self.series_length})'
+                f' but got {sequence_length}.'
+            )
+        self.sequence_length = sequence_length
+        self.x = self._window(x)
+        self.y = self._window(y)
+
+    def _window(self, series):
+        if isinstance(series, TensorDict):
+            return TensorDict({k: _windows(v, self.sequence_length) for k, v in series.items()})
+        return _windows(torch.as_tensor(series), self.sequence_length)
+
+    def __repr__(self) -> str:
+        return (
+            f'{self.__class__.__name__}(series_length={self.series_length},'
+            f' sequence_length={self.sequence_length})'
+        )
+
+
+class StreamingXYDataset(ShardingMixin, IterableDataset):
+    """an iterable dataset that streams a directory of :class:`MemmapXYDataset` shards.
+
+    shards (subdirectories of ``path`` written with :class:`MemmapWriter`) are split round robin
+    across distributed replicas and ``DataLoader`` workers and each shard is read sequentially
+    in blocks of ``read_size`` examples. examples pass through a bounded shuffle buffer of
+    ``buffer_size`` examples so memory use does not depend on the size of the dataset.
+
+    Note:
+        for every worker to get data there should be at least ``num_replicas * num_workers``
+        shards. Since ``DataLoader`` workers iterate copies of this dataset, :meth:`set_epoch`
+        must be called at the start of each epoch to reshuffle when using workers, which
+        :class:`hearth.loop.Loop` does automatically.
+
+    Args:
+        path: directory containing shard directories.
+        buffer_size: size of the shuffle buffer, ``0`` disables shuffling. Defaults to 10000.
+        read_size: number of examples read from a shard at a time. Defaults to 4096.
+        batch_size: if provided yield batches of this size collated with ``collate_fn``
+            rather than single examples (use with ``DataLoader(batch_size=None)``).
+            Defaults to None.
+        transform: optional transform (such as a :class:`hearth.transforms.Pipeline`) applied
+            to the inputs of each example, or each batch if ``batch_size`` is provided using
+            :meth:`hearth.transforms.Transform.batch_call` for transforms. Defaults to None.
+        collate_fn: function used to collate batches. Defaults to torch's ``default_collate``.
+        num_replicas: number of distributed processes to shard across. Defaults to 1.
+        rank: rank of this process within ``num_replicas``. Defaults to 0.
+        seed: if provided shard order and shuffle buffers are seeded from ``seed + epoch``.
+            Defaults to 0 when ``num_replicas > 1`` else None.
+
+    Example:
+        >>> import os
+        >>> import torch
+        >>> from hearth.datasets import MemmapXYDataset, StreamingXYDataset
+        >>>
+        >>> path = getfixture('tmpdir').strpath
+        >>> for i in range(3):
+        ...     shard = MemmapXYDataset.write(os.path.join(path, f'shard{i}'),
+        ...                                   torch.arange(4.0) + 4 * i, torch.arange(4) + 4 * i)
+        >>> dataset = StreamingXYDataset(path, buffer_size=4, batch_size=3, seed=0)
+        >>> for x, y in dataset:
+        ...     print(y)
+        tensor([ 9,  0, 11])
+        tensor([10,  2,  3])
+        tensor([4, 8, 1])
+        tensor([7, 6, 5])
+    """
+
+    def __init__(
+        self,
+        path: str,
+        buffer_size: int = 10000,
+        read_size: int = 4096,
+        batch_size: Optional[int] = None,
+        transform: Optional[Callable] = None,
+        collate_fn: Callable = default_collate,
+        num_replicas: Optional[int] = None,
+        rank: Optional[int] = None,
+        seed: Optional[int] = None,
+    ):
+        self.path = path
+        self.shards = sorted(
+            os.path.dirname(header)
+            for header in glob.glob(os.path.join(path, '*', MEMMAP_HEADER))
+        )
+        if not self.shards:
+            raise ValueError(f'no shards found in {path}.')
+        self.buffer_size = buffer_size
+        self.read_size = read_size
+        self.batch_size = batch_size
+        self.transform = transform
+        self.collate_fn = collate_fn
+        self._init_sharding(num_replicas, rank, seed)
+
+    def _assigned_shards(self, generator: Optional[torch.Generator]) -> List[str]:
+        shards = self.shards
+        if generator is not None:
+            shards = [shards[i] for i in torch.randperm(len(shards), generator=generator)]
+        n_shards, shard = self._get_shard()
+        return shards[shard::n_shards]
+
+    def _read(self, shards: List[str]) -> Iterator[Tuple]:
+        for shard in shards:
+            dataset = MemmapXYDataset(shard)
+            for start in range(0, len(dataset), self.read_size):
+                stop = start + self.read_size
+                x, y = dataset[start:stop]
+                for i in range(_n_examples(x)):
+                    yield x[i], y[i]
+
+    def _shuffle(self, examples: Iterator[Tuple], rng: random.Random) -> Iterator[Tuple]:
+        buffer: List[Tuple] = []
+        for example in examples:
+            if len(buffer) < self.buffer_size:
+                buffer.append(example)
+                continue
+            i = rng.randrange(self.buffer_size)
+            yield buffer[i]
+            buffer[i] = example
+        rng.shuffle(buffer)
+        yield from buffer
+
+    def _apply(self, x, y, batch: bool = False):
+        if self.transform is None:
+            return x, y
+        if batch and isinstance(self.transform, Transform):
+            # transforms are vectorized over collated batches by their batch_call.
+            return self.transform.batch_call(x), y
+        return self.transform(x), y
+
+    def __iter__(self):
+        generator = self._next_generator()
+        n_shards, shard = self._get_shard()
+        examples = self._read(self._assigned_shards(generator))
+        if self.buffer_size > 0:
+            # every shard draws the same seeds from the shared generator and uses its own.
+            seeds = torch.randint(2**62, size=(n_shards,), generator=generator)
+            examples = self._shuffle(examples, random.Random(seeds[shard].item()))
+        if self.batch_size is None:
+            for x, y in examples:
+                yield self._apply(x, y)
+        else:
+            for batch in chunked(examples, self.batch_size):
+                yield self._apply(*self.collate_fn(batch), batch=True)
+
+    def __repr__(self) -> str:
+        return (
+            f'{self.__class__.__name__}(path={self.path},'
+            f' n_shards={len(self.shards)},'
+            f' buffer_size={self.buffer_size},'
+            f' batch_size={self.batch_size})'
+        )
@@ -41,10 +41,13 @@ class Improvement(MonitoringEvent):
         steps: the number of steps (generally epochs) that between this and the last improvement.
         best: the best value.
         last_best: the last best value
+        improvement_on: the operator the value improves on, ``'lt'`` if lower values are better
+            and ``'gt'`` if higher values are. Defaults to ``'lt'``.
     """
 
     best: float
     last_best: float
+    improvement_on: str = 'lt'
 
     @property
     def msg(self) -> str:
@@ -62,9 +65,12 @@ class Stagnation(MonitoringEvent):
         stage: the stage being monitored.
         steps: the number of steps (generally epochs) that the measured value has been stagnant.
         best: the best value seen so far.
+        improvement_on: the operator the value improves on, ``'lt'`` if lower values are better
+            and ``'gt'`` if higher values are. Defaults to ``'lt'``.
     """
 
     best: float
+    improvement_on: str = 'lt'
 
     @property
     def msg(self) -> str:
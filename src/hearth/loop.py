@@ -1,4 +1,4 @@
-from typing import Sequence, Callable, Optional, Union
+from typing import Any, Mapping, Sequence, Callable, Optional, Union
 import torch
 from torch import nn
 from contextlib import nullcontext
@@ -8,15 +8,63 @@ from hearth.callbacks import History
 from hearth.metrics import MetricStack
 from hearth.losses import MultiHeadLoss
 from hearth.optimizers import LazyOptimizer
+from hearth.transforms import Transform
+
+
+def _to_device(batch: Any, device: Union[str, torch.device]) -> Any:
+    if isinstance(batch, torch.Tensor):
+        # copies from pinned memory to cuda can overlap with compute, other copies can't and
+        # non_blocking copies from cuda to the cpu may be read before they are complete.
+        non_blocking = torch.device(device).type == 'cuda' and batch.is_pinned()
+        return batch.to(device, non_blocking=non_blocking)
+    if isinstance(batch, Mapping):
+        return type(batch)({k: _to_device(v, device) for k, v in batch.items()})
+    if isinstance(batch, (tuple, list)):
+        return type(batch)(_to_device(v, device) for v in batch)
+    if hasattr(batch, 'to') and not isinstance(batch, nn.Module):
+        return batch.to(device)
+    return batch
+
+
+def _set_epoch(batches: Any, epoch: int):
+    """call ``set_epoch`` on batches and on the dataset and samplers of a ``DataLoader``."""
+    batch_sampler = getattr(batches, 'batch_sampler', None)
+    candidates = (
+        batches,
+        getattr(batches, 'dataset', None),
+        getattr(batches, 'sampler', None),
+        batch_sampler,
+        getattr(batch_sampler, 'sampler', None),
+    )
+    seen = set()
+    for candidate in candidates:
+        set_epoch = getattr(candidate, 'set_epoch', None)
+        if callable(set_epoch) and id(candidate) not in seen:
+            seen.add(id(candidate))
+            set_epoch(epoch)
 
 
 class Loop:
-
     """The simplest kind of loop for basic supervised learning.
 
+    Args:
+        device: optional device each batch is moved to before it is handled. Defaults to None
+            which leaves batches where they are.
+        batch_transform: optional transform applied to the inputs of each ``(x, y)`` batch once
+            it is on ``device``. :class:`hearth.transforms.Transform` s are applied with
+            their ``batch_call`` so they are vectorized over the batch, other callables are
+            just called on the inputs. Defaults to None.
+
+    Note:
+        at the start of each stage ``set_epoch(loop.epoch)`` is called on the batches and, for a
+        ``DataLoader``, on its dataset and samplers if they have it (like
+        :class:`torch.utils.data.DistributedSampler` and hearth's samplers and streaming
+        datasets) so they reshuffle every epoch even when iterated in ``DataLoader`` workers.
+
     Note:
         If you have more custom things you'd like to to that cant be handled
         in callbacks it's recommended to subclass this and overide the  ``handle_batch`` method.
+        For batches that are not ``(x, y)`` pairs override ``prepare_batch``.
     """
 
     stages = ('train', 'val')
@@ -29,8 +77,12 @@ class Loop:
         metrics: Optional[Union[Callable, MetricStack, Sequence[Callable]]] = None,
         callbacks: Sequence[Callback] = (),
         history: Optional[History] = None,
+        device: Optional[Union[str, torch.device]] = None,
+        batch_transform: Optional[Callable] = None,
     ):
         self.model = model
+        self.device = device
+        self.batch_transform = batch_transform
         self.optimizer = optimizer
         self.loss_fn = loss_fn
         self.metrics = metrics
@@ -146,6 +198,20 @@ class Loop:
     def forward(self, x, **kwargs):
         return self.model(x, **kwargs)
 
+    def transform_batch(self, x):
+        if isinstance(self.batch_transform, Transform):
+            return self.batch_transform.batch_call(x)
+        return self.batch_transform(x)
+
+    def prepare_batch(self, batch):
+        """move a batch to ``device`` and apply ``batch_transform`` to its inputs."""
+        if self.device is not None:
+            batch = _to_device(batch, self.device)
+        if self.batch_transform is not None:
+            x, y = batch
+            batch = (self.transform_batch(x), y)
+        return batch
+
     def handle_batch(self, batch):
         # do forward pass and get loss
         self.optimizer.zero_grad()
@@ -160,12 +226,19 @@ class Loop:
         if self._has_metrics:
             self._compute_metric(y_hat, y)
 
+    def _get_n_batches(self, batches) -> Optional[int]:
+        try:
+            return len(batches)
+        except TypeError:
+            # streaming datasets and generators don't have a known length.
+            return None
+
     def handle_batches(self, batches):
-        self.n_batches = len(batches)
+        self.n_batches = self._get_n_batches(batches)
         self.batches_seen = 0
         for batch in batches:
             self.callbacks.on_batch_start(self)
-            self.handle_batch(batch)
+            self.handle_batch(self.prepare_batch(batch))
             self.batches_seen += 1
             self.callbacks.on_batch_end(self)
 
@@ -179,6 +252,7 @@ class Loop:
             self.metrics.reset()
         self.loss_fn.reset()
         self.callbacks.on_stage_start(self)
+        _set_epoch(batches, self.epoch)
         self.handle_batches(batches)
         self.callbacks.on_stage_end(self)
 
@@ -195,6 +269,7 @@ class Loop:
             self.epoch += 1
             if self.should_stop:
                 break
+        self.callbacks.on_loop_end(self)
 
     def __repr__(self) -> str:
         return (
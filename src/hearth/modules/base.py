@@ -1,10 +1,83 @@
 import os
-from typing import Iterator
+from collections import OrderedDict
+from itertools import chain
+from typing import Any, Dict, Iterator, Optional, Sequence, Union
 import torch
 from torch import nn
 from hearth.grad import freeze, unfreeze, trainable_parameters
 from hearth._config import _init_wrapper, from_config
-from hearth._file_utils import save_json, load_json
+from hearth._file_utils import save_json, load_json, save_torch
+from hearth.store import CheckpointStore
+from hearth.tensorfile import TensorFile, save_tensors
+
+_STATE_FILES = {'torch': 'state.pt', 'flat': 'state.tensors'}
+_STORE_DIR = 'store'
+MapLocation = Optional[Union[str, torch.device, Dict[str, str]]]
+
+
+def _save_state(state_dict: Dict[str, torch.Tensor], model_dir: str, format: str):
+    if format not in _STATE_FILES:
+        raise ValueError(f'format must be one of {list(_STATE_FILES)} but got {format!r}.')
+    path = os.path.join(model_dir, _STATE_FILES[format])
+    if format == 'flat':
+        metadata = getattr(state_dict, '_metadata', None)
+        save_tensors(state_dict, path, metadata={'state_dict': metadata})
+    else:
+        save_torch(state_dict, path)
+    # remove state saved in any other format so it is never loaded instead of this one.
+    for other in set(_STATE_FILES.values()) - {_STATE_FILES[format]}:
+        if os.path.exists(os.path.join(model_dir, other)):
+            os.remove(os.path.join(model_dir, other))
+
+
+def _read_flat_state(
+    path: str,
+    map_location: MapLocation,
+    mmap: bool,
+    prefix: Optional[Union[str, Sequence[str]]],
+    workers: int,
+) -> Dict[str, torch.Tensor]:
+    tensors = TensorFile(path)
+    names = list(tensors)
+    if prefix is not None:
+        starts = tuple(f'{p}.' for p in ([prefix] if isinstance(prefix, str) else prefix))
+        names = [name for name in names if name.startswith(starts)]
+    state_dict = OrderedDict(tensors.load(names, mmap=mmap, workers=workers))
+    if tensors.metadata.get('state_dict') is not None:
+        state_dict._metadata = OrderedDict(tensors.metadata['state_dict'])  # type: ignore
+    return _map_cpu_state(state_dict, map_location)
+
+
+def _map_cpu_state(
+    state_dict: Dict[str, torch.Tensor], map_location: MapLocation
+) -> Dict[str, torch.Tensor]:
+    # flat files and stores only hold cpu tensors.
+    device = map_location.get('cpu') if isinstance(map_location, dict) else map_location
+    if device is not None:
+        for name, tensor in state_dict.items():
+            state_dict[name] = tensor.to(device)
+    return state_dict
+
+
+def _read_state(
+    model_dir: str,
+    map_location: MapLocation,
+    mmap: bool,
+    prefix: Optional[Union[str, Sequence[str]]],
+    workers: int,
+) -> Dict[str, torch.Tensor]:
+    flat_path = os.path.join(model_dir, _STATE_FILES['flat'])
+    if os.path.exists(flat_path):
+        return _read_flat_state(flat_path, map_location, mmap, prefix, workers)
+    path = os.path.join(model_dir, _STATE_FILES['torch'])
+    store_path = os.path.join(model_dir, _STORE_DIR)
+    if not os.path.exists(path) and os.path.isdir(store_path):
+        # incremental checkpoints keep their state in a store instead.
+        return _map_cpu_state(CheckpointStore(store_path).load()['state'], map_location)
+    load_kwargs: Dict[str, Any] = {'map_location': map_location}
+    if mmap:
+        load_kwargs['mmap'] = True
+    return torch.load(path, **load_kwargs)
 
 
 class BaseModule(nn.Module):
@@ -19,16 +92,45 @@ class BaseModule(nn.Module):
     """
 
     @classmethod
-    def from_config(cls, config):
-        """given a valid config return a new instance of this Module."""
-        return from_config(cls, config)
+    def from_config(cls, config, device: Optional[Union[str, torch.device]] = None):
+        """given a valid config return a new instance of this Module.
+
+        Args:
+            config: the config to create the instance from.
+            device: optional device to create parameters and buffers on. use ``'meta'`` to
+                create an instance without allocating or initializing any parameters, for
+                instance before loading a state dict with ``assign=True``. Defaults to None.
+        """
+        if device is None:
+            return from_config(cls, config)
+        with torch.device(device):
+            return from_config(cls, config)
+
+    def _has_state_for_all_tensors(self, state_dict) -> bool:
+        names = chain(
+            self.named_parameters(remove_duplicate=False),
+            self.named_buffers(remove_duplicate=False),
+        )
+        return all(name in state_dict for name, _ in names)
 
     @classmethod
-    def load(cls, model_dir: str, strict: bool = True):
+    def load(
+        cls,
+        model_dir: str,
+        strict: bool = True,
+        map_location: MapLocation = None,
+        mmap: bool = False,
+        assign: bool = False,
+        prefix: Optional[Union[str, Sequence[str]]] = None,
+        init: bool = True,
+        workers: int = 1,
+    ):
         """create a new instance of this with config and parameters loaded from  ``model_dir``.
 
         This method expects model dir to have the following files:
-             - state.pt: the state dict for this model
+             - state.pt or state.tensors: the state dict for this model, see :meth:`save`. \
+                 without either the latest state in a ``store`` directory written by \
+                 :class:`hearth.callbacks.Checkpoint` with ``incremental=True`` is loaded.
              - config.json :  the config of this model, nessisary to reinstantiate a new model \
                  with the :meth:`from_config`  method.
 
@@ -37,14 +139,56 @@ class BaseModule(nn.Module):
          Args:
              model_dir: directory to load from.
              strict: if we shold be strict about loading the state dict. Defaults to True.
+             map_location: where to load tensors to, passed to :func:`torch.load`.
+                 Defaults to None.
+             mmap: memory map the saved state rather than reading it all into memory first.
+                 Defaults to False.
+             assign: use the loaded tensors as the parameters of the new instance rather than
+                 copying them into its initialized parameters. with ``mmap=True`` parameters are
+                 then only read from disk as they are used. Defaults to False.
+             prefix: optional prefix (or prefixes) of submodules to load, such as ``'encoder'``,
+                 other submodules keep their initial parameters and ``strict`` only applies to
+                 the given submodules. Defaults to None which loads everything.
+             init: if False the instance is created on the meta device so parameters are never
+                 initialized, then the loaded tensors are assigned as its parameters. if the
+                 state doesn't cover every parameter and buffer (for instance non persistent
+                 buffers or when loading with ``prefix``) the instance is created normally.
+                 Defaults to True.
+             workers: number of threads reading tensors in parallel when loading the ``'flat'``
+                 format without ``mmap``. Defaults to 1.
         """
         config = load_json(os.path.join(model_dir, 'config.json'))
-        state_dict = torch.load(os.path.join(model_dir, 'state.pt'))
+        state_dict = _read_state(model_dir, map_location, mmap, prefix, workers)
+
+        if not init and prefix is None:
+            instance = cls.from_config(config, device='meta')
+            if instance._has_state_for_all_tensors(state_dict):
+                instance._load_state(state_dict, strict=strict, assign=True)
+                return instance
 
         instance = cls.from_config(config)
-        instance.load_state_dict(state_dict, strict=strict)
+        instance._load_state(state_dict, strict=strict, assign=assign, prefix=prefix)
         return instance
 
+    def _load_state(
+        self,
+        state_dict: Dict[str, torch.Tensor],
+        strict: bool = True,
+        assign: bool = False,
+        prefix: Optional[Union[str, Sequence[str]]] = None,
+    ):
+        # assign is only passed when used so older torch versions still work without it.
+        kwargs = {'strict': strict, 'assign': True} if assign else {'strict': strict}
+        if prefix is None:
+            self.load_state_dict(state_dict, **kwargs)
+            return
+        for name in [prefix] if isinstance(prefix, str) else prefix:
+            start = f'{name}.'
+            substate = {
+                k.replace(start, '', 1): v for k, v in state_dict.items() if k.startswith(start)
+            }
+            self.get_submodule(name).load_state_dict(substate, **kwargs)
+
     def __init_subclass__(cls, *args, **kwargs):
         super().__init_subclass__(*args, **kwargs)
         cls.__init__ = _init_wrapper(cls.__init__)
@@ -75,16 +219,20 @@ class BaseModule(nn.Module):
         """
         return dict(self.__config__)
 
-    def save(self, model_dir: str):
+    def save(self, model_dir: str, format: str = 'torch'):
         """save this models state and config to a ``model_dir`` so it can be re-created later.
 
         This method will generate the following files in the ``model_dir``:
-            - state.pt: the state dict for this model
+            - state.pt or state.tensors: the state dict for this model
             - config.json :  the config of this model, nessisary to reinstantiate a new model \
                 with the :meth:`from_config`  method.
 
         Args:
             model_dir: directory to save stuff in.
+            format: ``'torch'`` saves state.pt with :func:`torch.save`, ``'flat'`` saves a pickle
+                free state.tensors with :func:`hearth.tensorfile.save_tensors` which can be
+                loaded safely, in part and as zero copy views with ``mmap=True``.
+                Defaults to ``'torch'``.
         """
-        torch.save(self.state_dict(), os.path.join(model_dir, 'state.pt'))
+        _save_state(self.state_dict(), model_dir, format)
         save_json(self.config(), path=os.path.join(model_dir, 'config.json'))
@@ -1,8 +1,17 @@
-from typing import ClassVar, Type
+from typing import Any, ClassVar, Dict, Optional, Type
 from copy import deepcopy
+import io
+import lzma
+import queue
+import shutil
+import tempfile
+import threading
+import zlib
+import torch
 from torch import nn
 from torch import optim
 from hearth.grad import trainable_parameters, named_trainable_parameters
+from hearth._file_utils import atomic_path
 from more_itertools import partition
 
 
@@ -605,3 +614,194 @@ class SGD(LazyOptimizer):
             nesterov=nesterov,
             decay_bias=decay_bias,
         )
+
+
+_COMPRESSORS = {
+    'zlib': lambda level: zlib.compressobj(-1 if level is None else level),
+    'lzma': lambda level: lzma.LZMACompressor(preset=level),
+}
+_XZ_MAGIC = b'\xfd7zXZ\x00'
+_ZLIB_MAGIC = b'\x78'
+
+
+class _CompressingWriter:
+    """a write only file object which compresses chunks and writes them to ``f`` in a worker
+    thread, zlib and lzma release the gil so serializing and compressing overlap."""
+
+    def __init__(self, f, compressor, max_chunks: int = 64):
+        self._f = f
+        self._compressor = compressor
+        self._chunks: 'queue.Queue[Optional[bytes]]' = queue.Queue(max_chunks)
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            for chunk in iter(self._chunks.get, None):
+                self._f.write(self._compressor.compress(chunk))
+            self._f.write(self._compressor.flush())
+        except BaseException as e:
+            self._error = e
+            # keep taking chunks so writes never block on a full queue.
+            for _ in iter(self._chunks.get, None):
+                pass
+
+    def write(self, data) -> int:
+        # chunks are copied since the caller may reuse its buffer.
+        chunk = bytes(data)
+        self._chunks.put(chunk)
+        return len(chunk)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self._chunks.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+
+class _ZlibReader(io.RawIOBase):
+    """a read only file object which decompresses the zlib stream in ``f`` as it is read."""
+
+    def __init__(self, f, chunk_size: int = 1 << 20):
+        self._f = f
+        self._decompressor = zlib.decompressobj()
+        self._chunk_size = chunk_size
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = b''
+        while not data and not self._decompressor.eof:
+            compressed = self._decompressor.unconsumed_tail or self._f.read(self._chunk_size)
+            if not compressed:
+                raise EOFError('compressed stream ended before the end-of-stream marker.')
+            # limiting the output keeps memory bounded however well the data compressed.
+            data = self._decompressor.decompress(compressed, len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+
+def compact_optimizer_state(state_dict: Dict[str, Any], dtype: torch.dtype) -> Dict[str, Any]:
+    """a copy of an optimizer ``state_dict`` with its per parameter floating point tensors (such
+    as adam's moments) converted to ``dtype``.
+
+    scalars such as step counts are kept as they are and the original dtypes are kept under
+    ``'original_dtypes'`` so :func:`load_optimizer_state` can restore them. loading the compact
+    state directly with ``optimizer.load_state_dict`` also works since optimizers cast state to
+    the dtype of its parameter. bfloat16 keeps the range of float32, with float16 small second
+    moments may become zero.
+
+    Args:
+        state_dict: an optimizer state dict.
+        dtype: floating point dtype to convert to, such as ``torch.bfloat16``.
+    """
+    if not dtype.is_floating_point:
+        raise ValueError(f'dtype must be a floating point dtype but got {dtype}.')
+    state: Dict[Any, Dict[str, Any]] = {}
+    original_dtypes: Dict[Any, Dict[str, str]] = {}
+    for key, param_state in state_dict['state'].items():
+        state[key] = dict(param_state)
+        for name, value in param_state.items():
+            if torch.is_tensor(value) and value.is_floating_point() and value.dim():
+                original_dtypes.setdefault(key, {})[name] = str(value.dtype).replace('torch.', '')
+                state[key][name] = value.to(dtype)
+    return {**state_dict, 'state': state, 'original_dtypes': original_dtypes}
+
+
+def save_optimizer_state(
+    state_dict: Dict[str, Any],
+    path: str,
+    dtype: Optional[torch.dtype] = None,
+    compression: Optional[str] = None,
+    level: Optional[int] = None,
+):
+    """save an optimizer ``state_dict`` to ``path``, optionally in reduced precision and
+    compressed.
+
+    Args:
+        state_dict: an optimizer state dict.
+        path: file to save to, it is written atomically.
+        dtype: optional dtype to store per parameter state in, see
+            :func:`compact_optimizer_state`. Defaults to None.
+        compression: optionally compress with ``'zlib'`` or ``'lzma'``, the state is compressed
+            and written in a worker thread while it is serialized. Defaults to None.
+        level: the zlib compression level or lzma preset. Defaults to None which uses the
+            compressor's default.
+
+    Example:
+        >>> import torch
+        >>> from torch import nn
+        >>> from hearth.optimizers import load_optimizer_state, save_optimizer_state
+        >>>
+        >>> model = nn.Linear(3, 2)
+        >>> optimizer = torch.optim.AdamW(model.parameters())
+        >>> model(torch.rand(4, 3)).sum().backward()
+        >>> optimizer.step()
+        >>>
+        >>> path = str(getfixture('tmpdir').join('optimizer_state.pt'))
+        >>> save_optimizer_state(
+        ...     optimizer.state_dict(), path, dtype=torch.bfloat16, compression='zlib'
+        ... )
+        >>> state = load_optimizer_state(path)
+        >>> state['state'][0]['exp_avg'].dtype
+        torch.float32
+        >>> optimizer.load_state_dict(state)
+    """
+    if compression is not None and compression not in _COMPRESSORS:
+        raise ValueError(
+            f'compression must be one of {list(_COMPRESSORS)} but got {compression!r}.'
+        )
+    if dtype is not None:
+        state_dict = compact_optimizer_state(state_dict, dtype)
+    with atomic_path(path) as tmp_path:
+        if compression is None:
+            torch.save(state_dict, tmp_path)
+            return
+        with open(tmp_path, 'wb') as f:
+            writer = _CompressingWriter(f, _COMPRESSORS[compression](level))
+            try:
+                torch.save(state_dict, writer)
+            finally:
+                writer.close()
+
+
+def _restore_dtypes(state_dict: Dict[str, Any]) -> Dict[str, Any]:
+    for key, names in state_dict.pop('original_dtypes', {}).items():
+        param_state = state_dict['state'][key]
+        for name, dtype in names.items():
+            param_state[name] = param_state[name].to(getattr(torch, dtype))
+    return state_dict
+
+
+def load_optimizer_state(path: str, map_location=None) -> Dict[str, Any]:
+    """load an optimizer state dict saved with :func:`save_optimizer_state` (or
+    :func:`torch.save`), decompressing it and restoring the original dtypes of its state.
+
+    compressed state is decompressed in chunks to a temporary file rather than in memory.
+
+    Args:
+        path: file to load.
+        map_location: where to load tensors to, passed to :func:`torch.load`. Defaults to None.
+    """
+    with open(path, 'rb') as f:
+        magic = f.read(len(_XZ_MAGIC))
+        f.seek(0)
+        if magic == _XZ_MAGIC:
+            reader = lzma.LZMAFile(f)
+        elif magic.startswith(_ZLIB_MAGIC):
+            reader = io.BufferedReader(_ZlibReader(f))
+        else:
+            return _restore_dtypes(torch.load(f, map_location))
+        # torch.load seeks back and forth through the file, so rather than seeking in the
+        # compressed stream (which decompresses again from the start) it is decompressed a
+        # chunk at a time to a temporary file.
+        with reader, tempfile.TemporaryFile() as decompressed:
+            shutil.copyfileobj(reader, decompressed)
+            decompressed.seek(0)
+            state_dict = torch.load(decompressed, map_location)
+    return _restore_dtypes(state_dict)
@@ -2,14 +2,26 @@
 `torch.utils.data.DataLoader\
  <https://pytorch.org/docs/stable/data.html#torch.utils.data.DataLoader>`_
 """
-from typing import Sized, List, Iterator
+
+import sys
+from typing import Sized, List, Iterator, Tuple, Union, Optional, Sequence
 import torch
 from torch.utils.data import Sampler, DataLoader
 
 from more_itertools import windowed
 
+from hearth.datasets import WindowedXYDataset
+from hearth._sharding import ShardingMixin, _sharding_seed
+
+if sys.version_info < (3, 8):
+    from typing_extensions import Literal
+else:
+    from typing import Literal
+
+BatchIndices = Union[List[int], torch.Tensor, range]
 
-class SubsequenceSampler(Sampler):
+
+class SubsequenceSampler(ShardingMixin, Sampler):
     """a batch sampler that keeps sequences aligned within batches but shuffles batches.
 
     Often when training on a dataset that represents a full sequence we may want to
@@ -27,6 +39,24 @@ class SubsequenceSampler(Sampler):
             dataset is not divisible by ``batch_size``. The short batch will be chosen randomly
             on each iteration (providing a little extra noise and ensuring we dont see exactly
             the same subsequences on each iteration). Defaults to False.
+        output: the type of batch to yield. ``'list'`` yields lists of ints, ``'tensor'`` yields
+            int64 index tensors and ``'range'`` yields ``range`` objects (which expose
+            ``start`` and ``len()`` and can index most datasets). Batches are generated lazily
+            from a permutation of batch starts, so for ``'tensor'`` and ``'range'`` memory is
+            proportional to the number of batches rather than the number of samples.
+            Defaults to ``'list'``.
+        num_replicas: number of distributed processes to shard batches across. Defaults to 1.
+        rank: rank of this process within ``num_replicas``. Defaults to 0.
+        seed: if provided shuffling uses a generator seeded with ``seed + epoch`` instead of the
+            global torch RNG, making each epoch deterministic. every replica must agree on the
+            shuffled order so when ``num_replicas > 1`` this defaults to 0, else None.
+
+    Note:
+        when sharding, the shuffled batch list (after any short batch is dropped) is split
+        round robin over ``num_replicas`` so the short batch is still always last in whichever
+        shard receives it. like :class:`torch.utils.data.DistributedSampler` batches from the
+        start of the list are repeated so that every replica gets the same number of batches.
+        the epoch advances on each iteration, see :meth:`set_epoch`.
 
     Example:
 
@@ -38,7 +68,7 @@ class SubsequenceSampler(Sampler):
         >>> # so it could be a range object or a Dataset, a tensor etc...
         >>> sampler = SubsequenceSampler(range(15), batch_size=4)
         >>> sampler
-        SubsequenceSampler(dataset=range(0, 15), batch_size=4, drop_shortest=False)
+        SubsequenceSampler(dataset=range(0, 15), batch_size=4, drop_shortest=False, output='list')
 
         by default we will get one short batch of 3, since ``batch_size=4`` and  \
         ``drop_shortest=False``:
@@ -96,56 +126,111 @@ class SubsequenceSampler(Sampler):
         [0, 1, 2, 3]
         [4, 5, 6, 7]
 
+        for very large datasets use ``output='range'`` or ``output='tensor'`` to avoid building
+        python lists of every index:
+
+        >>> for batch in SubsequenceSampler(range(15), batch_size=4, output='range'):
+        ...     print(batch)
+        range(11, 15)
+        range(0, 4)
+        range(4, 8)
+        range(8, 11)
+
+        with a ``seed`` the batches are split deterministically over ``num_replicas``:
+
+        >>> for rank in range(2):
+        ...     sampler = SubsequenceSampler(range(15), batch_size=4, num_replicas=2, rank=rank,
+        ...                                  seed=0)
+        ...     print(rank, list(sampler))
+        0 [[11, 12, 13, 14], [3, 4, 5, 6]]
+        1 [[7, 8, 9, 10], [0, 1, 2]]
     """
 
-    def __init__(self, dataset: Sized, batch_size: int, drop_shortest: bool = False):
+    _outputs = ('list', 'tensor', 'range')
+
+    def __init__(
+        self,
+        dataset: Sized,
+        batch_size: int,
+        drop_shortest: bool = False,
+        output: Literal['list', 'tensor', 'range'] = 'list',
+        num_replicas: Optional[int] = None,
+        rank: Optional[int] = None,
+        seed: Optional[int] = None,
+    ):
+        if output not in self._outputs:
+            raise ValueError(f'output must be one of {list(self._outputs)} but got {output}')
         self.dataset = dataset
         self.batch_size = batch_size
         self.drop_shortest = drop_shortest
+        self.output = output
+        self._init_sharding(num_replicas, rank, seed)
 
-    def _get_lengths(self, total_samples: int) -> List[int]:
+    def _get_lengths(
+        self, total_samples: int, generator: Optional[torch.Generator] = None
+    ) -> List[int]:
         short_batch_size = total_samples % self.batch_size
         n_batches = total_samples // self.batch_size + (short_batch_size > 0)
         lengths = [self.batch_size] * n_batches
 
         if short_batch_size != 0:
-            short_batch_idx: int = torch.randint(high=n_batches, size=(1,)).item()  # type: ignore
+            short_batch_idx: int = torch.randint(  # type: ignore
+                high=n_batches, size=(1,), generator=generator
+            ).item()
             lengths[short_batch_idx] = short_batch_size
 
         return lengths
 
-    def _batches(self) -> Iterator[List[int]]:
-        total_samples = len(self.dataset)
-        batches = torch.split_with_sizes(
-            torch.arange(total_samples), self._get_lengths(total_samples)
-        )
-        sort_keys = torch.randperm(len(batches)).tolist()
+    def _spans(self) -> Iterator[Tuple[int, int]]:
+        """yields ``(start, length)`` for each batch in shuffled order with the short batch last."""
+        generator = self._next_generator()
+        lengths = self._get_lengths(len(self.dataset), generator=generator)
+        starts = [0] * len(lengths)
+        for i in range(1, len(lengths)):
+            starts[i] = starts[i - 1] + lengths[i - 1]
+        order = torch.randperm(len(lengths), generator=generator).tolist()
         # here we ensure that the shortest batch is last
-        yield from sorted([batches[i].tolist() for i in sort_keys], key=len, reverse=True)
-
-    def __iter__(self) -> Iterator[List[int]]:
-        for batch in self._batches():
-            if not self.drop_shortest or (len(batch) == self.batch_size):
-                yield batch
-
-    def __len__(self) -> int:
+        for i in sorted(order, key=lengths.__getitem__, reverse=True):
+            yield starts[i], lengths[i]
+
+    def _make_batch(self, start: int, length: int) -> BatchIndices:
+        if self.output == 'tensor':
+            return torch.arange(start, start + length)
+        if self.output == 'range':
+            return range(start, start + length)
+        return list(range(start, start + length))
+
+    def _kept_spans(self) -> Iterator[Tuple[int, int]]:
+        for start, length in self._spans():
+            if not self.drop_shortest or (length == self.batch_size):
+                yield start, length
+
+    def __iter__(self) -> Iterator[BatchIndices]:
+        for start, length in self._shard(self._kept_spans(), self._total_len()):
+            yield self._make_batch(start, length)
+
+    def _total_len(self) -> int:
         n = len(self.dataset)
         if self.drop_shortest:
             return n // self.batch_size  # type: ignore
         else:
             return (n + self.batch_size - 1) // self.batch_size
 
+    def __len__(self) -> int:
+        return self._shard_len(self._total_len())
+
     def __repr__(self) -> str:
         name = self.__class__.__name__
         args = (
             f'dataset={self.dataset},'
             f' batch_size={self.batch_size},'
-            f' drop_shortest={self.drop_shortest}'
+            f' drop_shortest={self.drop_shortest},'
+            f' output={self.output!r}'
         )
         return f'{name}({args})'
 
 
-class BatchSubsequenceSampler(torch.utils.data.Sampler):
+class BatchSubsequenceSampler(ShardingMixin, Sampler):
     """a batch sampler that generates nested ordered subsequence indexes aligned on batch.
 
     output indexes from this sampler will be  lists of shape [batch_size, sequence_lengh].
@@ -160,6 +245,18 @@ class BatchSubsequenceSampler(torch.utils.data.Sampler):
         batch_size: the desired batch size
         sequence_length: desired sequence length
         drop_last: if ``True`` drop the batch if less than batch size.
+        output: if ``'list'`` yield nested index lists of shape [batch_size, sequence_length].
+            if ``'starts'`` yield a tensor of the start offset of each subsequence in the batch
+            instead, for use with :class:`hearth.datasets.WindowedXYDataset` (see
+            :meth:`build_windowed_dataloader`). Defaults to ``'list'``.
+        num_replicas: number of distributed processes to shard batches across. Defaults to 1.
+        rank: rank of this process within ``num_replicas``. Defaults to 0.
+        seed: if provided shuffling uses a generator seeded with ``seed + epoch``. Defaults to 0
+            when ``num_replicas > 1`` else None.
+
+    Note:
+        sharding is applied to whole batches of subsequences (after ``drop_last``) so
+        subsequence alignment is preserved and the short batch stays last in its shard.
 
     Example:
         >>> import torch
@@ -180,8 +277,18 @@ class BatchSubsequenceSampler(torch.utils.data.Sampler):
         [[85, 86, 87, 88, 89], [50, 51, 52, 53, 54], [35, 36, 37, 38, 39], [75, 76, 77, 78, 79]]
         [[45, 46, 47, 48, 49], [65, 66, 67, 68, 69], [70, 71, 72, 73, 74], [108, 109, 110, 111, 112]]
         [[98, 99, 100, 101, 102], [25, 26, 27, 28, 29]]
+
+        with ``output='starts'`` only the start of each subsequence is yielded:
+
+        >>> _ = torch.manual_seed(0)
+        >>> sampler = BatchSubsequenceSampler(range(113), batch_size=4, sequence_length=5,
+        ...                                   output='starts')
+        >>> next(iter(sampler))
+        tensor([20, 10, 55, 30])
     """  # noqa : E501
 
+    _outputs = ('list', 'starts')
+
     @classmethod
     def build_dataloader(
         cls,
@@ -215,21 +322,232 @@ class BatchSubsequenceSampler(torch.utils.data.Sampler):
         )
         return DataLoader(dataset, batch_sampler=sampler, **kwargs)  # type: ignore
 
+    @classmethod
+    def build_windowed_dataloader(
+        cls,
+        x,
+        y,
+        batch_size: int,
+        sequence_length: int,
+        drop_last: bool = False,
+        **kwargs,
+    ) -> DataLoader:
+        """creates a new DataLoader over windowed views of the series ``x`` and ``y``.
+
+        batches are gathered in a single indexing operation on a
+        :class:`hearth.datasets.WindowedXYDataset` using start offsets from this sampler, rather
+        than indexing each element of each subsequence separately.
+
+        Note:
+            extra keyword arguments will be passed to \
+            `torch.utils.data.DataLoader\
+                <https://pytorch.org/docs/stable/data.html#torch.utils.data.DataLoader>`_
+
+        Args:
+            x: series of inputs with time as the first dimension, may be a
+                :class:`hearth.containers.TensorDict`.
+            y: series of targets with time as the first dimension, may be a
+                :class:`hearth.containers.TensorDict`.
+            batch_size: the desired batch size for the sequences
+            sequence_length: desired sequence length for subsequences
+            drop_last: If true drop the last short batch. Defaults to False.
+        """
+        dataset = WindowedXYDataset(x, y, sequence_length=sequence_length)
+        sampler = cls(
+            range(dataset.series_length),
+            batch_size=batch_size,
+            sequence_length=sequence_length,
+            drop_last=drop_last,
+            output='starts',
+        )
+        # each "sample" from the sampler is a whole batch of starts so autobatching is disabled
+        return DataLoader(dataset, sampler=sampler, batch_size=None, **kwargs)  # type: ignore
+
     def __init__(
-        self, dataset: Sized, batch_size: int, sequence_length: int, drop_last: bool = False
+        self,
+        dataset: Sized,
+        batch_size: int,
+        sequence_length: int,
+        drop_last: bool = False,
+        output: Literal['list', 'starts'] = 'list',
+        num_replicas: Optional[int] = None,
+        rank: Optional[int] = None,
+        seed: Optional[int] = None,
     ):
+        if output not in self._outputs:
+            raise ValueError(f'output must be one of {list(self._outputs)} but got {output}')
         self.subseq_sampler = SubsequenceSampler(
-            dataset, batch_size=sequence_length, drop_shortest=True
+            dataset,
+            batch_size=sequence_length,
+            drop_shortest=True,
+            output='range',
+            num_replicas=1,
+            rank=0,
+            seed=_sharding_seed(num_replicas or 1, seed),
         )
         self.batch_size = batch_size
         self.drop_last = drop_last
+        self.output = output
+        self._init_sharding(num_replicas, rank, seed)
 
-    def __len__(self) -> int:
+    @property
+    def epoch(self) -> int:
+        return self.subseq_sampler.epoch
+
+    @epoch.setter
+    def epoch(self, epoch: int):
+        self.subseq_sampler.epoch = epoch
+
+    def _total_len(self) -> int:
         n = len(self.subseq_sampler)
         return (n // self.batch_size) + ((n % self.batch_size) > 0 and not self.drop_last)
 
-    def __iter__(self) -> Iterator[List[List[int]]]:
-        for sequences in windowed(self.subseq_sampler, self.batch_size, step=self.batch_size):
-            seq_batch: List[List[int]] = list(filter(lambda x: x, sequences))  # type: ignore
+    def __len__(self) -> int:
+        return self._shard_len(self._total_len())
+
+    def _make_batch(self, seq_batch: List[range]) -> Union[List[List[int]], torch.Tensor]:
+        if self.output == 'starts':
+            return torch.tensor([seq.start for seq in seq_batch])
+        return [list(seq) for seq in seq_batch]
+
+    def _seq_batches(self) -> Iterator[List[range]]:
+        # the subsequence sampler is consumed unsharded, whole batches are sharded instead
+        subsequences = (range(s, s + n) for s, n in self.subseq_sampler._kept_spans())
+        for sequences in windowed(subsequences, self.batch_size, step=self.batch_size):
+            seq_batch: List[range] = list(filter(lambda x: x, sequences))  # type: ignore
             if len(seq_batch) == self.batch_size or not self.drop_last:
                 yield seq_batch
+
+    def __iter__(self) -> Iterator[Union[List[List[int]], torch.Tensor]]:
+        for seq_batch in self._shard(self._seq_batches(), self._total_len()):
+            yield self._make_batch(seq_batch)
+
+
+class BucketBatchSampler(ShardingMixin, Sampler):
+    """a batch sampler that groups examples of similar length to minimize padding.
+
+    on each iteration examples are shuffled, split into pools of ``pool_size`` examples and
+    sorted by length within each pool (ties are broken randomly). Each sorted pool is cut into
+    batches of at most ``batch_size`` examples and/or at most ``max_tokens`` padded tokens
+    (``len(batch) * max length in batch``) and finally the order of all batches is shuffled.
+
+    Use it with :class:`hearth.collate.PadCollate` to pad batches of variable length
+    sequences with the mask value honored by hearth's masked metrics and losses.
+
+    Note:
+        an example longer than ``max_tokens`` is yielded in a batch of its own.
+
+    Args:
+        lengths: the length of each example in the dataset.
+        batch_size: maximum number of examples in a batch. Defaults to None.
+        max_tokens: maximum number of padded tokens in a batch. at least one of ``batch_size`` or
+            ``max_tokens`` must be provided. Defaults to None.
+        pool_size: number of examples sorted together, smaller pools give more random batches
+            but more padding. Defaults to None (the whole dataset).
+        num_replicas: number of distributed processes to shard batches across. Defaults to 1.
+        rank: rank of this process within ``num_replicas``. Defaults to 0.
+        seed: if provided shuffling uses a generator seeded with ``seed + epoch``. Defaults to 0
+            when ``num_replicas > 1`` else None.
+
+    Example:
+        >>> import torch
+        >>> from hearth.samplers import BucketBatchSampler
+        >>>
+        >>> lengths = [5, 1, 8, 2, 7, 3, 6, 4]
+        >>> sampler = BucketBatchSampler(lengths, batch_size=2, seed=0)
+        >>> len(sampler)
+        4
+        >>> for batch in sampler:
+        ...     print(batch, [lengths[i] for i in batch])
+        [4, 2] [7, 8]
+        [0, 6] [5, 6]
+        [1, 3] [1, 2]
+        [5, 7] [3, 4]
+
+        with ``max_tokens`` batches of short examples hold more examples than batches of long
+        ones:
+
+        >>> sampler = BucketBatchSampler(lengths, max_tokens=12, seed=0)
+        >>> for batch in sampler:
+        ...     print(batch, [lengths[i] for i in batch])
+        [4] [7]
+        [6] [6]
+        [7, 0] [4, 5]
+        [2] [8]
+        [1, 3, 5] [1, 2, 3]
+    """
+
+    def __init__(
+        self,
+        lengths: Union[Sequence[int], torch.Tensor],
+        batch_size: Optional[int] = None,
+        max_tokens: Optional[int] = None,
+        pool_size: Optional[int] = None,
+        num_replicas: Optional[int] = None,
+        rank: Optional[int] = None,
+        seed: Optional[int] = None,
+    ):
+        if batch_size is None and max_tokens is None:
+            raise ValueError('at least one of batch_size or max_tokens must be provided.')
+        self.lengths = torch.as_tensor(lengths, dtype=torch.int64)
+        self.batch_size = batch_size
+        self.max_tokens = max_tokens
+        self.pool_size = pool_size
+        self._init_sharding(num_replicas, rank, seed)
+
+    def _split_by_tokens(self, indices: torch.Tensor, lengths: torch.Tensor) -> List[torch.Tensor]:
+        batches = []
+        start = 0
+        while start < len(indices):
+            limit = self.max_tokens // max(int(lengths[start]), 1)  # type: ignore
+            if self.batch_size is not None:
+                limit = min(limit, self.batch_size)
+            # lengths are sorted so padded size grows with every example added.
+            window = lengths[start:][: max(limit, 1)]
+            padded_sizes = torch.arange(1, len(window) + 1) * window
+            n = max(int((padded_sizes <= self.max_tokens).sum()), 1)
+            batches.append(indices[start:][:n])
+            start += n
+        return batches
+
+    def _split_pool(self, indices: torch.Tensor, lengths: torch.Tensor) -> List[torch.Tensor]:
+        if self.max_tokens is None:
+            return list(torch.split(indices, self.batch_size))  # type: ignore
+        return self._split_by_tokens(indices, lengths)
+
+    def _plan(self, generator: Optional[torch.Generator]) -> List[torch.Tensor]:
+        order = torch.randperm(len(self.lengths), generator=generator)
+        batches: List[torch.Tensor] = []
+        for pool in torch.split(order, self.pool_size or max(len(order), 1)):
+            pool_lengths, sort_idx = torch.sort(self.lengths[pool], stable=True)
+            batches.extend(self._split_pool(pool[sort_idx], pool_lengths))
+        batch_order = torch.randperm(len(batches), generator=generator).tolist()
+        return [batches[i] for i in batch_order]
+
+    def __iter__(self) -> Iterator[List[int]]:
+        plan = self._plan(self._next_generator())
+        for batch in self._shard(plan, len(plan)):
+            yield batch.tolist()
+
+    def _n_batches(self) -> int:
+        if self.max_tokens is None:
+            pool_size = self.pool_size or max(len(self.lengths), 1)
+            full, rest = divmod(len(self.lengths), pool_size)
+            return full * -(-pool_size // self.batch_size) + -(-rest // self.batch_size)
+        # with max_tokens the number of batches depends on the shuffle, so the next epoch is
+        # planned without advancing the epoch or consuming the global RNG.
+        if self.seed is not None:
+            return len(self._plan(torch.Generator().manual_seed(self.seed + self.epoch)))
+        with torch.random.fork_rng(devices=[]):
+            return len(self._plan(None))
+
+    def __len__(self) -> int:
+        return self._shard_len(self._n_batches())
+
+    def __repr__(self) -> str:
+        return (
+            f'{self.__class__.__name__}(n_examples={len(self.lengths)},'
+            f' batch_size={self.batch_size},'
+            f' max_tokens={self.max_tokens},'
+            f' pool_size={self.pool_size})'
+        )
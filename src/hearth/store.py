@@ -0,0 +1,209 @@
+"""a content addressed store for incremental checkpoints.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+from collections import OrderedDict
+import glob
+import hashlib
+import os
+import torch
+from hearth._file_utils import (
+    atomic_path,
+    dtype_name,
+    load_json,
+    mkdirs_if_not_exist,
+    read_exactly,
+    save_json,
+    tensor_bytes,
+)
+
+_HASH_SIZE = 16
+
+
+class CheckpointStore:
+    """stores versions of nested containers of tensors such as state dicts, writing each tensor
+    only if no earlier version already has the same content.
+
+    each tensor is hashed and written once to ``objects/`` under its hash, so tensors that are
+    unchanged between versions (for instance the weights of a model frozen with
+    :meth:`hearth.modules.BaseModule.freeze`) are only written once. each version is described
+    by a small json manifest in ``manifests/``.
+
+    tensors are only hashed again when they have been modified in place (or replaced) since the
+    last save from this store. modifications made through ``tensor.data`` can't be detected,
+    set ``track_versions=False`` to hash every tensor on every save if you make them.
+
+    Args:
+        path: root directory of the store, created if it doesn't exist.
+        track_versions: skip hashing tensors that have not been modified since the last save.
+            Defaults to True.
+
+    Example:
+        >>> import torch
+        >>> from hearth.store import CheckpointStore
+        >>>
+        >>> store = CheckpointStore(str(getfixture('tmpdir')))
+        >>> weights = {'frozen': torch.zeros(1000), 'head': torch.ones(3)}
+        >>> store.save({'state': weights}, epoch=0)
+        0
+        >>> _ = weights['head'].mul_(2)
+        >>> store.save({'state': weights}, epoch=1)
+        1
+        >>> store.manifest(1)['written']
+        ['state/head']
+        >>> store.load()['state']['head']
+        tensor([2., 2., 2.])
+        >>> store.versions()
+        [0, 1]
+    """
+
+    def __init__(self, path: str, track_versions: bool = True):
+        self.path = path
+        self.track_versions = track_versions
+        mkdirs_if_not_exist(os.path.join(path, 'objects'))
+        mkdirs_if_not_exist(os.path.join(path, 'manifests'))
+        # name -> (a view keeping the tensor storage alive, its version, hash)
+        self._hashes: Dict[str, Tuple[torch.Tensor, int, str]] = {}
+
+    def _manifest_path(self, version: int) -> str:
+        return os.path.join(self.path, 'manifests', f'{version:08d}.json')
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.path, 'objects', digest[:2], f'{digest}.bin')
+
+    def versions(self) -> List[int]:
+        """all saved versions in order."""
+        paths = glob.glob(os.path.join(self.path, 'manifests', '*.json'))
+        return sorted(int(os.path.splitext(os.path.basename(p))[0]) for p in paths)
+
+    def manifest(self, version: Optional[int] = None) -> Dict[str, Any]:
+        """the manifest of ``version``, defaults to the latest version."""
+        if version is None:
+            version = self._latest()
+        return load_json(self._manifest_path(version))
+
+    def _latest(self) -> int:
+        versions = self.versions()
+        if not versions:
+            raise FileNotFoundError(f'no versions saved in {self.path}.')
+        return versions[-1]
+
+    def _cached_hash(self, name: str, tensor: torch.Tensor) -> Optional[str]:
+        cached = self._hashes.get(name)
+        if not self.track_versions or cached is None:
+            return None
+        view, version, digest = cached
+        # the cached view keeps its storage alive so an equal data_ptr is the same memory.
+        same = (
+            view.data_ptr() == tensor.data_ptr()
+            and view._version == version
+            and view.shape == tensor.shape
+            and view.stride() == tensor.stride()
+            and view.dtype == tensor.dtype
+            and view.device == tensor.device
+        )
+        return digest if same else None
+
+    def _put(self, name: str, tensor: torch.Tensor, written: List[str]) -> Dict[str, Any]:
+        digest = self._cached_hash(name, tensor)
+        if digest is None:
+            data = tensor_bytes(tensor)
+            digest = hashlib.blake2b(data, digest_size=_HASH_SIZE).hexdigest()
+            path = self._object_path(digest)
+            if not os.path.exists(path):
+                mkdirs_if_not_exist(os.path.dirname(path))
+                with atomic_path(path) as tmp_path:
+                    with open(tmp_path, 'wb') as f:
+                        f.write(data)
+                written.append(name)
+            if self.track_versions:
+                self._hashes[name] = (tensor.detach(), tensor._version, digest)
+        return {'hash': digest, 'dtype': dtype_name(tensor.dtype), 'shape': list(tensor.shape)}
+
+    def _encode(self, obj: Any, name: str, written: List[str]) -> Any:
+        if isinstance(obj, torch.Tensor):
+            return {'__tensor__': self._put(name, obj, written)}
+        if isinstance(obj, dict):
+            encoded = {
+                '__dict__': [
+                    [k, self._encode(v, f'{name}/{k}', written)] for k, v in obj.items()
+                ],
+                'ordered': isinstance(obj, OrderedDict),
+            }
+            if hasattr(obj, '_metadata'):
+                encoded['metadata'] = obj._metadata  # type: ignore
+            return encoded
+        if isinstance(obj, (tuple, list)):
+            items = [self._encode(v, f'{name}/{i}', written) for i, v in enumerate(obj)]
+            return {'__tuple__': items} if isinstance(obj, tuple) else items
+        if obj is None or isinstance(obj, (bool, int, float, str)):
+            return obj
+        raise TypeError(f'{self.__class__.__name__} can not store objects of type {type(obj)}.')
+
+    def save(self, items: Dict[str, Any], **meta) -> int:
+        """save a new version of ``items`` and return its version number.
+
+        Args:
+            items: a dict of name to nested dicts, lists and tuples of tensors and python
+                primitives, for instance ``{'state': model.state_dict()}``.
+            meta: any extra json serializable info to keep in the manifest.
+        """
+        versions = self.versions()
+        version = versions[-1] + 1 if versions else 0
+        written: List[str] = []
+        encoded = {name: self._encode(value, name, written) for name, value in items.items()}
+        manifest = {'version': version, 'meta': meta, 'written': written, 'items': encoded}
+        save_json(manifest, self._manifest_path(version))
+        return version
+
+    def _read(self, spec: Dict[str, Any]) -> torch.Tensor:
+        dtype = getattr(torch, spec['dtype'])
+        data = torch.empty(spec['shape'], dtype=dtype)
+        if data.nelement():
+            path = self._object_path(spec['hash'])
+            with open(path, 'rb') as f:
+                read_exactly(f, tensor_bytes(data), path)
+        return data
+
+    def _decode(self, obj: Any) -> Any:
+        if isinstance(obj, list):
+            return [self._decode(v) for v in obj]
+        if not isinstance(obj, dict):
+            return obj
+        if '__tensor__' in obj:
+            return self._read(obj['__tensor__'])
+        if '__tuple__' in obj:
+            return tuple(self._decode(v) for v in obj['__tuple__'])
+        out = OrderedDict() if obj['ordered'] else {}
+        for k, v in obj['__dict__']:
+            out[k] = self._decode(v)
+        if 'metadata' in obj:
+            out._metadata = obj['metadata']  # type: ignore
+        return out
+
+    def load(self, version: Optional[int] = None) -> Dict[str, Any]:
+        """load the items saved in ``version``, defaults to the latest version."""
+        manifest = self.manifest(version)
+        return {name: self._decode(value) for name, value in manifest['items'].items()}
+
+    def _referenced(self, obj: Any) -> List[str]:
+        if isinstance(obj, list):
+            return [h for v in obj for h in self._referenced(v)]
+        if not isinstance(obj, dict):
+            return []
+        if '__tensor__' in obj:
+            return [obj['__tensor__']['hash']]
+        if '__tuple__' in obj:
+            return self._referenced(obj['__tuple__'])
+        return [h for _, v in obj['__dict__'] for h in self._referenced(v)]
+
+    def remove(self, version: int):
+        """remove ``version`` and any objects no other version references."""
+        os.remove(self._manifest_path(version))
+        referenced = set()
+        for other in self.versions():
+            referenced.update(self._referenced(list(self.manifest(other)['items'].values())))
+        for path in glob.glob(os.path.join(self.path, 'objects', '*', '*.bin')):
+            if os.path.splitext(os.path.basename(path))[0] not in referenced:
+                os.remove(path)
+        # hashes of removed objects must not be reused.
+        self._hashes = {k: v for k, v in self._hashes.items() if v[2] in referenced}
@@ -0,0 +1,165 @@
+"""a pickle free flat file format for named tensors.
+
+a file is a small fixed size prefix, a json header describing each tensor and one contiguous
+data region where every tensor starts at an aligned offset. since nothing is unpickled loading
+is safe, and tensors can be read lazily one at a time or as zero copy views of a memory map.
+"""
+from typing import Any, Dict, Iterator, Mapping, Optional, Sequence
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import struct
+import torch
+from hearth._file_utils import atomic_path, dtype_name, read_exactly, tensor_bytes
+
+_MAGIC = b'HEARTHTF'
+_PREFIX = struct.Struct('<8sQ')
+_ALIGNMENT = 64
+
+
+def _aligned(n: int) -> int:
+    return n + (-n % _ALIGNMENT)
+
+
+def save_tensors(
+    tensors: Mapping[str, torch.Tensor], path: str, metadata: Optional[Dict[str, Any]] = None
+):
+    """save a mapping of names to tensors (such as a state dict) to ``path``.
+
+    tensors are always written as contiguous cpu tensors and tensors sharing memory are written
+    separately, so they will no longer share memory once loaded.
+
+    Args:
+        tensors: mapping of names to tensors.
+        path: file to write, it is written atomically.
+        metadata: optional json serializable info to keep in the header. Defaults to None.
+    """
+    specs: Dict[str, Dict[str, Any]] = {}
+    offset = 0
+    for name, tensor in tensors.items():
+        nbytes = tensor.element_size() * tensor.nelement()
+        specs[name] = {
+            'dtype': dtype_name(tensor.dtype),
+            'shape': list(tensor.shape),
+            'offset': offset,
+            'nbytes': nbytes,
+        }
+        offset = _aligned(offset + nbytes)
+
+    header = json.dumps({'tensors': specs, 'metadata': metadata or {}}).encode('utf-8')
+    # pad the header with spaces so the data region starts aligned.
+    header += b' ' * (-(_PREFIX.size + len(header)) % _ALIGNMENT)
+    with atomic_path(path) as tmp_path:
+        with open(tmp_path, 'wb') as f:
+            f.write(_PREFIX.pack(_MAGIC, len(header)))
+            f.write(header)
+            for name, tensor in tensors.items():
+                f.write(b'\0' * (-f.tell() % _ALIGNMENT))
+                if tensor.nelement():
+                    f.write(tensor_bytes(tensor))
+
+
+class TensorFile:
+    """read tensors saved with :func:`save_tensors`.
+
+    only the header is read when opening a file, tensors are read when asked for, either into
+    new memory or as views of a memory mapped file which are only paged in from disk as they are
+    used.
+
+    Args:
+        path: path of the file to read.
+
+    Example:
+        >>> import torch
+        >>> from hearth.tensorfile import TensorFile, save_tensors
+        >>>
+        >>> path = str(getfixture('tmpdir').join('weights.tensors'))
+        >>> save_tensors({'weight': torch.ones(2, 3), 'bias': torch.zeros(2)}, path)
+        >>> tensors = TensorFile(path)
+        >>> list(tensors)
+        ['weight', 'bias']
+        >>> tensors.info('bias')
+        {'dtype': 'float32', 'shape': [2], 'offset': 64, 'nbytes': 8}
+        >>> tensors['bias']
+        tensor([0., 0.])
+        >>> tensors.load(['weight'], mmap=True)
+        {'weight': tensor([[1., 1., 1.],
+                [1., 1., 1.]])}
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            magic, header_size = _PREFIX.unpack(f.read(_PREFIX.size))
+            if magic != _MAGIC:
+                raise ValueError(f'{path} is not a {self.__class__.__name__}.')
+            header = json.loads(f.read(header_size).decode('utf-8'))
+        self._data_start = _PREFIX.size + header_size
+        self._specs: Dict[str, Dict[str, Any]] = header['tensors']
+        self.metadata: Dict[str, Any] = header['metadata']
+        self._mapped: Optional[torch.Tensor] = None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._specs)
+
+    def __len__(self) -> int:
+        return len(self._specs)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._specs
+
+    def keys(self):
+        return self._specs.keys()
+
+    def info(self, name: str) -> Dict[str, Any]:
+        """the dtype, shape, offset and size in bytes of the tensor ``name``."""
+        return dict(self._specs[name])
+
+    def _view(self, data: torch.Tensor, spec: Dict[str, Any]) -> torch.Tensor:
+        return data.view(getattr(torch, spec['dtype'])).view(spec['shape'])
+
+    def _map(self) -> torch.Tensor:
+        if self._mapped is None:
+            # a private mapping so tensors can be modified without changing the file.
+            size = os.path.getsize(self.path)
+            self._mapped = torch.from_file(self.path, shared=False, size=size, dtype=torch.uint8)
+        return self._mapped
+
+    def get(self, name: str, mmap: bool = False) -> torch.Tensor:
+        """read the tensor ``name``.
+
+        Args:
+            name: name of the tensor.
+            mmap: return a view of the memory mapped file rather than reading the tensor into
+                new memory. Defaults to False.
+        """
+        spec = self._specs[name]
+        if mmap:
+            data = self._map().narrow(0, self._data_start + spec['offset'], spec['nbytes'])
+            return self._view(data, spec)
+        data = torch.empty(spec['nbytes'], dtype=torch.uint8)
+        if spec['nbytes']:
+            with open(self.path, 'rb') as f:
+                f.seek(self._data_start + spec['offset'])
+                read_exactly(f, tensor_bytes(data), self.path)
+        return self._view(data, spec)
+
+    def __getitem__(self, name: str) -> torch.Tensor:
+        return self.get(name)
+
+    def load(
+        self, names: Optional[Sequence[str]] = None, mmap: bool = False, workers: int = 1
+    ) -> Dict[str, torch.Tensor]:
+        """read many tensors at once.
+
+        Args:
+            names: names of the tensors to read. Defaults to None which reads all of them.
+            mmap: return views of the memory mapped file, see :meth:`get`. Defaults to False.
+            workers: number of threads used to read tensors in parallel when ``mmap`` is
+                False. Defaults to 1.
+        """
+        names = list(self._specs) if names is None else list(names)
+        if mmap or workers <= 1:
+            return {name: self.get(name, mmap=mmap) for name in names}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return dict(zip(names, executor.map(self.get, names)))
@@ -1,19 +1,56 @@
 """transforms are basic operations that can be composed as part of a `Pipeline`_
 """
 from abc import ABC, abstractmethod
-from typing import TypeVar, Optional, Union, Generic
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import repeat
+from typing import (
+    Any,
+    Callable,
+    TypeVar,
+    Optional,
+    Union,
+    Generic,
+    Hashable,
+    Iterable,
+    Iterator,
+    Sequence,
+    Tuple,
+    Dict,
+)
+import threading
+import time
 
 import torch
 import numpy as np
+from torch.utils.data import DataLoader, Dataset, get_worker_info
+
+from hearth._cache import MemoryCache, DiskCache, MISSING, nbytes
 
 InT = TypeVar('InT')
 OutT = TypeVar('OutT')
 TensorApplicable = Union[torch.Tensor, np.ndarray, int, float]
 
 
+def _bounded_map(
+    executor: Executor, fn: Callable, items: Iterable[Tuple], max_in_flight: int
+) -> Iterator:
+    # like executor.map but yields in order while only submitting max_in_flight items ahead.
+    pending: deque = deque()
+    for args in items:
+        if len(pending) >= max_in_flight:
+            yield pending.popleft().result()
+        pending.append(executor.submit(fn, *args))
+    while pending:
+        yield pending.popleft().result()
+
+
 class Transform(ABC, Generic[InT, OutT]):
     """Abstract base class for all transforms."""
 
+    #: if ``True`` a :class:`Pipeline` will pass the sample ``key`` to this transform.
+    keyed: bool = False
+
     def _repr_args(self):
         return ''
 
@@ -24,30 +61,71 @@ class Transform(ABC, Generic[InT, OutT]):
     def __call__(self, x: InT) -> OutT:
         return NotImplemented
 
+    def batch_call(self, batch):
+        """apply this transform to a collated batch of samples.
+
+        by default the transform is called on each sample and the results are stacked,
+        transforms that can be vectorized over the batch dimension override this.
+        """
+        return torch.stack([self(x) for x in batch])
+
+
+def _is_stackable(x) -> bool:
+    if not isinstance(x, (list, tuple)) or not x:
+        return False
+    if not isinstance(x[0], (torch.Tensor, np.ndarray)):
+        return False
+    shape = tuple(x[0].shape)
+    return all(isinstance(v, (torch.Tensor, np.ndarray)) and tuple(v.shape) == shape for v in x)
+
 
 class Tensorize(Transform[InT, torch.Tensor]):
     """Tensorizes the given input with optional dtype and device
 
+    a list or tuple of equally shaped arrays or tensors is stacked once into a single
+    preallocated tensor.
+
     Args:
         dtype : an optional string or torch.dtype. Defaults to None.
-        device : [description]. Defaults to 'cpu'.
+        device : the device to put the tensor on. Defaults to None which leaves tensors on
+            their current device and puts other inputs on the cpu.
+        copy : if ``False`` tensors, numpy arrays and objects supporting the buffer protocol
+            (such as ``bytearray`` or ``memoryview``) share memory with the output when dtype
+            and device already match, otherwise the input is always copied. Defaults to True.
 
     Example:
         >>> import torch
+        >>> import numpy as np
         >>> from hearth.transforms import Tensorize
         >>>
         >>> transform = Tensorize(dtype='float32')
         >>> transform([1.1, 2.2, 3.3])
         tensor([1.1000, 2.2000, 3.3000])
+
+        with ``copy=False`` matching arrays are not copied:
+
+        >>> x = np.zeros(3, dtype='float32')
+        >>> out = Tensorize(dtype='float32', copy=False)(x)
+        >>> x[0] = 1.0
+        >>> out
+        tensor([1., 0., 0.])
+
+        lists of arrays are stacked:
+
+        >>> transform([np.ones(2), np.zeros(2)])
+        tensor([[1., 1.],
+                [0., 0.]])
     """
 
     def __init__(
         self,
         dtype: Optional[Union[str, torch.dtype]] = None,
-        device: Union[str, torch.device] = 'cpu',
+        device: Optional[Union[str, torch.device]] = None,
+        copy: bool = True,
     ):
         self._dtype = self._get_dtype(dtype)
         self._device = device
+        self._copy = copy
 
     def _get_dtype(self, dtype):
         if dtype is None:
@@ -65,11 +143,39 @@ class Tensorize(Transform[InT, torch.Tensor]):
             )
 
     def _repr_args(self):
-        return f'dtype={self._dtype}, device={self._device}'
+        return f'dtype={self._dtype}, device={self._device}, copy={self._copy}'
+
+    def _stack(self, xs) -> torch.Tensor:
+        tensors = [torch.as_tensor(x) for x in xs]
+        dtype = self._dtype if self._dtype is not None else tensors[0].dtype
+        device = self._device if self._device is not None else tensors[0].device
+        out = torch.empty((len(tensors), *tensors[0].shape), dtype=dtype, device=device)
+        # copying each sample straight into the output casts and moves it in a single pass.
+        for row, tensor in zip(out, tensors):
+            row.copy_(tensor)
+        return out
+
+    def _as_tensor(self, x) -> torch.Tensor:
+        if not isinstance(x, (torch.Tensor, np.ndarray)):
+            try:
+                x = np.asarray(memoryview(x))
+            except TypeError:
+                pass
+        return torch.as_tensor(x, dtype=self._dtype, device=self._device)
 
     def __call__(self, x: InT) -> torch.Tensor:
+        if _is_stackable(x):
+            return self._stack(x)
+        if not self._copy:
+            return self._as_tensor(x)
+        if isinstance(x, torch.Tensor):
+            dtype = self._dtype if self._dtype is not None else x.dtype
+            return x.detach().to(device=self._device, dtype=dtype, copy=True)
         return torch.tensor(x, dtype=self._dtype, device=self._device)
 
+    def batch_call(self, batch) -> torch.Tensor:
+        return self(batch)
+
 
 class Normalize(Transform):
     """Normalize a tensor or array from a fixed mean and std
@@ -107,12 +213,391 @@ class Normalize(Transform):
         self.mean = mean
         self.std = std
 
+    @classmethod
+    def fit(
+        cls,
+        data: Iterable,
+        dims: Optional[Sequence[int]] = None,
+        unbiased: bool = True,
+        workers: int = 1,
+        processes: bool = False,
+        batch_size: int = 1024,
+    ) -> 'Normalize':
+        """create a Normalize from the mean and std of ``data`` computed in one streaming pass.
+
+        statistics of each batch are merged with the parallel form of Welford's algorithm in
+        float64, so the result matches computing them over all data at once without ever
+        holding more than a few batches in memory.
+
+        Args:
+            data: a tensor, array, dataset, DataLoader or iterable of batches. tensors and
+                arrays are split along their first dimension and datasets are read with a
+                DataLoader, both in batches of ``batch_size``. for ``(x, y)`` batches only ``x``
+                is used.
+            dims: dimensions of each batch to compute statistics over, these must include the
+                batch dimension ``0``. any other dimensions (for instance channels) get their own
+                mean and std. Defaults to None which reduces over all dimensions.
+            unbiased: use the unbiased estimate of the std like :func:`torch.std`.
+                Defaults to True.
+            workers: number of threads (or processes) computing batch statistics in parallel.
+                Defaults to 1.
+            processes: use a process pool instead of threads, batches must be picklable.
+                Defaults to False.
+            batch_size: batch size used to split tensors and arrays and read datasets.
+                Defaults to 1024.
+
+        Example:
+            >>> import torch
+            >>> from hearth.transforms import Normalize
+            >>>
+            >>> x = torch.linspace(0, 16, 48).reshape(4, 4, 3)
+            >>> transform = Normalize.fit(x.split(2), dims=(0, 1))
+            >>> transform
+            Normalize(mean=tensor([7.6596, 8.0000, 8.3404]), std=tensor([4.8622, 4.8622, 4.8622]))
+            >>> Normalize.fit(x.split(2))  # doctest: +ELLIPSIS
+            Normalize(mean=8.0, std=4.7659...)
+        """
+        if dims is not None and 0 not in dims:
+            # statistics of batches can only be merged when the batch dimension is reduced.
+            raise ValueError(f'dims must include the batch dimension 0 but got {tuple(dims)}.')
+        if isinstance(data, (torch.Tensor, np.ndarray)):
+            # iterating a tensor would give single rows without the batch dimension.
+            data = _chunks(data, batch_size)
+        elif isinstance(data, Dataset) and not isinstance(data, DataLoader):
+            data = DataLoader(data, batch_size=batch_size)
+        items = ((batch, dims) for batch in data)
+        if workers > 1:
+            pool = ProcessPoolExecutor if processes else ThreadPoolExecutor
+            with pool(max_workers=workers) as executor:
+                moments = _merge_all(_bounded_map(executor, _moments, items, 2 * workers))
+        else:
+            moments = _merge_all(_moments(*args) for args in items)
+        count, mean, m2 = moments
+        std = (m2 / (count - 1 if unbiased else count)).sqrt()
+        mean, std = mean.to(torch.get_default_dtype()), std.to(torch.get_default_dtype())
+        if not mean.dim():
+            return cls(mean=mean.item(), std=std.item())
+        return cls(mean=mean, std=std)
+
     def _repr_args(self):
         return f'mean={self.mean}, std={self.std}'
 
     def __call__(self, x):
         return (x - self.mean) / self.std
 
+    def batch_call(self, batch: torch.Tensor) -> torch.Tensor:
+        # mean and std broadcast over trailing dimensions so the whole batch is normalized
+        # at once, they are moved to the batch device so this works after device transfer.
+        if not isinstance(batch, torch.Tensor):
+            return self(batch)
+        dtype = batch.dtype if batch.is_floating_point() else None
+        mean = torch.as_tensor(self.mean, dtype=dtype, device=batch.device)
+        std = torch.as_tensor(self.std, dtype=dtype, device=batch.device)
+        return (batch - mean) / std
+
+
+def _chunks(x: Union[torch.Tensor, np.ndarray], size: int) -> Iterator:
+    for start in range(0, len(x), size):
+        yield x[start:][:size]
+
+
+def _inputs(batch: Any) -> torch.Tensor:
+    if isinstance(batch, (tuple, list)):
+        batch = batch[0]
+    return torch.as_tensor(batch)
+
+
+def _moments(batch: Any, dims: Optional[Sequence[int]]) -> Tuple[int, torch.Tensor, torch.Tensor]:
+    x = _inputs(batch).to(torch.float64)
+    dims = tuple(range(x.dim())) if dims is None else tuple(dims)
+    count = 1
+    for dim in dims:
+        count *= x.shape[dim]
+    mean = x.mean(dim=dims, keepdim=True)
+    m2 = ((x - mean) ** 2).sum(dim=dims)
+    return count, mean.reshape(m2.shape), m2
+
+
+def _merge_all(moments: Iterable[Tuple[int, torch.Tensor, torch.Tensor]]):
+    # chan et al's parallel merge of counts, means and sums of squared deviations.
+    total = None
+    for count, mean, m2 in moments:
+        if total is None:
+            total = (count, mean, m2)
+            continue
+        total_count, total_mean, total_m2 = total
+        merged_count = total_count + count
+        delta = mean - total_mean
+        total = (
+            merged_count,
+            total_mean + delta * (count / merged_count),
+            total_m2 + m2 + delta ** 2 * (total_count * count / merged_count),
+        )
+    if total is None:
+        raise ValueError('can not fit statistics to empty data.')
+    return total
+
+
+def _is_scalar(value) -> bool:
+    return isinstance(value, (int, float))
+
+
+def _fold(first: Normalize, second: Normalize) -> Normalize:
+    # ((x - m1) / s1 - m2) / s2 == (x - (m1 + m2 * s1)) / (s1 * s2)
+    m1, s1, m2, s2 = first.mean, first.std, second.mean, second.std
+    if not all(map(_is_scalar, (m1, s1, m2, s2))):
+        m1, s1, m2, s2 = (torch.as_tensor(v) for v in (m1, s1, m2, s2))
+    return Normalize(mean=m1 + m2 * s1, std=s1 * s2)
+
+
+def _operand(value, x: torch.Tensor, dtype: Optional[torch.dtype] = None):
+    if _is_scalar(value):
+        return value
+    return torch.as_tensor(value, dtype=dtype, device=x.device)
+
+
+class FusedNormalize(Transform):
+    """a :class:`Normalize` that multiplies by a precomputed ``1 / std``, optionally fused with
+    the :class:`Tensorize` before it.
+
+    this is generally created by :meth:`Pipeline.optimize` rather than directly. when fused with
+    a copying :class:`Tensorize` the output is normalized in place in the tensor tensorize
+    allocated, so there is a single allocation per sample.
+
+    Args:
+        mean: may be float, tensor or array.
+        std: may be float, tensor or array.
+        tensorize: optional :class:`Tensorize` to apply first. Defaults to None.
+        inplace: if ``True`` inputs are assumed to be owned by this transform and floating point
+            tensors are normalized in place. Defaults to False.
+
+    Example:
+        >>> import torch
+        >>> from hearth.transforms import FusedNormalize, Tensorize
+        >>>
+        >>> transform = FusedNormalize(mean=1.5, std=1.1859, tensorize=Tensorize(dtype='float32'))
+        >>> transform
+        FusedNormalize(Tensorize(dtype=torch.float32, device=None, copy=True), mean=1.5,\
+ std=1.1859, inplace=False)
+        >>> transform([0.0, 0.75, 1.5, 2.25, 3.0])
+        tensor([-1.2649, -0.6324,  0.0000,  0.6324,  1.2649])
+    """
+
+    def __init__(
+        self,
+        mean: TensorApplicable,
+        std: TensorApplicable,
+        tensorize: Optional[Tensorize] = None,
+        inplace: bool = False,
+    ):
+        self.mean = mean
+        self.std = std
+        self.tensorize = tensorize
+        self.inplace = inplace
+        self._scale = 1 / std
+
+    def _repr_args(self):
+        tensorize = f'{self.tensorize!r}, ' if self.tensorize is not None else ''
+        return f'{tensorize}mean={self.mean}, std={self.std}, inplace={self.inplace}'
+
+    def _owns_output(self) -> bool:
+        # a copying tensorize always allocates a new tensor for its output.
+        return self.inplace or (self.tensorize is not None and self.tensorize._copy)
+
+    def _normalize(self, x, batch: bool = False):
+        if not isinstance(x, torch.Tensor):
+            return (x - self.mean) * self._scale
+        # like Normalize, floating point batches keep their dtype while samples are promoted.
+        dtype = x.dtype if batch and x.is_floating_point() else None
+        mean, scale = _operand(self.mean, x, dtype), _operand(self._scale, x, dtype)
+        promotes = torch.result_type(x, mean) != x.dtype or torch.result_type(x, scale) != x.dtype
+        if self._owns_output() and x.is_floating_point() and not promotes:
+            return x.sub_(mean).mul_(scale)
+        return (x - mean) * scale
+
+    def __call__(self, x):
+        if self.tensorize is not None:
+            x = self.tensorize(x)
+        return self._normalize(x)
+
+    def batch_call(self, batch):
+        if self.tensorize is not None:
+            batch = self.tensorize.batch_call(batch)
+        return self._normalize(batch, batch=True)
+
+
+class Cached(Transform):
+    """Caches the output of a deterministic transform by sample key (generally the index).
+
+    outputs are kept in a least recently used in memory cache bounded by ``max_bytes`` and
+    optionally written to an on disk cache in ``cache_dir`` that persists across runs and is read
+    back through memory mapping. Tensors and :class:`hearth.containers.TensorDict` outputs can
+    be cached on disk, other outputs are only cached in memory. the on disk cache is cleared
+    when the ``repr`` of ``transform`` differs from the one it was written with.
+
+    Note:
+        cached outputs are shared between calls so any transforms applied after this
+        one must not modify their inputs in place.
+
+    Args:
+        transform: a deterministic transform (often a :class:`Pipeline`) to cache.
+        max_bytes: the maximum size of the in memory cache in bytes. Defaults to 1GiB.
+        cache_dir: optional directory for the on disk cache. Defaults to None.
+
+    Example:
+        >>> import torch
+        >>> from hearth.transforms import Cached, Tensorize
+        >>>
+        >>> transform = Cached(Tensorize(dtype='float32'), max_bytes=1024)
+        >>> transform
+        Cached(Tensorize(dtype=torch.float32, device=None, copy=True),\
+ max_bytes=1024, cache_dir=None)
+        >>> transform([1, 2, 3], key=0)
+        tensor([1., 2., 3.])
+
+        calling again with the same key returns the cached output without calling the
+        transform:
+
+        >>> transform([4, 5, 6], key=0)
+        tensor([1., 2., 3.])
+
+        with no key the transform is just applied:
+
+        >>> transform([4, 5, 6])
+        tensor([4., 5., 6.])
+    """
+
+    keyed = True
+
+    def __init__(
+        self, transform: Transform, max_bytes: int = 2 ** 30, cache_dir: Optional[str] = None
+    ):
+        self.transform = transform
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self._open()
+
+    def _open(self):
+        # caches may be shared by threads in :meth:`Pipeline.map`.
+        self._lock = threading.Lock()
+        self._memory = MemoryCache(self.max_bytes)
+        self._disk = None
+        if self.cache_dir is not None:
+            # the cache is invalidated whenever the wrapped transform's config changes.
+            self._disk = DiskCache(self.cache_dir, config=repr(self.transform))
+
+    def _repr_args(self):
+        return f'{self.transform!r}, max_bytes={self.max_bytes}, cache_dir={self.cache_dir}'
+
+    def _apply(self, x, key):
+        if self.transform.keyed:
+            return self.transform(x, key=key)
+        return self.transform(x)
+
+    def __call__(self, x, key: Optional[Hashable] = None):
+        if key is None:
+            return self._apply(x, key)
+        with self._lock:
+            out = self._memory.get(key)
+            if out is MISSING and self._disk is not None:
+                out = self._disk.get(key)
+                if out is not MISSING:
+                    self._memory.put(key, out)
+        if out is not MISSING:
+            return out
+        out = self._apply(x, key)
+        with self._lock:
+            self._memory.put(key, out)
+            if self._disk is not None:
+                self._disk.put(key, out)
+        return out
+
+    def batch_call(self, batch):
+        # batches have no sample keys so they are never cached.
+        return self.transform.batch_call(batch)
+
+    def __getstate__(self):
+        # caches are per process, workers start with an empty memory cache and remap the disk.
+        state = dict(self.__dict__)
+        del state['_lock'], state['_memory'], state['_disk']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._open()
+
+
+class TransformStats:
+    """call counts, cumulative time and output bytes for each transform in a :class:`Pipeline`.
+
+    counters are kept in a shared memory block with a row per ``DataLoader`` worker (and one for
+    the main process), so counts recorded in workers can be read from the main process, for
+    instance by :class:`hearth.callbacks.TransformProfiler`. this is generally created with
+    :meth:`Pipeline.instrument` rather than directly.
+
+    Args:
+        names: a name for each stage.
+        max_workers: the number of worker rows in the counter block, workers with higher ids
+            share rows. Defaults to 32.
+    """
+
+    fields = ('calls', 'seconds', 'bytes')
+
+    def __init__(self, names: Sequence[str], max_workers: int = 32):
+        self.names = list(names)
+        self.max_workers = max_workers
+        self._counters = torch.zeros(max_workers + 1, len(self.names), len(self.fields))
+        self._counters = self._counters.double().share_memory_()
+        self._open()
+
+    def _open(self):
+        self._lock = threading.Lock()
+        # updating through a numpy view avoids allocating a tensor per record.
+        self._array = self._counters.numpy()
+
+    def _row(self) -> int:
+        worker = get_worker_info()
+        return 0 if worker is None else worker.id % self.max_workers + 1
+
+    def record(self, stage: int, seconds: float, size: int):
+        """record a single call of ``stage`` taking ``seconds`` with an output of ``size`` bytes."""
+        row = self._row()
+        with self._lock:
+            counters = self._array[row, stage]
+            counters[0] += 1
+            counters[1] += seconds
+            counters[2] += size
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """totals across all processes for each stage by name."""
+        totals = self._counters.sum(dim=0).tolist()
+        return {name: dict(zip(self.fields, values)) for name, values in zip(self.names, totals)}
+
+    def reset(self):
+        """zero all counters."""
+        with self._lock:
+            self._counters.zero_()
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(names={self.names}, max_workers={self.max_workers})'
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state['_lock'], state['_array']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._open()
+
+
+def _flatten(transforms):
+    for transform in transforms:
+        if isinstance(transform, Pipeline):
+            yield from _flatten(transform)
+        else:
+            yield transform
+
 
 class Pipeline(Transform):
     """Pipeline applies a chain of transforms to an input in order.
@@ -124,7 +609,8 @@ class Pipeline(Transform):
         >>>
         >>> pipeline = Pipeline(Tensorize(dtype='float32'), Normalize(mean=-0.34, std=1.75))
         >>> pipeline
-        Pipeline(Tensorize(dtype=torch.float32, device=cpu), Normalize(mean=-0.34, std=1.75))
+        Pipeline(Tensorize(dtype=torch.float32, device=None, copy=True),\
+ Normalize(mean=-0.34, std=1.75))
 
         >>> len(pipeline)
         2
@@ -132,10 +618,46 @@ class Pipeline(Transform):
         >>> x = np.array([-3.0, -1.5, .3, .4, 2.1])
         >>> pipeline(x)
         tensor([-1.5200, -0.6629,  0.3657,  0.4229,  1.3943])
+
+        use :meth:`cache` to cache a deterministic prefix of the pipeline by sample key:
+
+        >>> cached = pipeline.cache(2)
+        >>> cached
+        Pipeline(Cached(Pipeline(Tensorize(dtype=torch.float32, device=None, copy=True),\
+ Normalize(mean=-0.34, std=1.75)), max_bytes=1073741824, cache_dir=None))
+        >>> cached(x, key=0)
+        tensor([-1.5200, -0.6629,  0.3657,  0.4229,  1.3943])
+
+        use :meth:`batch_call` to apply the pipeline to a whole batch at once, each transform
+        is vectorized over the batch where it can be:
+
+        >>> pipeline.batch_call(np.stack([x, x]))
+        tensor([[-1.5200, -0.6629,  0.3657,  0.4229,  1.3943],
+                [-1.5200, -0.6629,  0.3657,  0.4229,  1.3943]])
+
+        use :meth:`optimize` to fold and fuse normalizations:
+
+        >>> optimized = Pipeline(pipeline, Normalize(mean=0.5, std=2.0)).optimize()
+        >>> optimized
+        Pipeline(FusedNormalize(Tensorize(dtype=torch.float32, device=None, copy=True),\
+ mean=0.535, std=3.5, inplace=False))
+        >>> optimized(x)
+        tensor([-1.0100, -0.5814, -0.0671, -0.0386,  0.4471])
+
+        use :meth:`instrument` to record call counts, time and output bytes for each transform:
+
+        >>> pipeline = pipeline.instrument()
+        >>> _ = pipeline(x)
+        >>> pipeline.stats.summary()  # doctest: +ELLIPSIS
+        {'tensorize_0': {'calls': 1.0, 'seconds': ..., 'bytes': 20.0},\
+ 'normalize_1': {'calls': 1.0, 'seconds': ..., 'bytes': 20.0}}
     """
 
+    keyed = True
+
     def __init__(self, *transforms):
         self._transforms = transforms
+        self.stats: Optional[TransformStats] = None
 
     def _repr_args(self):
         return ', '.join(map('{!r}'.format, self._transforms))
@@ -146,7 +668,133 @@ class Pipeline(Transform):
     def __getitem__(self, i):
         return self._transforms[i]
 
-    def __call__(self, x):
+    def cache(
+        self, n: int, max_bytes: int = 2 ** 30, cache_dir: Optional[str] = None
+    ) -> 'Pipeline':
+        """get a new pipeline with the first ``n`` (deterministic) transforms :class:`Cached`.
+
+        Args:
+            n: number of transforms from the start of this pipeline to cache.
+            max_bytes: the maximum size of the in memory cache in bytes. Defaults to 1GiB.
+            cache_dir: optional directory for the on disk cache. Defaults to None.
+        """
+        prefix = Cached(Pipeline(*self[:n]), max_bytes=max_bytes, cache_dir=cache_dir)
+        return self.__class__(prefix, *self[n:])
+
+    def instrument(self, max_workers: int = 32) -> 'Pipeline':
+        """start recording call counts, time and output bytes of each transform in ``stats``.
+
+        instrument before creating ``DataLoader`` workers so they share the counters.
+
+        Args:
+            max_workers: the number of worker rows in the shared counter block.
+                Defaults to 32.
+        """
+        # names are identifiers so they can be stored in :class:`hearth.callbacks.History`.
+        names = [f'{t.__class__.__name__.lower()}_{i}' for i, t in enumerate(self)]
+        self.stats = TransformStats(names, max_workers=max_workers)
+        return self
+
+    def _apply(self, transform, x, key):
+        if transform.keyed:
+            return transform(x, key=key)
+        return transform(x)
+
+    def _timed(self, fn, stage, *args):
+        start = time.perf_counter()
+        out = fn(*args)
+        self.stats.record(stage, time.perf_counter() - start, nbytes(out))  # type: ignore
+        return out
+
+    def __call__(self, x, key: Optional[Hashable] = None):
+        if self.stats is not None:
+            for stage, transform in enumerate(self):
+                x = self._timed(self._apply, stage, transform, x, key)
+            return x
         for transform in self:
-            x = transform(x)
+            x = self._apply(transform, x, key)
         return x
+
+    def batch_call(self, batch):
+        for stage, transform in enumerate(self):
+            if self.stats is not None:
+                batch = self._timed(transform.batch_call, stage, batch)
+            else:
+                batch = transform.batch_call(batch)
+        return batch
+
+    def map(
+        self,
+        samples: Iterable,
+        workers: int = 1,
+        keys: Optional[Iterable[Hashable]] = None,
+        max_in_flight: Optional[int] = None,
+    ) -> Iterator:
+        """lazily apply this pipeline to each of ``samples`` using a pool of threads.
+
+        outputs are yielded in the same order as ``samples``. at most ``max_in_flight`` samples
+        are read from ``samples`` ahead of the output being consumed, so memory stays bounded
+        for large iterators. threads only run in parallel while transforms release the GIL, as
+        most numpy and torch operations on reasonably sized inputs do.
+
+        Args:
+            samples: an iterable of samples.
+            workers: number of threads, ``1`` applies the pipeline serially in the calling
+                thread. Defaults to 1.
+            keys: optional iterable of sample keys for keyed transforms such as :class:`Cached`.
+                Defaults to None.
+            max_in_flight: the maximum number of samples being transformed or waiting to be
+                yielded. Defaults to None which is ``2 * workers``.
+
+        Example:
+            >>> import numpy as np
+            >>> from hearth.transforms import Normalize, Tensorize, Pipeline
+            >>>
+            >>> pipeline = Pipeline(Tensorize(dtype='float32'), Normalize(mean=1.0, std=2.0))
+            >>> list(pipeline.map([np.array([1.0, 3.0]), np.array([5.0, 7.0])], workers=2))
+            [tensor([0., 1.]), tensor([2., 3.])]
+        """
+        if workers < 1:
+            raise ValueError(f'workers must be at least 1 but got {workers}.')
+        if max_in_flight is None:
+            max_in_flight = 2 * workers
+        pairs = zip(samples, keys if keys is not None else repeat(None))
+        if workers == 1:
+            return (self(x, key=key) for x, key in pairs)
+        return self._map_threaded(pairs, workers, max(max_in_flight, 1))
+
+    def _map_threaded(self, pairs, workers: int, max_in_flight: int) -> Iterator:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            yield from _bounded_map(executor, self, pairs, max_in_flight)
+
+    def optimize(self, inplace: bool = False) -> 'Pipeline':
+        """get an equivalent pipeline with its affine transforms folded and fused.
+
+        consecutive :class:`Normalize` transforms are folded into a single scale and shift and
+        replaced by a :class:`FusedNormalize`, which is fused with a directly preceding
+        :class:`Tensorize`. nested pipelines are flattened. results match this pipeline up to
+        floating point rounding.
+
+        Args:
+            inplace: if ``True`` inputs to the pipeline are assumed to be owned by it, so a
+                leading normalization may modify them in place. this must not be used when
+                a :class:`Normalize` directly follows a :class:`Cached` transform or inputs
+                are otherwise shared. Defaults to False.
+        """
+        optimized = []
+        for transform in _flatten(self):
+            if isinstance(transform, Normalize):
+                previous = optimized[-1] if optimized else None
+                if isinstance(previous, FusedNormalize):
+                    folded = _fold(Normalize(previous.mean, previous.std), transform)
+                    optimized[-1] = FusedNormalize(
+                        folded.mean, folded.std, previous.tensorize, previous.inplace
+                    )
+                elif isinstance(previous, Tensorize):
+                    optimized[-1] = FusedNormalize(transform.mean, transform.std, previous)
+                else:
+                    owned = inplace and not optimized
+                    optimized.append(FusedNormalize(transform.mean, transform.std, inplace=owned))
+            else:
+                optimized.append(transform)
+        return self.__class__(*optimized)
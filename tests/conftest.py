@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+import torch
+from torch.utils.data import Dataset
+
+
+class PipelineDataset(Dataset):
+    """``n`` pairs of ``pipeline`` applied to random float64 features and a binary target."""
+
+    def __init__(self, pipeline, n, n_features=2):
+        self.pipeline = pipeline
+        self.n = n
+        self.n_features = n_features
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, i):
+        x = np.random.default_rng(i).random(self.n_features)
+        return self.pipeline(x), torch.tensor([i % 2], dtype=torch.float32)
+
+
+@pytest.fixture
+def pipeline_dataset():
+    return PipelineDataset
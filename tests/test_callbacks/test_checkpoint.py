@@ -1,12 +1,17 @@
 from typing import Optional
 from dataclasses import dataclass
+from copy import deepcopy
 import os
+import time
 import torch
 from torch import nn
 import pytest
-from hearth.callbacks import Checkpoint, History
-from hearth.events import Improvement, Stagnation, CheckpointSaved
+from hearth.callbacks import Callback, Checkpoint, History
+from hearth.callbacks import checkpoints
+from hearth.events import Improvement, MonitoringEvent, Stagnation, CheckpointSaved
+from hearth.loop import Loop
 from hearth.modules import BaseModule
+from hearth.optimizers import load_optimizer_state
 
 
 @dataclass
@@ -152,3 +157,454 @@ def test_full_save_on_event(tmpdir):
     assert not callback._should_save
     # and the loop should have seen an event...
     assert loop._event_log == [CheckpointSaved(model_dir)]
+
+
+def _improvement():
+    return Improvement(field='loss', stage='val', steps=1, best=0.1, last_best=0.2)
+
+
+def _trained_loop():
+    model = HearthModel()
+    optimizer = torch.optim.AdamW(model.parameters(), lr=0.001)
+    model(torch.rand(4, 3)).sum().backward()
+    optimizer.step()
+    history = History({'epoch': 0, 'lrs': {'group0': 0.001}, 'val': {'loss': 0.2}})
+    return DummyLoop(model=model, history=history, optimizer=optimizer)
+
+
+def test_async_save_on_event(tmpdir):
+    model_dir = str(tmpdir.join('async'))
+    callback = Checkpoint(model_dir=model_dir, asynchronous=True)
+    loop = _trained_loop()
+    callback.on_registration(loop)
+    callback.on_event(loop, _improvement())
+    callback.on_epoch_end(loop)
+    expected_weight = loop.model.linear.weight.detach().clone()
+    expected_opt_state = deepcopy(loop.optimizer.state_dict())
+    # changes after the snapshot are not saved.
+    with torch.no_grad():
+        loop.model.linear.weight.add_(1.0)
+
+    callback.wait(loop)
+    assert loop._event_log == [CheckpointSaved(model_dir)]
+    loaded_model = HearthModel.load(model_dir)
+    assert (loaded_model.linear.weight == expected_weight).all()
+    assert History.load(model_dir) == loop.history
+    loaded_opt_state = torch.load(os.path.join(model_dir, 'optimizer_state.pt'))
+    assert loaded_opt_state['param_groups'] == expected_opt_state['param_groups']
+    for key, state in expected_opt_state['state'].items():
+        for name, value in state.items():
+            assert torch.equal(loaded_opt_state['state'][key][name], value)
+    assert not [name for name in os.listdir(model_dir) if name.endswith('.tmp')]
+
+
+def test_async_reuses_staging_buffers(tmpdir):
+    callback = Checkpoint(model_dir=str(tmpdir), asynchronous=True)
+    loop = _trained_loop()
+    first = callback._snapshot(loop)
+    callback._write(first)
+    second = callback._snapshot(loop)
+    assert first['state']['linear.weight'].data_ptr() == second['state']['linear.weight'].data_ptr()
+    first_exp_avg = first['optimizer']['state'][0]['exp_avg']
+    assert first_exp_avg.data_ptr() == second['optimizer']['state'][0]['exp_avg'].data_ptr()
+
+
+def test_async_fires_on_batch_end_when_done(tmpdir):
+    callback = Checkpoint(model_dir=str(tmpdir), asynchronous=True)
+    loop = _trained_loop()
+    callback.on_event(loop, _improvement())
+    callback.on_epoch_end(loop)
+    callback._pending.result()
+    callback.on_batch_end(loop)
+    assert loop._event_log == [CheckpointSaved(str(tmpdir))]
+    callback.wait(loop)
+    assert loop._event_log == [CheckpointSaved(str(tmpdir))]
+
+
+def test_async_save_waits_for_previous_write(tmpdir):
+    callback = Checkpoint(model_dir=str(tmpdir), asynchronous=True)
+    loop = _trained_loop()
+    for _ in range(2):
+        callback.on_event(loop, _improvement())
+        callback.on_epoch_end(loop)
+    callback.wait(loop)
+    assert loop._event_log == [CheckpointSaved(str(tmpdir))] * 2
+
+
+@dataclass
+class ImproveEveryEpoch(Callback):
+    def __post_init__(self):
+        self.events = []
+
+    def on_stage_end(self, loop):
+        if loop.stage == 'val':
+            loop.fire(_improvement())
+
+    def on_event(self, loop, event):
+        self.events.append(event)
+
+
+def _slow_write(callback, mocker):
+    write = callback._write
+
+    def slow_write(snapshot):
+        time.sleep(0.2)
+        write(snapshot)
+
+    return mocker.patch.object(callback, '_write', side_effect=slow_write)
+
+
+def test_async_loop_waits_for_last_write(tmpdir, mocker):
+    model_dir = str(tmpdir)
+    callback = Checkpoint(model_dir=model_dir, asynchronous=True)
+    _slow_write(callback, mocker)
+    events = ImproveEveryEpoch()
+    model = HearthModel()
+    loop = Loop(
+        model,
+        torch.optim.AdamW(model.parameters()),
+        nn.MSELoss(),
+        callbacks=[events, callback],
+    )
+    batches = [(torch.rand(4, 3), torch.rand(4, 6))]
+    loop(batches, batches, 2)
+    assert callback._pending is None
+    # the writer thread is shut down so reusing the callback starts a new one.
+    assert callback._executor is None
+    assert [e for e in events.events if isinstance(e, CheckpointSaved)] == [
+        CheckpointSaved(model_dir)
+    ] * 2
+    assert History.load(model_dir) == loop.history
+    assert (HearthModel.load(model_dir).linear.weight == model.linear.weight).all()
+
+
+def test_async_writer_errors_are_raised_by_the_loop(tmpdir, mocker):
+    callback = Checkpoint(model_dir=str(tmpdir), asynchronous=True)
+    mocker.patch.object(callback, '_write', side_effect=OSError('disk full'))
+    model = HearthModel()
+    loop = Loop(
+        model,
+        torch.optim.AdamW(model.parameters()),
+        nn.MSELoss(),
+        callbacks=[ImproveEveryEpoch(), callback],
+    )
+    batches = [(torch.rand(4, 3), torch.rand(4, 6))]
+    with pytest.raises(OSError, match='disk full'):
+        loop(batches, batches, 1)
+    assert callback._executor is None
+
+
+def test_async_save_replaces_flat_state(tmpdir):
+    model_dir = str(tmpdir)
+    loop = _trained_loop()
+    loop.model.save(model_dir, format='flat')
+    with torch.no_grad():
+        loop.model.linear.weight.add_(1.0)
+    callback = Checkpoint(model_dir=model_dir, asynchronous=True)
+    callback.on_event(loop, _improvement())
+    callback.on_epoch_end(loop)
+    callback.wait(loop)
+    assert not os.path.exists(os.path.join(model_dir, 'state.tensors'))
+    assert (HearthModel.load(model_dir).linear.weight == loop.model.linear.weight).all()
+
+
+def test_save_without_prepare_model_does_not_copy(tmpdir, mocker):
+    deepcopy_spy = mocker.spy(checkpoints, 'deepcopy')
+    callback = Checkpoint(model_dir=str(tmpdir))
+    model = HearthModel()
+    assert callback._prepared_model(model) is model
+    callback._save_model(model)
+    deepcopy_spy.assert_not_called()
+    assert (HearthModel.load(str(tmpdir)).linear.weight == model.linear.weight).all()
+
+
+def _freeze(model):
+    model.freeze()
+    return model
+
+
+def _double_weight(model):
+    with torch.no_grad():
+        model.linear.weight.mul_(2)
+    return model
+
+
+def _half(model):
+    return model.half()
+
+
+def _double_weight_data(model):
+    model.linear.weight.data.mul_(2)
+    return model
+
+
+def test_prepare_model_gets_a_copy_by_default():
+    calls = []
+    callback = Checkpoint(model_dir='fake', prepare_model=lambda m: calls.append(m) or m)
+    model = HearthModel()
+    prepared = callback._prepared_model(model)
+    assert calls == [prepared]
+    assert prepared.linear.weight.data_ptr() != model.linear.weight.data_ptr()
+
+    callback = Checkpoint(model_dir='fake', prepare_model=_double_weight_data)
+    weight = model.linear.weight.detach().clone()
+    prepared = callback._prepared_model(model)
+    assert torch.equal(prepared.linear.weight, weight * 2)
+    assert torch.equal(model.linear.weight, weight)
+
+
+def test_prepare_model_without_in_place_changes_shares_tensors():
+    callback = Checkpoint(model_dir='fake', prepare_model=_freeze, share_tensors=True)
+    model = HearthModel()
+    prepared = callback._prepared_model(model)
+    assert prepared is not model
+    assert prepared.linear.weight.data_ptr() == model.linear.weight.data_ptr()
+    assert not prepared.linear.weight.requires_grad
+    assert model.linear.weight.requires_grad
+    assert prepared.config() == model.config()
+
+
+def test_prepare_model_copies_only_touched_tensors():
+    callback = Checkpoint(model_dir='fake', prepare_model=_double_weight, share_tensors=True)
+    model = HearthModel()
+    weight = model.linear.weight.detach().clone()
+    prepared = callback._prepared_model(model)
+    assert torch.equal(model.linear.weight, weight)
+    assert torch.equal(prepared.linear.weight, weight * 2)
+    assert prepared.linear.weight.data_ptr() != model.linear.weight.data_ptr()
+    assert prepared.linear.bias.data_ptr() == model.linear.bias.data_ptr()
+
+
+def test_prepare_model_creating_new_tensors(tmpdir):
+    callback = Checkpoint(model_dir=str(tmpdir), prepare_model=_half, share_tensors=True)
+    model = HearthModel()
+    callback._save_model(model)
+    assert model.linear.weight.dtype == torch.float32
+    state = torch.load(os.path.join(str(tmpdir), 'state.pt'))
+    assert state['linear.weight'].dtype == torch.float16
+    assert torch.equal(state['linear.weight'], model.linear.weight.half())
+
+
+def test_prepare_model_needing_values_copies_everything():
+    callback = Checkpoint(
+        model_dir='fake', prepare_model=lambda model: model.to('cpu'), share_tensors=True
+    )
+    model = HearthModel()
+    prepared = callback._prepared_model(model)
+    assert torch.equal(prepared.linear.weight, model.linear.weight)
+    assert prepared.linear.weight.data_ptr() != model.linear.weight.data_ptr()
+
+
+@pytest.mark.parametrize('asynchronous', [False, True])
+def test_incremental_save(tmpdir, asynchronous):
+    model_dir = str(tmpdir)
+    callback = Checkpoint(model_dir=model_dir, incremental=True, asynchronous=asynchronous)
+    loop = _trained_loop()
+    loop.model.freeze()
+    for _ in range(2):
+        callback.on_event(loop, _improvement())
+        callback.on_epoch_end(loop)
+        callback.wait(loop)
+    assert not os.path.exists(os.path.join(model_dir, 'state.pt'))
+    assert os.path.exists(os.path.join(model_dir, 'config.json'))
+    assert callback.store.versions() == [0, 1]
+    assert callback.store.manifest(1)['written'] == []
+    loaded = callback.store.load()
+    model = HearthModel()
+    model.load_state_dict(loaded['state'])
+    assert torch.equal(model.linear.weight, loop.model.linear.weight)
+    assert loaded['optimizer']['param_groups'] == loop.optimizer.state_dict()['param_groups']
+
+
+@pytest.mark.parametrize('asynchronous', [False, True])
+def test_incremental_round_trip_replaces_stale_state(tmpdir, asynchronous):
+    model_dir = str(tmpdir)
+    loop = _trained_loop()
+    # a stale checkpoint from an earlier non incremental run.
+    Checkpoint(model_dir=model_dir).save_checkpoint(loop)
+    with torch.no_grad():
+        loop.model.linear.weight.add_(1.0)
+    loop.model(torch.rand(4, 3)).sum().backward()
+    loop.optimizer.step()
+
+    callback = Checkpoint(model_dir=model_dir, incremental=True, asynchronous=asynchronous)
+    _save_on(callback, loop, _improvement())
+    assert not os.path.exists(os.path.join(model_dir, 'state.pt'))
+    assert not os.path.exists(os.path.join(model_dir, 'optimizer_state.pt'))
+
+    loaded = HearthModel.load(model_dir)
+    assert torch.equal(loaded.linear.weight, loop.model.linear.weight)
+    optimizer = torch.optim.AdamW(loaded.parameters(), lr=0.001)
+    optimizer.load_state_dict(callback.store.load()['optimizer'])
+    expected = loop.optimizer.state_dict()['state'][0]['exp_avg']
+    assert torch.equal(optimizer.state_dict()['state'][0]['exp_avg'], expected)
+
+
+def _save_on(callback, loop, event):
+    callback.on_event(loop, event)
+    callback.on_epoch_end(loop)
+    callback.wait(loop)
+
+
+def _versions(model_dir):
+    return sorted(os.listdir(os.path.join(model_dir, 'checkpoints')))
+
+
+@pytest.mark.parametrize('asynchronous', [False, True])
+def test_keep_top_k(tmpdir, mocker, asynchronous):
+    copy = mocker.spy(checkpoints.shutil, 'copy2')
+    model_dir = str(tmpdir)
+    callback = Checkpoint(model_dir=model_dir, keep_top_k=2, asynchronous=asynchronous)
+    loop = _trained_loop()
+    callback.on_registration(loop)
+    last_best = float('inf')
+    for best in [0.5, 0.4, 0.3, 0.2]:
+        with torch.no_grad():
+            loop.model.linear.weight.fill_(best)
+        _save_on(callback, loop, Improvement('loss', 'val', 1, best=best, last_best=last_best))
+        last_best = best
+
+    assert _versions(model_dir) == ['000002', '000003']
+    assert checkpoints.load_json(os.path.join(model_dir, 'checkpoint.json')) == {
+        'version': 3,
+        'value': 0.2,
+    }
+    loaded = HearthModel.load(model_dir)
+    assert torch.equal(loaded.linear.weight, torch.full_like(loaded.linear.weight, 0.2))
+    kept = HearthModel.load(os.path.join(model_dir, 'checkpoints', '000002'))
+    assert torch.equal(kept.linear.weight, torch.full_like(kept.linear.weight, 0.3))
+    for name in ['state.pt', 'config.json', 'optimizer_state.pt', 'history.json']:
+        linked = os.stat(os.path.join(model_dir, name))
+        assert (
+            linked.st_ino == os.stat(os.path.join(model_dir, 'checkpoints', '000003', name)).st_ino
+        )
+    copy.assert_not_called()
+    assert loop._event_log == [CheckpointSaved(model_dir)] * 4
+
+
+def test_keep_top_k_ranks_by_best_value(tmpdir):
+    model_dir = str(tmpdir)
+    callback = Checkpoint(model_dir=model_dir, keep_top_k=2)
+    loop = _trained_loop()
+    for best in [0.5, 0.9, 0.7, 0.6]:
+        event = Improvement('metric', 'val', 1, best=best, last_best=1.0, improvement_on='gt')
+        _save_on(callback, loop, event)
+    assert _versions(model_dir) == ['000001', '000002']
+    assert checkpoints.load_json(os.path.join(model_dir, 'checkpoint.json'))['version'] == 1
+
+
+def test_keep_top_k_lower_is_better_by_default(tmpdir):
+    model_dir = str(tmpdir)
+    callback = Checkpoint(model_dir=model_dir, keep_top_k=2)
+    loop = _trained_loop()
+    # the direction comes from the event even when best is greater than last_best.
+    for best in [0.5, 0.9, 0.7, 0.6]:
+        _save_on(callback, loop, Improvement('loss', 'val', 1, best=best, last_best=0.0))
+    assert _versions(model_dir) == ['000000', '000003']
+
+
+def test_ranked_puts_missing_values_last():
+    values = {0: None, 1: 0.5, 2: 0.2, 3: None, 4: 0.5}
+    assert checkpoints._ranked(values, lower_is_better=True) == [2, 4, 1, 3, 0]
+    assert checkpoints._ranked(values, lower_is_better=False) == [4, 1, 2, 3, 0]
+
+
+def test_keep_top_k_continues_existing_versions(tmpdir):
+    model_dir = str(tmpdir)
+    loop = _trained_loop()
+    _save_on(Checkpoint(model_dir=model_dir, keep_top_k=2), loop, _improvement())
+    os.makedirs(os.path.join(model_dir, 'checkpoints', '.000001.tmp'))
+    _save_on(Checkpoint(model_dir=model_dir, keep_top_k=2), loop, _improvement())
+    assert _versions(model_dir) == ['000000', '000001']
+
+
+def test_keep_top_k_incremental(tmpdir):
+    callback = Checkpoint(model_dir=str(tmpdir), keep_top_k=2, incremental=True)
+    loop = _trained_loop()
+    for best in [0.3, 0.1, 0.2]:
+        _save_on(callback, loop, Improvement('loss', 'val', 1, best=best, last_best=1.0))
+    assert callback.store.versions() == [1, 2]
+    assert not os.path.exists(os.path.join(str(tmpdir), 'checkpoints'))
+
+
+def test_keep_top_k_needs_best_value():
+    callback = Checkpoint(model_dir='fake', keep_top_k=1, event_types=(MonitoringEvent,))
+    with pytest.raises(TypeError, match='keep_top_k requires events with a best value'):
+        callback.on_event(None, MonitoringEvent('loss', 'val', 1))
+
+
+def test_keep_top_k_must_be_positive():
+    with pytest.raises(ValueError, match='keep_top_k must be at least 1'):
+        Checkpoint(model_dir='fake', keep_top_k=0)
+
+
+@pytest.mark.parametrize('asynchronous', [False, True])
+def test_history_format_jsonl(tmpdir, asynchronous):
+    model_dir = str(tmpdir)
+    callback = Checkpoint(model_dir=model_dir, history_format='jsonl', asynchronous=asynchronous)
+    loop = _trained_loop()
+    path = os.path.join(model_dir, 'history.jsonl')
+    _save_on(callback, loop, _improvement())
+    inode = os.stat(path).st_ino
+    loop.history._history.append(History({'epoch': 1, 'val': {'loss': 0.1}})[0])
+    _save_on(callback, loop, _improvement())
+    assert os.stat(path).st_ino == inode
+    assert not os.path.exists(os.path.join(model_dir, 'history.json'))
+    assert History.load(model_dir) == loop.history
+
+
+@pytest.mark.parametrize('asynchronous', [False, True])
+def test_history_format_jsonl_keep_top_k(tmpdir, mocker, asynchronous):
+    model_dir = str(tmpdir)
+    callback = Checkpoint(
+        model_dir=model_dir,
+        history_format='jsonl',
+        history_fsync=0,
+        keep_top_k=2,
+        asynchronous=asynchronous,
+    )
+    fsync = mocker.spy(os, 'fsync')
+    loop = _trained_loop()
+    path = os.path.join(model_dir, 'history.jsonl')
+    for best in [0.3, 0.2, 0.1]:
+        _save_on(callback, loop, Improvement('loss', 'val', 1, best=best, last_best=1.0))
+        loop.history._history.append(History({'epoch': 1, 'val': {'loss': best}})[0])
+    assert list(loop.history._logs) == [path]
+    assert loop.history._logs[path].rows == len(loop.history) - 1
+    assert fsync.call_count == 3
+    assert not os.path.exists(os.path.join(model_dir, 'checkpoints', '000002', 'history.jsonl'))
+    assert History.load(model_dir)[:] == loop.history[:-1]
+
+
+@pytest.mark.parametrize('asynchronous', [False, True])
+@pytest.mark.parametrize('compression', [None, 'zlib'])
+def test_compact_optimizer_state(tmpdir, asynchronous, compression):
+    model_dir = str(tmpdir)
+    callback = Checkpoint(
+        model_dir=model_dir,
+        asynchronous=asynchronous,
+        optimizer_dtype=torch.bfloat16,
+        optimizer_compression=compression,
+    )
+    loop = _trained_loop()
+    _save_on(callback, loop, _improvement())
+    loaded = load_optimizer_state(os.path.join(model_dir, 'optimizer_state.pt'))
+    exp_avg = loop.optimizer.state_dict()['state'][0]['exp_avg']
+    assert loaded['state'][0]['exp_avg'].dtype == torch.float32
+    assert torch.equal(loaded['state'][0]['exp_avg'], exp_avg.bfloat16().float())
+    loop.optimizer.load_state_dict(loaded)
+
+
+def test_compact_optimizer_state_incremental(tmpdir):
+    callback = Checkpoint(model_dir=str(tmpdir), incremental=True, optimizer_dtype=torch.float16)
+    loop = _trained_loop()
+    _save_on(callback, loop, _improvement())
+    loaded = callback.store.load()['optimizer']
+    assert loaded['state'][0]['exp_avg'].dtype == torch.float16
+    loop.optimizer.load_state_dict(loaded)
+    assert loop.optimizer.state_dict()['state'][0]['exp_avg'].dtype == torch.float32
+
+
+def test_optimizer_compression_not_supported_incremental():
+    with pytest.raises(ValueError, match='optimizer_compression is not supported'):
+        Checkpoint(model_dir='fake', incremental=True, optimizer_compression='zlib')
@@ -1,5 +1,8 @@
 import os
+import json
 import pytest
+import numpy as np
+from collectionish import AttyDict
 from hearth.callbacks import History
 
 
@@ -48,3 +51,170 @@ def test_load_save(history, tmpdir):
     assert isinstance(loaded, History)
     assert len(loaded) == len(history)
     assert loaded == history
+
+
+def _row(epoch):
+    return {'epoch': epoch, 'lrs': {'group0': 0.001}, 'val': {'loss': 1.0 / (epoch + 1)}}
+
+
+def test_load_save_jsonl(history, tmpdir):
+    history.save(tmpdir, format='jsonl')
+    assert os.listdir(str(tmpdir)) == ['history.jsonl']
+    with open(os.path.join(str(tmpdir), 'history.jsonl')) as f:
+        assert [json.loads(line)['epoch'] for line in f] == [0, 1, 2]
+    loaded = History.load(tmpdir)
+    assert isinstance(loaded, History)
+    assert loaded == history
+    assert loaded[0].train.loss == 0.53
+
+
+def test_jsonl_save_only_appends_new_rows(tmpdir):
+    path = os.path.join(str(tmpdir), 'history.jsonl')
+    history = History(_row(0))
+    history.save(tmpdir, format='jsonl')
+    inode = os.stat(path).st_ino
+    history._history.append(AttyDict(_row(1)))
+    history.save(tmpdir, format='jsonl')
+    history.save(tmpdir, format='jsonl')
+    assert os.stat(path).st_ino == inode
+    assert History.load(tmpdir) == History(_row(0), _row(1))
+
+
+def test_jsonl_loaded_history_appends(tmpdir):
+    path = os.path.join(str(tmpdir), 'history.jsonl')
+    History(_row(0)).save(tmpdir, format='jsonl')
+    inode = os.stat(path).st_ino
+    loaded = History.load(tmpdir)
+    loaded._history.append(AttyDict(_row(1)))
+    loaded.save(tmpdir, format='jsonl')
+    assert os.stat(path).st_ino == inode
+    assert History.load(tmpdir) == History(_row(0), _row(1))
+
+
+def test_jsonl_ignores_partly_written_row(tmpdir):
+    path = os.path.join(str(tmpdir), 'history.jsonl')
+    History(_row(0), _row(1)).save(tmpdir, format='jsonl')
+    with open(path, 'a') as f:
+        f.write('{"epoch": 2, "lr')
+    loaded = History.load(tmpdir)
+    assert loaded == History(_row(0), _row(1))
+    # the partial row is dropped when saved again.
+    loaded._history.append(AttyDict(_row(2)))
+    loaded.save(tmpdir, format='jsonl')
+    assert History.load(tmpdir) == History(_row(0), _row(1), _row(2))
+
+
+def test_jsonl_rewrites_when_file_changed(tmpdir):
+    history = History(_row(0), _row(1))
+    history.save(tmpdir, format='jsonl')
+    History(_row(5)).save(tmpdir, format='jsonl')
+    history.save(tmpdir, format='jsonl')
+    assert History.load(tmpdir) == history
+
+
+@pytest.mark.parametrize('fsync, expected', [(None, 0), (0, 3), (3600, 1)])
+def test_jsonl_fsync(tmpdir, mocker, fsync, expected):
+    spy = mocker.spy(os, 'fsync')
+    history = History()
+    for epoch in range(3):
+        history._history.append(AttyDict(_row(epoch)))
+        history.save(tmpdir, format='jsonl', fsync=fsync)
+    assert spy.call_count == expected
+
+
+def test_save_removes_other_format(history, tmpdir):
+    history.save(tmpdir, format='jsonl')
+    history.save(tmpdir)
+    assert os.listdir(str(tmpdir)) == ['history.json']
+    history.save(tmpdir, format='jsonl')
+    assert os.listdir(str(tmpdir)) == ['history.jsonl']
+
+
+def test_save_invalid_format(history, tmpdir):
+    with pytest.raises(ValueError, match='format must be one of'):
+        history.save(tmpdir, format='csv')
+
+
+def test_copy(history, tmpdir):
+    history.save(tmpdir, format='jsonl')
+    copied = history.copy()
+    history._history.append(AttyDict(_row(3)))
+    assert len(copied) == 3
+    assert copied[0] is history[0]
+    copied._history.append(AttyDict(_row(4)))
+    copied.save(tmpdir, format='jsonl')
+    assert [row.epoch for row in History.load(tmpdir)] == [0, 1, 2, 4]
+
+
+def test_columns(history):
+    assert history.columns == [
+        'epoch',
+        'lrs.group0',
+        'train.loss',
+        'train.metric',
+        'val.loss',
+        'val.metric',
+    ]
+
+
+def test_column(history):
+    epochs = history.column('epoch')
+    assert epochs.dtype == np.int64
+    np.testing.assert_array_equal(epochs, [0, 1, 2])
+    np.testing.assert_array_equal(history.column('val.metric'), [0.93, 0.95, 0.96])
+    with pytest.raises(ValueError):
+        epochs[0] = 5
+    with pytest.raises(KeyError):
+        history.column('test.loss')
+
+
+def test_column_updates_with_new_rows(history):
+    history.column('val.loss')
+    for epoch in range(3, 40):
+        history._history.append(AttyDict(_row(epoch)))
+    loss = history.column('val.loss')
+    assert len(loss) == 40
+    assert loss[-1] == 1.0 / 40
+    # rows without train are missing.
+    assert np.isnan(history.column('train.loss')[3:]).all()
+
+
+def test_column_missing_and_mixed_values():
+    history = History(
+        {'epoch': 0, 'val': {'metric': None}},
+        {'epoch': 1, 'val': {'metric': 'n/a'}, 'steps': 10},
+        {'epoch': 2, 'val': {'metric': 0.5}, 'steps': 20},
+    )
+    assert list(history.column('val.metric')) == [None, 'n/a', 0.5]
+    steps = history.column('steps')
+    assert steps.dtype == np.float64
+    np.testing.assert_array_equal(steps, [np.nan, 10, 20])
+
+
+def test_column_promotes_ints_on_missing_values():
+    history = History({'epoch': 0, 'step': 1}, {'epoch': 1, 'step': 2})
+    assert history.column('step').dtype == np.int64
+    history._history.append(AttyDict({'epoch': 2}))
+    history._history.append(AttyDict({'epoch': 3, 'step': 2.5}))
+    np.testing.assert_array_equal(history.column('step'), [1, 2, np.nan, 2.5])
+
+
+@pytest.mark.parametrize('mode, expected', [('min', 2), ('max', 0)])
+def test_argbest(history, mode, expected):
+    assert history.argbest('val.loss', mode=mode) == expected
+
+
+def test_argbest_ignores_missing_values():
+    history = History({'val': {'loss': 0.5}}, {}, {'val': {'loss': 0.7}})
+    assert history.argbest('val.loss', mode='max') == 2
+    with pytest.raises(ValueError, match='no values for other'):
+        History({'other': None}).argbest('other')
+    with pytest.raises(ValueError, match='mode must be one of'):
+        history.argbest('val.loss', mode='lt')
+
+
+def test_rolling_mean():
+    history = History(*[{'x': float(x)} for x in [1, 2, 3, 4]], {}, {'x': 6.0})
+    np.testing.assert_allclose(history.rolling_mean('x', 2), [1, 1.5, 2.5, 3.5, 4, 6])
+    np.testing.assert_allclose(history.rolling_mean('x', 10), [1, 1.5, 2, 2.5, 2.5, 3.2])
+    assert np.isnan(History({'x': None}, {'x': 1.0}).rolling_mean('x', 1)[0])
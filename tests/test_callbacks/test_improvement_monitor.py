@@ -79,9 +79,9 @@ def test_metric_improvement():
     monitor = ImprovementMonitor(field='metric', improvement_on='gt')
     loop = ImprovingMetricLoop(callbacks=[monitor])
     expected_log = [
-        Improvement(field='metric', stage='val', steps=1, best=0.25, last_best=-float('inf')),
-        Improvement(field='metric', stage='val', steps=1, best=0.5, last_best=0.25),
-        Improvement(field='metric', stage='val', steps=1, best=0.75, last_best=0.5),
+        Improvement('metric', 'val', 1, best=0.25, last_best=-float('inf'), improvement_on='gt'),
+        Improvement('metric', 'val', 1, best=0.5, last_best=0.25, improvement_on='gt'),
+        Improvement('metric', 'val', 1, best=0.75, last_best=0.5, improvement_on='gt'),
     ]
 
     loop(3)
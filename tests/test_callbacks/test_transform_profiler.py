@@ -0,0 +1,33 @@
+from torch import nn
+from torch.utils.data import DataLoader
+from hearth.callbacks import TransformProfiler
+from hearth.loop import Loop
+from hearth.optimizers import AdamW
+from hearth.transforms import Pipeline, Tensorize, Normalize
+
+
+def test_profiler_records_stats_per_stage(pipeline_dataset):
+    pipeline = Pipeline(Tensorize(dtype='float32'), Normalize(mean=0.5, std=0.3))
+    train = DataLoader(pipeline_dataset(pipeline, 12), batch_size=4, num_workers=2)
+    val = DataLoader(pipeline_dataset(pipeline, 8), batch_size=4)
+    model = nn.Sequential(nn.Linear(2, 1), nn.Sigmoid())
+    loop = Loop(
+        model=model,
+        optimizer=AdamW(lr=0.001),
+        loss_fn=nn.BCELoss(),
+        callbacks=[TransformProfiler(pipeline)],
+    )
+    assert pipeline.stats is not None
+    loop(train, val, 2)
+
+    for step in loop.history:
+        assert step.train.transforms['tensorize_0']['calls'] == 12
+        assert step.val.transforms['normalize_1']['calls'] == 8
+        assert step.val.transforms['normalize_1']['bytes'] == 8 * 2 * 4
+
+
+def test_profiler_keeps_existing_stats():
+    pipeline = Pipeline(Tensorize()).instrument(max_workers=4)
+    stats = pipeline.stats
+    TransformProfiler(pipeline).on_registration(None)
+    assert pipeline.stats is stats
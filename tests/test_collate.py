@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+import torch
+from torch.utils.data import DataLoader
+from hearth.collate import PadCollate, pad_tensors
+from hearth.containers import TensorDict
+from hearth.datasets import XYDataset
+
+
+def test_pad_tensors_pads_all_dims():
+    out = pad_tensors([torch.ones(2, 3), torch.ones(4, 1)], pad_value=0)
+    assert out.shape == (2, 4, 3)
+    assert out.sum() == 10
+    assert (out[1, :, 0] == 1).all()
+
+
+def test_pad_tensors_same_shape_is_stack():
+    tensors = [torch.rand(3, 2) for _ in range(4)]
+    torch.testing.assert_close(pad_tensors(tensors), torch.stack(tensors))
+
+
+def test_pad_tensors_shared_memory():
+    assert pad_tensors([torch.ones(2), torch.ones(3)], shared_memory=True).is_shared()
+
+
+def test_pad_tensors_rejects_mismatched_dims():
+    with pytest.raises(ValueError, match='same number of dimensions'):
+        pad_tensors([torch.ones(2), torch.ones(2, 2)])
+
+
+def test_collate_numpy_and_numbers():
+    x, y = PadCollate()([(np.ones(2), 1), (np.ones(3), 0)])
+    assert x.tolist() == [[1, 1, -1], [1, 1, 1]]
+    assert y.tolist() == [1, 0]
+
+
+def test_with_dataloader_and_workers():
+    lengths = [3, 7, 1, 5, 2, 6]
+    x = [torch.rand(n, 4) for n in lengths]
+    y = [torch.randint(3, size=(n,)) for n in lengths]
+    dataset = XYDataset(x, y)
+    loader = DataLoader(
+        dataset, batch_size=3, num_workers=1, collate_fn=PadCollate(pad_value=(0.0, -1))
+    )
+    batches = list(loader)
+    assert [b[0].shape for b in batches] == [(3, 7, 4), (3, 6, 4)]
+    xb, yb = batches[0]
+    assert (yb[2, 1:] == -1).all()
+    assert (xb[2, 1:] == 0).all()
+    torch.testing.assert_close(xb[1], x[1])
+
+
+def test_tensordict_fields():
+    batch = [TensorDict(a=torch.ones(n), b=torch.zeros(n, 2)) for n in (1, 3)]
+    out = PadCollate(pad_value={'a': 0, 'b': 5})(batch)
+    assert isinstance(out, TensorDict)
+    assert out.a.tolist() == [[1, 0, 0], [1, 1, 1]]
+    assert out.b.shape == (2, 3, 2)
+    assert (out.b[0, 1:] == 5).all()
+
+
+@pytest.mark.parametrize(
+    'pad_value, match',
+    [
+        ((0, -1, 2), r'unmatched fields: \[2\]'),
+        ({'a': 0}, r'structure of sample\.'),
+        (({'tokens': 0}, [1, 2]), r'structure of sample\[1\]'),
+        (({'tokenz': 0}, -1), r"of sample\[0\], unmatched fields: \['tokens', 'tokenz'\]"),
+    ],
+)
+def test_mismatched_pad_value_names_field(pad_value, match):
+    batch = [(TensorDict(tokens=torch.ones(n)), torch.zeros(n)) for n in (1, 3)]
+    with pytest.raises(ValueError, match=match):
+        PadCollate(pad_value=pad_value)(batch)
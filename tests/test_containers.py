@@ -0,0 +1,45 @@
+import pytest
+import torch
+from torch.utils.data import DataLoader
+from hearth.containers import TensorDict
+from hearth.datasets import XYDataset
+
+
+@pytest.fixture
+def tensordict():
+    return TensorDict(a=torch.rand(4, 3), b=torch.arange(4))
+
+
+def test_to_returns_new_container(tensordict):
+    moved = tensordict.to('cpu')
+    assert isinstance(moved, TensorDict)
+    assert moved is not tensordict
+    assert set(moved) == set(tensordict)
+
+
+@pytest.mark.parametrize('args, kwargs', [((torch.float64,), {}), ((), {'dtype': torch.float64})])
+def test_to_dtype_only_casts_floats(tensordict, args, kwargs):
+    cast = tensordict.to(*args, **kwargs)
+    assert cast.a.dtype == torch.float64
+    assert cast.b.dtype == torch.int64
+    torch.testing.assert_close(cast.a, tensordict.a.double())
+
+
+def test_share_memory_(tensordict):
+    assert tensordict.share_memory_() is tensordict
+    assert all(v.is_shared() for v in tensordict.values())
+
+
+@pytest.mark.skipif(not torch.cuda.is_available(), reason='pinned memory requires cuda')
+def test_pin_memory_in_dataloader():
+    dataset = XYDataset(TensorDict(a=torch.rand(8, 2), b=torch.rand(8, 3)), torch.rand(8))
+    x, _ = next(iter(DataLoader(dataset, batch_size=4, pin_memory=True)))
+    assert isinstance(x, TensorDict)
+    assert all(v.is_pinned() for v in x.values())
+
+
+@pytest.mark.skipif(not torch.cuda.is_available(), reason='requires cuda')
+def test_to_device_non_blocking(tensordict):
+    moved = tensordict.pin_memory().to('cuda', non_blocking=True)
+    assert all(v.is_cuda for v in moved.values())
+    assert all(not v.is_cuda for v in tensordict.values())
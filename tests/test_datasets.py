@@ -0,0 +1,150 @@
+import os
+import pickle
+import pytest
+import torch
+from torch.utils.data import DataLoader
+from hearth.containers import TensorDict
+from hearth.datasets import (
+    XYDataset,
+    MemmapXYDataset,
+    MemmapWriter,
+    WindowedXYDataset,
+    StreamingXYDataset,
+    MEMMAP_HEADER,
+)
+from hearth.transforms import Transform
+
+
+@pytest.mark.parametrize(
+    'x, y',
+    [
+        (torch.rand(11, 3), torch.randint(4, size=(11,))),
+        (TensorDict(a=torch.rand(11, 2, 2), b=torch.arange(11)), torch.rand(11, 1).round()),
+        (torch.rand(11).to(torch.bfloat16), TensorDict(c=torch.rand(11) > 0.5)),
+    ],
+)
+def test_write_and_read(x, y, tmpdir):
+    path = str(tmpdir)
+    dataset = MemmapXYDataset.write(path, x, y, chunk_size=4)
+    assert os.path.exists(os.path.join(path, MEMMAP_HEADER))
+    assert len(dataset) == 11
+    expected = XYDataset(x, y)
+    for idx in (0, 10, slice(2, 7), [9, 1, 4]):
+        for got, exp in zip(dataset[idx], expected[idx]):
+            if isinstance(exp, TensorDict):
+                assert set(got) == set(exp)
+                for k in exp:
+                    assert torch.equal(got[k], exp[k])
+            else:
+                assert torch.equal(got, exp)
+
+
+def test_pickle_only_keeps_path(tmpdir):
+    dataset = MemmapXYDataset.write(str(tmpdir), torch.rand(1000, 10), torch.arange(1000))
+    dumped = pickle.dumps(dataset)
+    assert len(dumped) < 1000
+    loaded = pickle.loads(dumped)
+    assert torch.equal(loaded.x, dataset.x)
+    assert torch.equal(loaded.y, dataset.y)
+
+
+def test_with_dataloader(tmpdir):
+    dataset = MemmapXYDataset.write(str(tmpdir), torch.rand(20, 3), torch.arange(20))
+    batches = list(DataLoader(dataset, batch_size=8))
+    assert [len(y) for _, y in batches] == [8, 8, 4]
+
+
+def test_writer_rejects_mismatched_chunks(tmpdir):
+    with pytest.raises(ValueError, match='must have dtype'):
+        with MemmapWriter(str(tmpdir)) as writer:
+            writer.append(torch.rand(2, 3), torch.arange(2))
+            writer.append(torch.rand(2, 4), torch.arange(2))
+
+
+def test_writer_rejects_mismatched_lengths(tmpdir):
+    writer = MemmapWriter(str(tmpdir))
+    with pytest.raises(ValueError, match='same length'):
+        writer.append(torch.rand(2, 3), torch.arange(3))
+
+
+def test_windowed_dataset_is_a_view():
+    x = torch.rand(10, 2)
+    dataset = WindowedXYDataset(x, torch.arange(10), sequence_length=4)
+    assert len(dataset) == 7
+    window, _ = dataset[3]
+    assert window.data_ptr() == x[3].data_ptr()
+    torch.testing.assert_close(window, x[3:7])
+
+
+def test_windowed_dataset_bad_sequence_length():
+    with pytest.raises(ValueError, match='sequence_length must be between 1 and'):
+        WindowedXYDataset(torch.rand(10, 2), torch.arange(10), sequence_length=11)
+
+
+@pytest.fixture
+def shard_dir(tmpdir):
+    path = str(tmpdir)
+    for i in range(6):
+        x = TensorDict(a=torch.arange(10.0) + 10 * i)
+        MemmapXYDataset.write(os.path.join(path, f'shard{i}'), x, torch.arange(10) + 10 * i)
+    return path
+
+
+@pytest.mark.parametrize('buffer_size', [0, 7, 100])
+def test_streaming_reads_every_example(shard_dir, buffer_size):
+    dataset = StreamingXYDataset(shard_dir, buffer_size=buffer_size, read_size=3)
+    ys = [int(y) for _, y in dataset]
+    assert sorted(ys) == list(range(60))
+    if buffer_size == 0:
+        assert ys == list(range(60))
+
+
+def test_streaming_shards_across_replicas(shard_dir):
+    seen = []
+    for rank in range(3):
+        dataset = StreamingXYDataset(shard_dir, num_replicas=3, rank=rank, batch_size=4, seed=1)
+        for x, y in dataset:
+            assert isinstance(x, TensorDict)
+            assert (x.a == y).all()
+            seen.extend(y.tolist())
+    assert sorted(seen) == list(range(60))
+
+
+def test_streaming_with_workers_and_transform(shard_dir):
+    dataset = StreamingXYDataset(shard_dir, batch_size=5, transform=lambda x: x.a * 2, seed=0)
+    batches = list(DataLoader(dataset, batch_size=None, num_workers=2))
+    assert len(batches) == 12
+    for x, y in batches:
+        assert (x == y * 2).all()
+    assert sorted(torch.cat([y for _, y in batches]).tolist()) == list(range(60))
+
+
+class Doubled(Transform):
+    def __call__(self, x):
+        return x.a * 2
+
+    def batch_call(self, batch):
+        return batch.a * 2
+
+
+@pytest.mark.parametrize('batch_size, calls', [(None, 0), (5, 12)])
+def test_streaming_transform_uses_batch_call(shard_dir, batch_size, calls, mocker):
+    transform = Doubled()
+    batch_call = mocker.spy(transform, 'batch_call')
+    dataset = StreamingXYDataset(shard_dir, batch_size=batch_size, transform=transform)
+    for x, y in dataset:
+        assert (x == y * 2).all()
+    assert batch_call.call_count == calls
+
+
+def test_streaming_seeded_epochs(shard_dir):
+    dataset = StreamingXYDataset(shard_dir, buffer_size=20, seed=0)
+    first = [int(y) for _, y in dataset]
+    assert [int(y) for _, y in dataset] != first
+    dataset.set_epoch(0)
+    assert [int(y) for _, y in dataset] == first
+
+
+def test_streaming_no_shards(tmpdir):
+    with pytest.raises(ValueError, match='no shards found'):
+        StreamingXYDataset(str(tmpdir))
@@ -1,5 +1,7 @@
 import os
-from hearth._file_utils import mkdirs_if_not_exist
+import pytest
+import torch
+from hearth._file_utils import mkdirs_if_not_exist, save_json, load_json, save_torch
 
 
 def test_mkdirs_if_not_exist(tmpdir):
@@ -8,3 +10,18 @@ def test_mkdirs_if_not_exist(tmpdir):
     mkdirs_if_not_exist(path, verbose=1)
     assert os.path.exists(path)
     assert os.path.isdir(path)
+
+
+def test_save_json_is_atomic(tmpdir):
+    path = str(tmpdir.join('obj.json'))
+    save_json({'a': 1}, path)
+    with pytest.raises(TypeError):
+        save_json({'a': object()}, path)
+    assert load_json(path) == {'a': 1}
+    assert os.listdir(str(tmpdir)) == ['obj.json']
+
+
+def test_save_torch(tmpdir):
+    path = str(tmpdir.join('state.pt'))
+    save_torch({'x': torch.arange(3)}, path)
+    assert torch.equal(torch.load(path)['x'], torch.arange(3))
@@ -1,19 +1,24 @@
 from typing import Dict
+import os
 
 import numpy as np
+import pytest
 import torch
 
 from torch import nn
 from torch.utils.data import DataLoader
 from hearth.metrics import BinaryAccuracy
-from hearth.loop import Loop
+from hearth.loop import Loop, _to_device
 
 from hearth.modules import BaseModule
 
 from hearth.losses import MultiHeadLoss
 from hearth.containers import TensorDict
-from hearth.datasets import XYDataset
+from hearth.datasets import XYDataset, MemmapXYDataset, StreamingXYDataset
 from hearth.optimizers import AdamW
+from hearth.callbacks import PrintLogger
+from hearth.samplers import BucketBatchSampler
+from hearth.transforms import Normalize
 
 
 class TwoHeadedModel(BaseModule):
@@ -96,3 +101,94 @@ def test_multioutput(mocker):
     assert isinstance(backward_called_with, torch.Tensor)
     torch.testing.assert_allclose(backward_called_with, expected_loss.weighted_sum)
     assert backward_called_with.grad_fn.name() == expected_loss.weighted_sum.grad_fn.name()
+
+
+def test_loop_with_unknown_length_batches(tmpdir, capsys):
+    x, y = torch.rand(40, 2), torch.rand(40, 1).round()
+    for i in range(4):
+        MemmapXYDataset.write(os.path.join(str(tmpdir), f'shard{i}'), x[i::4], y[i::4])
+    train = DataLoader(StreamingXYDataset(str(tmpdir), batch_size=8, seed=0), batch_size=None)
+    val = (batch for batch in DataLoader(XYDataset(x, y), batch_size=8))
+
+    model = nn.Sequential(nn.Linear(2, 1), nn.Sigmoid())
+    loop = Loop(
+        model=model, optimizer=AdamW(lr=0.001), loss_fn=nn.BCELoss(), callbacks=[PrintLogger()]
+    )
+    loop(train, val, 1)
+    assert loop.n_batches is None
+    assert loop.batches_seen == 5
+    assert loop.epoch == 1
+    # the unknown total is left out of the progress.
+    assert 'batch: 5 loss' in capsys.readouterr().out
+
+
+def test_loop_sets_epoch_on_dataset_and_samplers(tmpdir, mocker):
+    x, y = torch.rand(40, 2), torch.rand(40, 1).round()
+    for i in range(4):
+        MemmapXYDataset.write(os.path.join(str(tmpdir), f'shard{i}'), x[i::4], y[i::4])
+    dataset = StreamingXYDataset(str(tmpdir), batch_size=8, buffer_size=40, seed=0)
+    sampler = BucketBatchSampler(torch.ones(40), batch_size=8, seed=0)
+    train = DataLoader(dataset, batch_size=None, num_workers=1)
+    val = DataLoader(XYDataset(x, y), batch_sampler=sampler)
+    dataset_set_epoch = mocker.spy(dataset, 'set_epoch')
+    sampler_set_epoch = mocker.spy(sampler, 'set_epoch')
+
+    model = nn.Sequential(nn.Linear(2, 1), nn.Sigmoid())
+    loop = Loop(model=model, optimizer=AdamW(lr=0.001), loss_fn=nn.BCELoss())
+    seen = mocker.spy(loop, 'handle_batch')
+    loop(train, val, 2)
+    assert [c.args for c in dataset_set_epoch.call_args_list] == [(0,), (1,)]
+    assert [c.args for c in sampler_set_epoch.call_args_list] == [(0,), (1,)]
+    # dataloader workers iterate copies of the dataset but still reshuffle each epoch.
+    first, second = (
+        torch.cat([c.args[0][0] for c in seen.call_args_list[i:][:5]]) for i in (0, 10)
+    )
+    assert not torch.equal(first, second)
+    assert sorted(first[:, 0].tolist()) == sorted(second[:, 0].tolist())
+
+
+def test_loop_applies_batch_transform_after_device(mocker):
+    x, y = torch.rand(32, 2) * 10, torch.rand(32, 1).round()
+    batches = DataLoader(XYDataset(x, y), batch_size=8)
+
+    model = nn.Sequential(nn.Linear(2, 1), nn.Sigmoid())
+    transform = Normalize(mean=5.0, std=2.0)
+    loop = Loop(
+        model=model,
+        optimizer=AdamW(lr=0.001),
+        loss_fn=nn.BCELoss(),
+        device='cpu',
+        batch_transform=transform,
+    )
+    batch_call = mocker.spy(transform, 'batch_call')
+    forward = mocker.spy(loop, 'forward')
+    loop(batches, batches, 1)
+
+    assert batch_call.call_count == 8
+    torch.testing.assert_allclose(forward.call_args_list[0][0][0], (x[:8] - 5.0) / 2.0)
+
+
+def test_loop_batch_transform_callable():
+    x, y = torch.rand(16, 2), torch.rand(16, 1).round()
+    batches = DataLoader(XYDataset(x, y), batch_size=8)
+    model = nn.Sequential(nn.Linear(2, 1), nn.Sigmoid())
+    loop = Loop(
+        model=model, optimizer=AdamW(lr=0.001), loss_fn=nn.BCELoss(), batch_transform=torch.neg
+    )
+    prepared_x, prepared_y = loop.prepare_batch(next(iter(batches)))
+    torch.testing.assert_allclose(prepared_x, -x[:8])
+    torch.testing.assert_allclose(prepared_y, y[:8])
+
+
+@pytest.mark.parametrize(
+    'device, pinned, non_blocking',
+    [('cuda', True, True), ('cuda:1', True, True), ('cuda', False, False), ('cpu', True, False)],
+)
+def test_to_device_only_copies_asynchronously_from_pinned_memory_to_cuda(
+    mocker, device, pinned, non_blocking
+):
+    tensor = mocker.Mock(spec=torch.Tensor)
+    tensor.is_pinned.return_value = pinned
+    out = _to_device((TensorDict(a=tensor), [tensor]), device)
+    assert isinstance(out[0], TensorDict)
+    assert tensor.to.call_args_list == [mocker.call(device, non_blocking=non_blocking)] * 2
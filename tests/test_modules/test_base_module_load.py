@@ -0,0 +1,196 @@
+import os
+from itertools import chain
+import pytest
+import torch
+from torch import nn
+from hearth.modules import BaseModule
+from hearth.tensorfile import TensorFile
+
+
+class EncoderDecoder(BaseModule):
+    def __init__(self, in_feats: int = 4, hidden: int = 8, out_feats: int = 2):
+        super().__init__()
+        self.encoder = nn.Sequential(nn.Linear(in_feats, hidden), nn.BatchNorm1d(hidden))
+        self.decoder = nn.Linear(hidden, out_feats)
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        return self.decoder(self.encoder(x))
+
+
+@pytest.fixture
+def saved(tmpdir):
+    model = EncoderDecoder()
+    model.save(str(tmpdir))
+    return model, str(tmpdir)
+
+
+def _assert_same_state(a, b):
+    for (name, x), (_, y) in zip(a.state_dict().items(), b.state_dict().items()):
+        assert torch.equal(x, y), name
+
+
+@pytest.mark.parametrize(
+    'kwargs',
+    [
+        {},
+        {'map_location': 'cpu'},
+        {'map_location': torch.device('cpu')},
+        {'mmap': True},
+        {'assign': True},
+        {'mmap': True, 'assign': True, 'map_location': 'cpu'},
+    ],
+)
+def test_load(saved, kwargs):
+    model, model_dir = saved
+    loaded = EncoderDecoder.load(model_dir, **kwargs)
+    _assert_same_state(loaded, model)
+    assert isinstance(loaded.decoder.weight, nn.Parameter)
+
+
+def test_load_assign_adopts_loaded_tensors(saved, mocker):
+    model, model_dir = saved
+    mocker.patch('hearth.modules.base.torch.load', side_effect=lambda *_, **__: model.state_dict())
+    loaded = EncoderDecoder.load(model_dir, assign=True)
+    assert loaded.decoder.weight.data_ptr() == model.decoder.weight.data_ptr()
+    copied = EncoderDecoder.load(model_dir)
+    assert copied.decoder.weight.data_ptr() != model.decoder.weight.data_ptr()
+
+
+def test_load_passes_mmap_and_map_location(saved, mocker):
+    _, model_dir = saved
+    spy = mocker.spy(torch, 'load')
+    EncoderDecoder.load(model_dir, map_location='cpu', mmap=True)
+    assert spy.call_args.kwargs == {'map_location': 'cpu', 'mmap': True}
+
+
+@pytest.mark.parametrize('prefix', ['encoder', ['encoder']])
+def test_load_prefix(saved, prefix):
+    model, model_dir = saved
+    torch.manual_seed(1)
+    loaded = EncoderDecoder.load(model_dir, prefix=prefix)
+    _assert_same_state(loaded.encoder, model.encoder)
+    assert not torch.equal(loaded.decoder.weight, model.decoder.weight)
+
+
+def test_load_multiple_prefixes(saved):
+    model, model_dir = saved
+    loaded = EncoderDecoder.load(model_dir, prefix=['encoder.0', 'decoder'])
+    assert torch.equal(loaded.encoder[0].weight, model.encoder[0].weight)
+    assert torch.equal(loaded.decoder.weight, model.decoder.weight)
+
+
+def test_load_prefix_is_strict_for_submodule(tmpdir):
+    model = EncoderDecoder()
+    model.decoder = nn.Linear(8, 3)
+    model.save(str(tmpdir))
+    with pytest.raises(RuntimeError, match='size mismatch'):
+        EncoderDecoder.load(str(tmpdir))
+    loaded = EncoderDecoder.load(str(tmpdir), prefix='encoder')
+    _assert_same_state(loaded.encoder, model.encoder)
+
+
+class WithNonPersistentBuffer(BaseModule):
+    def __init__(self, feats: int = 4):
+        super().__init__()
+        self.linear = nn.Linear(feats, feats)
+        self.register_buffer('scale', torch.full((feats,), 2.0), persistent=False)
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        return self.linear(x) * self.scale
+
+
+def test_from_config_on_meta_device():
+    model = EncoderDecoder.from_config({'in_feats': 3, 'hidden': 5}, device='meta')
+    assert model.decoder.weight.is_meta
+    assert model.encoder[0].in_features == 3
+
+
+@pytest.mark.parametrize('kwargs', [{}, {'mmap': True}, {'map_location': 'cpu'}])
+def test_load_without_init(saved, mocker, kwargs):
+    model, model_dir = saved
+    initialized = []
+
+    def record(*args, **kw):
+        initialized.extend(t for t in chain(args, kw.values()) if isinstance(t, torch.Tensor))
+
+    mocker.patch.object(nn.init, 'kaiming_uniform_', side_effect=record)
+    loaded = EncoderDecoder.load(model_dir, init=False, **kwargs)
+    _assert_same_state(loaded, model)
+    assert initialized and all(t.is_meta for t in initialized)
+    assert not any(t.is_meta for t in chain(loaded.parameters(), loaded.buffers()))
+    assert isinstance(loaded.decoder.weight, nn.Parameter)
+    assert loaded.decoder.weight.requires_grad
+
+
+def test_load_without_init_falls_back_for_non_persistent_buffers(tmpdir):
+    model = WithNonPersistentBuffer()
+    model.save(str(tmpdir))
+    loaded = WithNonPersistentBuffer.load(str(tmpdir), init=False)
+    _assert_same_state(loaded, model)
+    assert torch.equal(loaded.scale, torch.full((4,), 2.0))
+
+
+def test_load_without_init_with_prefix(saved):
+    model, model_dir = saved
+    loaded = EncoderDecoder.load(model_dir, init=False, prefix='encoder')
+    _assert_same_state(loaded.encoder, model.encoder)
+    assert not loaded.decoder.weight.is_meta
+
+
+@pytest.fixture
+def saved_flat(tmpdir):
+    model = EncoderDecoder()
+    model.save(str(tmpdir), format='flat')
+    return model, str(tmpdir)
+
+
+@pytest.mark.parametrize(
+    'kwargs',
+    [
+        {},
+        {'map_location': 'cpu'},
+        {'map_location': {'cpu': 'cpu'}},
+        {'mmap': True},
+        {'mmap': True, 'assign': True},
+        {'workers': 3},
+        {'init': False, 'mmap': True},
+    ],
+)
+def test_load_flat(saved_flat, kwargs):
+    model, model_dir = saved_flat
+    assert sorted(os.listdir(model_dir)) == ['config.json', 'state.tensors']
+    loaded = EncoderDecoder.load(model_dir, **kwargs)
+    _assert_same_state(loaded, model)
+    assert isinstance(loaded.decoder.weight, nn.Parameter)
+
+
+def test_load_flat_keeps_state_dict_metadata(saved_flat, mocker):
+    _, model_dir = saved_flat
+    load_state_dict = mocker.spy(EncoderDecoder, 'load_state_dict')
+    EncoderDecoder.load(model_dir)
+    state_dict = load_state_dict.call_args.args[1]
+    assert state_dict._metadata == EncoderDecoder().state_dict()._metadata
+
+
+def test_load_flat_prefix_only_reads_prefix(saved_flat, mocker):
+    model, model_dir = saved_flat
+    read = mocker.spy(TensorFile, 'get')
+    loaded = EncoderDecoder.load(model_dir, prefix='decoder')
+    assert sorted(call.args[1] for call in read.call_args_list) == [
+        'decoder.bias',
+        'decoder.weight',
+    ]
+    _assert_same_state(loaded.decoder, model.decoder)
+
+
+def test_save_replaces_other_format(saved_flat):
+    model, model_dir = saved_flat
+    model.save(model_dir)
+    assert sorted(os.listdir(model_dir)) == ['config.json', 'state.pt']
+    model.save(model_dir, format='flat')
+    assert sorted(os.listdir(model_dir)) == ['config.json', 'state.tensors']
+
+
+def test_save_invalid_format(tmpdir):
+    with pytest.raises(ValueError, match='format must be one of'):
+        EncoderDecoder().save(str(tmpdir), format='pickle')
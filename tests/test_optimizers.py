@@ -0,0 +1,118 @@
+import io
+import os
+import zlib
+import pytest
+import torch
+from torch import nn
+from hearth.optimizers import (
+    _CompressingWriter,
+    _ZlibReader,
+    compact_optimizer_state,
+    load_optimizer_state,
+    save_optimizer_state,
+)
+
+
+@pytest.fixture
+def optimizer():
+    torch.manual_seed(0)
+    model = nn.Sequential(nn.Linear(32, 64), nn.Linear(64, 8))
+    optimizer = torch.optim.AdamW(model.parameters(), lr=0.001)
+    for _ in range(3):
+        model(torch.rand(16, 32)).sum().backward()
+        optimizer.step()
+    return optimizer
+
+
+def test_compact_optimizer_state(optimizer):
+    state_dict = optimizer.state_dict()
+    compact = compact_optimizer_state(state_dict, torch.bfloat16)
+    assert compact['param_groups'] == state_dict['param_groups']
+    assert compact['state'][0]['exp_avg'].dtype == torch.bfloat16
+    assert compact['state'][0]['exp_avg_sq'].dtype == torch.bfloat16
+    assert compact['state'][0]['step'] is state_dict['state'][0]['step']
+    assert compact['original_dtypes'][0] == {'exp_avg': 'float32', 'exp_avg_sq': 'float32'}
+    # the original is not modified.
+    assert state_dict['state'][0]['exp_avg'].dtype == torch.float32
+    with pytest.raises(ValueError, match='dtype must be a floating point dtype'):
+        compact_optimizer_state(state_dict, torch.int8)
+
+
+@pytest.mark.parametrize('compression', [None, 'zlib', 'lzma'])
+@pytest.mark.parametrize('dtype', [None, torch.bfloat16, torch.float16])
+def test_save_load_optimizer_state(tmpdir, optimizer, compression, dtype):
+    path = str(tmpdir.join('optimizer_state.pt'))
+    state_dict = optimizer.state_dict()
+    save_optimizer_state(state_dict, path, dtype=dtype, compression=compression)
+    assert os.listdir(str(tmpdir)) == ['optimizer_state.pt']
+    loaded = load_optimizer_state(path)
+    assert 'original_dtypes' not in loaded
+    assert loaded['param_groups'] == state_dict['param_groups']
+    for key, param_state in state_dict['state'].items():
+        for name, value in param_state.items():
+            assert loaded['state'][key][name].dtype == value.dtype
+            expected = value if dtype is None or not value.dim() else value.to(dtype).float()
+            assert torch.equal(loaded['state'][key][name], expected), name
+    optimizer.load_state_dict(loaded)
+
+
+def test_compact_and_compressed_files_are_smaller(tmpdir):
+    model = nn.Linear(256, 256)
+    optimizer = torch.optim.AdamW(model.parameters())
+    model(torch.rand(4, 256)).sum().backward()
+    optimizer.step()
+    sizes = {}
+    for name, kwargs in [
+        ('full', {}),
+        ('compact', {'dtype': torch.bfloat16}),
+        ('compressed', {'dtype': torch.bfloat16, 'compression': 'lzma'}),
+    ]:
+        path = str(tmpdir.join(name))
+        save_optimizer_state(optimizer.state_dict(), path, **kwargs)
+        sizes[name] = os.path.getsize(path)
+    assert sizes['compact'] < 0.6 * sizes['full']
+    assert sizes['compressed'] < sizes['compact']
+
+
+def test_load_optimizer_state_saved_with_torch(tmpdir, optimizer):
+    path = str(tmpdir.join('optimizer_state.pt'))
+    torch.save(optimizer.state_dict(), path)
+    loaded = load_optimizer_state(path)
+    assert torch.equal(loaded['state'][0]['exp_avg'], optimizer.state_dict()['state'][0]['exp_avg'])
+
+
+def test_zlib_reader_bounds_each_read():
+    data = bytes(1 << 20)
+    reader = _ZlibReader(io.BytesIO(zlib.compress(data)), chunk_size=16)
+    buffer = bytearray(1000)
+    sizes = list(iter(lambda: reader.readinto(buffer), 0))
+    assert max(sizes) == 1000
+    assert sum(sizes) == len(data)
+
+
+@pytest.mark.parametrize('compression', ['zlib', 'lzma'])
+def test_load_truncated_optimizer_state(tmpdir, optimizer, compression):
+    path = str(tmpdir.join('optimizer_state.pt'))
+    save_optimizer_state(optimizer.state_dict(), path, compression=compression)
+    with open(path, 'r+b') as f:
+        f.truncate(os.path.getsize(path) // 2)
+    with pytest.raises(EOFError):
+        load_optimizer_state(path)
+
+
+def test_save_optimizer_state_invalid_compression(tmpdir, optimizer):
+    with pytest.raises(ValueError, match='compression must be one of'):
+        save_optimizer_state(optimizer.state_dict(), str(tmpdir.join('x')), compression='gzip')
+
+
+class _FailingFile:
+    def write(self, data):
+        raise OSError('disk full')
+
+
+def test_compressing_writer_raises_worker_errors():
+    writer = _CompressingWriter(_FailingFile(), zlib.compressobj(), max_chunks=1)
+    for _ in range(5):
+        writer.write(b'x' * 10)
+    with pytest.raises(OSError, match='disk full'):
+        writer.close()
@@ -1,5 +1,6 @@
 import torch
 from torch.utils.data import TensorDataset, DataLoader
+from hearth.containers import TensorDict
 from hearth.samplers import BatchSubsequenceSampler
 
 
@@ -22,3 +23,49 @@ def test_with_built_dataloader():
     assert last_batch_x.shape == (3, 4, 3)  # (batch, seq_len, feats)
     assert last_batch_y.shape == (3, 4)  # (batch, seq_len)
     assert (last_batch_y.reshape(3, 4, 1) == last_batch_x).all().item()
+
+
+def test_starts_match_list_output():
+    torch.manual_seed(0)
+    expected = list(BatchSubsequenceSampler(range(113), batch_size=5, sequence_length=4))
+    torch.manual_seed(0)
+    sampler = BatchSubsequenceSampler(range(113), batch_size=5, sequence_length=4, output='starts')
+    starts = list(sampler)
+    assert len(starts) == len(sampler)
+    assert [s.tolist() for s in starts] == [[seq[0] for seq in batch] for batch in expected]
+
+
+def test_with_built_windowed_dataloader():
+    x = TensorDict(a=torch.ones(113, 3).cumsum(dim=0) - 1, b=torch.arange(113))
+    y = torch.arange(113)
+    batches = BatchSubsequenceSampler.build_windowed_dataloader(
+        x, y, batch_size=5, sequence_length=4
+    )
+    assert isinstance(batches.sampler, BatchSubsequenceSampler)
+    all_batches = list(batches)
+    assert len(batches) == len(all_batches)
+
+    for x_batch, y_batch in all_batches[:-1]:
+        assert x_batch.a.shape == (5, 4, 3)  # (batch, seq_len, feats)
+        assert y_batch.shape == (5, 4)  # (batch, seq_len)
+        assert (y_batch.unsqueeze(-1) == x_batch.a).all().item()
+        assert (y_batch == x_batch.b).all().item()
+        assert (y_batch.diff(dim=1) == 1).all().item()
+
+    last_x, last_y = all_batches[-1]
+    assert last_x.a.shape == (3, 4, 3)
+    assert last_y.shape == (3, 4)
+
+
+def test_uneven_sharding_pads_to_equal_counts():
+    # 113 // 4 = 28 subsequences in 6 batches of 5 which do not split evenly over 4 replicas
+    samplers = [
+        BatchSubsequenceSampler(range(113), batch_size=5, sequence_length=4, num_replicas=4, rank=r)
+        for r in range(4)
+    ]
+    shards = [list(sampler) for sampler in samplers]
+    assert [len(shard) for shard in shards] == [2, 2, 2, 2] == [len(s) for s in samplers]
+    expected = list(BatchSubsequenceSampler(range(113), batch_size=5, sequence_length=4, seed=0))
+    assert {str(b) for shard in shards for b in shard} == {str(b) for b in expected}
+    for shard in shards:
+        assert all(len(b) == 5 for b in shard[:-1])
@@ -0,0 +1,86 @@
+from itertools import chain
+import pytest
+import torch
+from torch.utils.data import DataLoader, TensorDataset
+from hearth.samplers import BucketBatchSampler
+
+
+@pytest.fixture
+def lengths():
+    return torch.randint(1, 50, size=(500,), generator=torch.Generator().manual_seed(0))
+
+
+def test_batch_size_covers_dataset(lengths):
+    sampler = BucketBatchSampler(lengths, batch_size=16, seed=0)
+    batches = list(sampler)
+    assert len(batches) == len(sampler) == 32
+    assert all(len(batch) <= 16 for batch in batches)
+    assert sorted(chain.from_iterable(batches)) == list(range(500))
+
+
+@pytest.mark.parametrize('batch_size', [None, 8])
+def test_max_tokens(lengths, batch_size):
+    sampler = BucketBatchSampler(lengths, max_tokens=200, batch_size=batch_size, seed=1)
+    expected_len = len(sampler)
+    batches = list(sampler)
+    assert len(batches) == expected_len
+    assert sorted(chain.from_iterable(batches)) == list(range(500))
+    for batch in batches:
+        assert len(batch) * lengths[batch].max() <= 200
+        if batch_size is not None:
+            assert len(batch) <= batch_size
+
+
+def test_bucketing_reduces_padding(lengths):
+    sampler = BucketBatchSampler(lengths, batch_size=16, seed=0)
+    padded = sum(len(b) * lengths[b].max().item() for b in sampler)
+    random_padded = sum(len(b) * b.max().item() for b in lengths[torch.randperm(500)].split(16))
+    assert padded < random_padded
+    assert padded >= lengths.sum()
+
+
+def test_pool_size_bounds_sort(lengths):
+    sampler = BucketBatchSampler(lengths, batch_size=10, pool_size=100, seed=0)
+    assert sorted(chain.from_iterable(sampler)) == list(range(500))
+
+
+def test_sharding(lengths):
+    shards = [
+        list(BucketBatchSampler(lengths, max_tokens=300, num_replicas=2, rank=r, seed=4))
+        for r in range(2)
+    ]
+    assert len(shards[0]) == len(shards[1])
+    assert set(chain.from_iterable(chain.from_iterable(shards))) == set(range(500))
+
+
+def test_with_dataloader(lengths):
+    dataset = TensorDataset(lengths)
+    loader = DataLoader(dataset, batch_sampler=BucketBatchSampler(lengths, batch_size=32, seed=0))
+    assert len(list(loader)) == len(loader)
+
+
+def test_requires_batch_size_or_max_tokens():
+    with pytest.raises(ValueError, match='at least one of batch_size or max_tokens'):
+        BucketBatchSampler([1, 2, 3])
+
+
+@pytest.mark.parametrize('num_replicas', [2, 3])
+def test_sharded_len_matches_every_rank(lengths, num_replicas):
+    samplers = [
+        BucketBatchSampler(lengths, max_tokens=300, num_replicas=num_replicas, rank=r)
+        for r in range(num_replicas)
+    ]
+    counts = [len(list(sampler)) for sampler in samplers]
+    assert counts == [len(sampler) for sampler in samplers]
+    assert len(set(counts)) == 1
+
+
+@pytest.mark.parametrize('seed', [None, 0])
+@pytest.mark.parametrize('max_tokens', [None, 300])
+def test_len_has_no_side_effects(lengths, max_tokens, seed):
+    sampler = BucketBatchSampler(
+        lengths, batch_size=10, max_tokens=max_tokens, pool_size=64, seed=seed
+    )
+    n = len(sampler)
+    assert sampler.epoch == 0
+    assert len(sampler) == n == len(list(sampler))
@@ -1,3 +1,4 @@
+import torch
 from hearth.samplers import SubsequenceSampler
 from itertools import chain
 import pytest
@@ -25,3 +26,79 @@ def test_subsequence_sampler():
 )
 def test_len(sampler, expected):
     assert len(sampler) == expected
+
+
+@pytest.mark.parametrize('drop_shortest', [True, False])
+@pytest.mark.parametrize('output', ['tensor', 'range'])
+def test_output_matches_list_output(output, drop_shortest):
+    torch.manual_seed(0)
+    expected = list(SubsequenceSampler(range(100), batch_size=12, drop_shortest=drop_shortest))
+    torch.manual_seed(0)
+    sampler = SubsequenceSampler(
+        range(100), batch_size=12, drop_shortest=drop_shortest, output=output
+    )
+    batches = list(sampler)
+    assert all(isinstance(b, torch.Tensor if output == 'tensor' else range) for b in batches)
+    assert [list(map(int, b)) for b in batches] == expected
+
+
+def test_bad_output():
+    with pytest.raises(ValueError, match='output must be one of'):
+        SubsequenceSampler(range(10), batch_size=3, output='numpy')
+
+
+@pytest.mark.parametrize('drop_shortest', [True, False])
+@pytest.mark.parametrize('num_replicas', [2, 3])
+def test_sharded_replicas_partition_batches(num_replicas, drop_shortest):
+    samplers = [
+        SubsequenceSampler(
+            range(100),
+            batch_size=12,
+            drop_shortest=drop_shortest,
+            num_replicas=num_replicas,
+            rank=rank,
+            seed=0,
+        )
+        for rank in range(num_replicas)
+    ]
+    shards = [list(sampler) for sampler in samplers]
+    assert [len(shard) for shard in shards] == [len(sampler) for sampler in samplers]
+    assert len({len(shard) for shard in shards}) == 1
+    all_batches = list(chain.from_iterable(shards))
+    expected_total = len(SubsequenceSampler(range(100), batch_size=12, drop_shortest=drop_shortest))
+    assert len({tuple(b) for b in all_batches}) == expected_total
+    for shard in shards:
+        # short batch is only ever last
+        assert all(len(b) == 12 for b in shard[:-1])
+
+
+def test_seeded_epochs_are_deterministic():
+    sampler = SubsequenceSampler(range(100), batch_size=12, seed=3)
+    first, second = list(sampler), list(sampler)
+    assert first != second
+    sampler.set_epoch(0)
+    assert list(sampler) == first
+    assert list(sampler) == second
+
+
+def test_sharding_defaults_to_a_shared_seed():
+    shards = [
+        list(SubsequenceSampler(range(100), batch_size=12, num_replicas=2, rank=rank))
+        for rank in range(2)
+    ]
+    assert set(chain.from_iterable(chain.from_iterable(shards))) == set(range(100))
+
+
+def test_uneven_sharding_pads_to_equal_counts():
+    samplers = [
+        SubsequenceSampler(range(9), batch_size=4, num_replicas=2, rank=rank) for rank in range(2)
+    ]
+    shards = [list(sampler) for sampler in samplers]
+    assert [len(shard) for shard in shards] == [2, 2] == [len(s) for s in samplers]
+    # the 3 batches are all seen and one of them is repeated to pad the second replica
+    assert {tuple(b) for b in chain.from_iterable(shards)} == {(0, 1, 2, 3), (4, 5, 6, 7), (8,)}
+
+
+def test_bad_rank():
+    with pytest.raises(ValueError, match='rank must be in'):
+        SubsequenceSampler(range(100), batch_size=12, num_replicas=2, rank=2)
@@ -0,0 +1,131 @@
+import os
+from collections import OrderedDict
+import pytest
+import torch
+from torch import nn
+from hearth.store import CheckpointStore
+
+
+def _objects(path):
+    return sorted(
+        name for _, _, names in os.walk(os.path.join(path, 'objects')) for name in names
+    )
+
+
+def test_round_trip_state_dict(tmpdir):
+    model = nn.Sequential(nn.Linear(3, 4), nn.BatchNorm1d(4))
+    state = model.state_dict()
+    store = CheckpointStore(str(tmpdir))
+    store.save({'state': state})
+    loaded = store.load()['state']
+    assert isinstance(loaded, OrderedDict)
+    assert list(loaded) == list(state)
+    assert loaded._metadata == state._metadata
+    for k, v in state.items():
+        assert loaded[k].dtype == v.dtype
+        assert torch.equal(loaded[k], v)
+    model.load_state_dict(loaded)
+
+
+def test_round_trip_optimizer_state(tmpdir):
+    model = nn.Linear(3, 2)
+    optimizer = torch.optim.AdamW(model.parameters(), lr=0.001)
+    model(torch.rand(5, 3)).sum().backward()
+    optimizer.step()
+    store = CheckpointStore(str(tmpdir))
+    store.save({'optimizer': optimizer.state_dict()})
+    loaded = store.load()['optimizer']
+    assert loaded['param_groups'] == optimizer.state_dict()['param_groups']
+    assert isinstance(loaded['param_groups'][0]['betas'], tuple)
+    for key, state in optimizer.state_dict()['state'].items():
+        for name, value in state.items():
+            assert torch.equal(loaded['state'][key][name], value)
+    optimizer.load_state_dict(loaded)
+
+
+def test_only_changed_tensors_written(tmpdir):
+    model = nn.Sequential(nn.Linear(3, 4), nn.Linear(4, 2))
+    store = CheckpointStore(str(tmpdir))
+    store.save({'state': model.state_dict()})
+    assert len(_objects(str(tmpdir))) == 4
+    before = model[1].weight.detach().clone()
+    with torch.no_grad():
+        model[1].weight.add_(1.0)
+    store.save({'state': model.state_dict()})
+    assert store.manifest()['written'] == ['state/1.weight']
+    assert len(_objects(str(tmpdir))) == 5
+    assert torch.equal(store.load(0)['state']['1.weight'], before)
+    assert torch.equal(store.load(1)['state']['1.weight'], model[1].weight)
+
+
+def test_unchanged_tensors_are_not_hashed(tmpdir, mocker):
+    weights = {'frozen': torch.rand(10), 'head': torch.rand(3)}
+    store = CheckpointStore(str(tmpdir))
+    store.save({'state': weights})
+    hash_spy = mocker.spy(CheckpointStore, '_put')
+    blake = mocker.patch('hearth.store.hashlib.blake2b', wraps=__import__('hashlib').blake2b)
+    weights['head'].mul_(2)
+    store.save({'state': weights})
+    assert hash_spy.call_count == 2
+    assert blake.call_count == 1
+
+
+def test_without_version_tracking_detects_data_changes(tmpdir):
+    weights = {'w': torch.zeros(3)}
+    store = CheckpointStore(str(tmpdir), track_versions=False)
+    store.save({'state': weights})
+    weights['w'].data.fill_(1.0)
+    store.save({'state': weights})
+    assert store.manifest()['written'] == ['state/w']
+    assert torch.equal(store.load()['state']['w'], torch.ones(3))
+
+
+def test_identical_tensors_share_objects(tmpdir):
+    store = CheckpointStore(str(tmpdir))
+    store.save({'a': torch.ones(4), 'b': torch.ones(4)})
+    assert len(_objects(str(tmpdir))) == 1
+
+
+def test_remove_deletes_unreferenced_objects(tmpdir):
+    store = CheckpointStore(str(tmpdir))
+    weights = {'frozen': torch.zeros(3), 'head': torch.ones(3)}
+    store.save({'state': weights})
+    weights['head'].mul_(2)
+    store.save({'state': weights})
+    assert len(_objects(str(tmpdir))) == 3
+    store.remove(0)
+    assert store.versions() == [1]
+    assert len(_objects(str(tmpdir))) == 2
+    assert torch.equal(store.load()['state']['head'], torch.full((3,), 2.0))
+    # the removed head can be written again.
+    weights['head'].div_(2)
+    store.save({'state': weights})
+    assert torch.equal(store.load()['state']['head'], torch.ones(3))
+
+
+def test_versions_persist(tmpdir):
+    CheckpointStore(str(tmpdir)).save({'x': torch.arange(3)}, note='hi')
+    store = CheckpointStore(str(tmpdir))
+    assert store.versions() == [0]
+    assert store.manifest(0)['meta'] == {'note': 'hi'}
+    assert store.save({'x': torch.arange(3)}) == 1
+
+
+def test_load_empty_store(tmpdir):
+    with pytest.raises(FileNotFoundError, match='no versions saved in'):
+        CheckpointStore(str(tmpdir)).load()
+
+
+def test_bad_type(tmpdir):
+    with pytest.raises(TypeError, match="CheckpointStore can not store objects of type"):
+        CheckpointStore(str(tmpdir)).save({'x': object()})
+
+
+def test_truncated_object_raises(tmpdir):
+    store = CheckpointStore(str(tmpdir))
+    store.save({'w': torch.ones(3)})
+    (name,) = _objects(str(tmpdir))
+    with open(os.path.join(str(tmpdir), 'objects', name[:2], name), 'r+b') as f:
+        f.truncate(4)
+    with pytest.raises(EOFError, match='truncated'):
+        store.load()
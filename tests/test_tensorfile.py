@@ -0,0 +1,82 @@
+import pytest
+import torch
+from hearth.tensorfile import TensorFile, save_tensors
+
+TENSORS = {
+    'float': torch.rand(3, 5),
+    'half': torch.rand(7).half(),
+    'bfloat': torch.rand(2, 3).bfloat16(),
+    'long': torch.arange(5),
+    'bool': torch.tensor([True, False, True]),
+    'scalar': torch.tensor(3.0),
+    'empty': torch.zeros(0, 4),
+    'transposed': torch.rand(4, 3).t(),
+}
+
+
+@pytest.fixture
+def path(tmpdir):
+    path = str(tmpdir.join('tensors'))
+    save_tensors(TENSORS, path, metadata={'epoch': 3})
+    return path
+
+
+@pytest.mark.parametrize('mmap', [False, True])
+def test_round_trip(path, mmap):
+    tensors = TensorFile(path)
+    assert list(tensors) == list(TENSORS)
+    assert tensors.metadata == {'epoch': 3}
+    for name, expected in TENSORS.items():
+        loaded = tensors.get(name, mmap=mmap)
+        assert loaded.dtype == expected.dtype
+        assert loaded.shape == expected.shape
+        assert torch.equal(loaded, expected), name
+
+
+def test_tensors_are_aligned(path):
+    tensors = TensorFile(path)
+    for name in tensors:
+        assert (tensors._data_start + tensors.info(name)['offset']) % 64 == 0
+
+
+def test_mmap_tensors_are_views_of_one_mapping(path):
+    tensors = TensorFile(path)
+    loaded = tensors.load(mmap=True)
+    storage = loaded['float'].untyped_storage().data_ptr()
+    assert loaded['long'].untyped_storage().data_ptr() == storage
+
+
+def test_mmap_tensors_can_be_modified_without_changing_file(path):
+    loaded = TensorFile(path).get('float', mmap=True)
+    loaded.zero_()
+    assert torch.equal(TensorFile(path)['float'], TENSORS['float'])
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_load_subset(path, workers):
+    loaded = TensorFile(path).load(['long', 'half'], workers=workers)
+    assert list(loaded) == ['long', 'half']
+    assert torch.equal(loaded['long'], TENSORS['long'])
+    assert torch.equal(loaded['half'], TENSORS['half'])
+
+
+def test_only_reads_requested_tensors(path, mocker):
+    tensors = TensorFile(path)
+    read = mocker.spy(tensors, 'get')
+    tensors.load(['scalar'])
+    assert [call.args[0] for call in read.call_args_list] == ['scalar']
+
+
+def test_not_a_tensor_file(tmpdir):
+    path = str(tmpdir.join('state.pt'))
+    torch.save({'x': torch.ones(1)}, path)
+    with pytest.raises(ValueError, match='is not a TensorFile'):
+        TensorFile(path)
+
+
+def test_truncated_file_raises(path):
+    tensors = TensorFile(path)
+    with open(path, 'r+b') as f:
+        f.truncate(tensors._data_start + tensors.info('half')['offset'] + 2)
+    with pytest.raises(EOFError, match='truncated'):
+        tensors['half']
@@ -0,0 +1,64 @@
+from hearth.transforms import Transform, Tensorize, Normalize, Cached, Pipeline
+import torch
+import numpy as np
+
+
+class AddIndexOfMax(Transform):
+    def __call__(self, x):
+        return x + x.argmax()
+
+
+def test_default_batch_call_applies_per_sample():
+    batch = torch.tensor([[1.0, 3.0], [2.0, 0.0]])
+    out = AddIndexOfMax().batch_call(batch)
+    torch.testing.assert_allclose(out, torch.tensor([[2.0, 4.0], [2.0, 0.0]]))
+
+
+def test_normalize_batch_call_matches_per_sample():
+    transform = Normalize(mean=torch.tensor([1.0, 2.0, 3.0]), std=torch.tensor([0.5, 1.0, 2.0]))
+    batch = torch.rand(6, 4, 3)
+    expected = torch.stack([transform(x) for x in batch])
+    torch.testing.assert_allclose(transform.batch_call(batch), expected)
+
+
+def test_normalize_batch_call_keeps_float_dtype():
+    transform = Normalize(mean=np.array([1.0, 2.0]), std=np.array([2.0, 4.0]))
+    out = transform.batch_call(torch.ones(3, 2, dtype=torch.float16))
+    assert out.dtype == torch.float16
+
+
+def test_tensorize_batch_call_stacks_samples():
+    out = Tensorize(dtype='float32').batch_call([np.ones(3), np.zeros(3)])
+    assert out.shape == (2, 3)
+    assert out.dtype == torch.float32
+
+
+def test_pipeline_dispatches_batch_call(mocker):
+    normalize = Normalize(mean=1.0, std=2.0)
+    pipeline = Pipeline(Tensorize(dtype='float32'), normalize)
+    spy = mocker.spy(normalize, 'batch_call')
+    batch = np.arange(12, dtype='float64').reshape(4, 3)
+    out = pipeline.batch_call(batch)
+    spy.assert_called_once()
+    expected = torch.stack([pipeline(x) for x in batch])
+    torch.testing.assert_allclose(out, expected)
+
+
+def test_cached_batch_call_is_not_cached():
+    transform = Cached(Normalize(mean=1.0, std=2.0))
+    out = transform.batch_call(torch.ones(2, 3))
+    torch.testing.assert_allclose(out, torch.zeros(2, 3))
+    assert len(transform._memory) == 0
+
+
+def test_tensorize_stack_allocates_once_on_device(mocker):
+    empty = mocker.spy(torch, 'empty')
+    to = mocker.spy(torch.Tensor, 'to')
+    samples = [np.arange(3, dtype='float64') + i for i in range(4)]
+    out = Tensorize(dtype='float16', device='meta').batch_call(samples)
+    assert empty.call_count == 1
+    assert empty.call_args.kwargs == {'dtype': torch.float16, 'device': 'meta'}
+    to.assert_not_called()
+    assert out.shape == (4, 3) and out.device.type == 'meta'
+    values = Tensorize(dtype='float16').batch_call(samples)
+    torch.testing.assert_close(values, torch.tensor(np.stack(samples), dtype=torch.float16))
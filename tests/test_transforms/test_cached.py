@@ -0,0 +1,127 @@
+import os
+import pickle
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, Dataset
+from hearth.containers import TensorDict
+from hearth.transforms import Cached, Pipeline, Transform, Tensorize, Normalize
+
+
+class Counting(Transform):
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, x):
+        self.calls += 1
+        return torch.as_tensor(x, dtype=torch.float32) * 2
+
+
+class ToTensorDict(Transform):
+    def __call__(self, x):
+        return TensorDict(a=x, b=(x > 2).long())
+
+
+def test_memory_cache_hits():
+    counting = Counting()
+    transform = Cached(counting)
+    for _ in range(3):
+        for i in range(4):
+            assert transform([i, i], key=i).tolist() == [2 * i, 2 * i]
+    assert counting.calls == 4
+
+
+def test_memory_cache_is_bounded_lru():
+    counting = Counting()
+    # each output is 2 float32s = 8 bytes
+    transform = Cached(counting, max_bytes=16)
+    transform([0, 0], key=0)
+    transform([1, 1], key=1)
+    transform([0, 0], key=0)  # hit, now 1 is least recently used
+    transform([2, 2], key=2)  # evicts 1
+    assert counting.calls == 3
+    transform([0, 0], key=0)
+    assert counting.calls == 3
+    transform([1, 1], key=1)
+    assert counting.calls == 4
+
+
+def test_disk_cache_persists(tmpdir):
+    path = str(tmpdir)
+    pipeline = Pipeline(Counting(), ToTensorDict(), Normalize(0.0, 2.0))
+    cached = pipeline.cache(2, max_bytes=0, cache_dir=path)
+    expected = [cached(torch.arange(5) + i, key=i) for i in range(3)]
+    assert pipeline[0].calls == 3
+
+    # a new pipeline over the same dir reads from disk without calling the transforms
+    reloaded = Pipeline(Counting(), ToTensorDict(), Normalize(0.0, 2.0)).cache(2, cache_dir=path)
+    for i in range(3):
+        out = reloaded(None, key=i)
+        for k in ('a', 'b'):
+            torch.testing.assert_close(out[k], expected[i][k])
+    assert reloaded[0].transform[0].calls == 0
+
+
+def test_pickle_drops_cache_contents(tmpdir):
+    transform = Cached(Tensorize(), cache_dir=str(tmpdir))
+    transform(list(range(1000)), key=0)
+    loaded = pickle.loads(pickle.dumps(transform))
+    assert len(loaded._memory) == 0
+    assert loaded([0], key=0).tolist() == list(range(1000))
+
+
+def test_disk_keys_are_typed(tmpdir):
+    path = str(tmpdir)
+    cached = Cached(Tensorize(), max_bytes=0, cache_dir=path)
+    assert cached([1], key=0).tolist() == [1]
+    assert cached([2], key='0').tolist() == [2]
+    reloaded = Cached(Tensorize(), max_bytes=0, cache_dir=path)
+    assert reloaded(None, key=0).tolist() == [1]
+    assert reloaded(None, key=np.int64(0)).tolist() == [1]
+    assert reloaded(None, key='0').tolist() == [2]
+
+
+def test_disk_cache_invalidated_when_transform_changes(tmpdir):
+    path = str(tmpdir)
+    Pipeline(Tensorize(), Normalize(0.0, 2.0)).cache(1, cache_dir=path)([4.0], key=0)
+    same = Pipeline(Tensorize(), Normalize(0.0, 2.0)).cache(1, max_bytes=0, cache_dir=path)
+    assert same(None, key=0).tolist() == [2.0]
+    changed = Pipeline(Tensorize(), Normalize(0.0, 4.0)).cache(1, max_bytes=0, cache_dir=path)
+    assert changed([4.0], key=0).tolist() == [1.0]
+
+
+class LoggedCalls(Transform):
+    """records each key it is called with in a file so calls in workers can be counted."""
+
+    keyed = True
+
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, x, key=None):
+        with open(self.path, 'a') as f:
+            f.write(f'{key}\n')
+        return torch.full((2,), float(x))
+
+
+class CachedDataset(Dataset):
+    def __init__(self, transform):
+        self.transform = transform
+
+    def __len__(self):
+        return 8
+
+    def __getitem__(self, i):
+        return self.transform(i, key=i)
+
+
+def test_disk_cache_is_shared_by_workers_across_epochs(tmpdir):
+    log_path = str(tmpdir.join('calls.log'))
+    cache_dir = str(tmpdir.mkdir('cache'))
+    dataset = CachedDataset(Cached(LoggedCalls(log_path), cache_dir=cache_dir))
+    loader = DataLoader(dataset, batch_size=2, num_workers=2)
+    for _ in range(3):
+        assert torch.cat(list(loader))[:, 0].tolist() == list(range(8))
+    with open(log_path) as f:
+        assert sorted(map(int, f)) == list(range(8))
+    # workers of later epochs find the entries and write nothing.
+    assert len([name for name in os.listdir(cache_dir) if name.endswith('.idx')]) == 2
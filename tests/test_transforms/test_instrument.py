@@ -0,0 +1,64 @@
+from hearth.transforms import Tensorize, Normalize, Pipeline, TransformStats
+from torch.utils.data import DataLoader
+import pickle
+import torch
+import numpy as np
+import pytest
+
+
+def test_uninstrumented_pipeline_has_no_stats():
+    assert Pipeline(Tensorize()).stats is None
+
+
+def test_instrument_records_calls_and_bytes():
+    pipeline = Pipeline(Tensorize(dtype='float32'), Normalize(mean=1.0, std=2.0)).instrument()
+    for _ in range(3):
+        pipeline(np.ones(8))
+    summary = pipeline.stats.summary()
+    assert list(summary) == ['tensorize_0', 'normalize_1']
+    for stats in summary.values():
+        assert stats['calls'] == 3
+        assert stats['bytes'] == 3 * 8 * 4
+        assert stats['seconds'] > 0
+
+
+def test_instrument_records_batch_call():
+    pipeline = Pipeline(Tensorize(dtype='float32'), Normalize(mean=1.0, std=2.0)).instrument()
+    pipeline.batch_call(np.ones((5, 2)))
+    assert pipeline.stats.summary()['normalize_1']['calls'] == 1
+    assert pipeline.stats.summary()['normalize_1']['bytes'] == 5 * 2 * 4
+
+
+def test_instrumented_output_unchanged():
+    pipeline = Pipeline(Tensorize(dtype='float32'), Normalize(mean=1.0, std=2.0))
+    expected = pipeline(np.arange(4.0))
+    torch.testing.assert_allclose(pipeline.instrument()(np.arange(4.0)), expected)
+
+
+def test_reset():
+    pipeline = Pipeline(Tensorize()).instrument()
+    pipeline([1, 2])
+    pipeline.stats.reset()
+    assert pipeline.stats.summary()['tensorize_0'] == {'calls': 0, 'seconds': 0, 'bytes': 0}
+
+
+@pytest.mark.parametrize('num_workers', [0, 2])
+def test_stats_aggregate_across_workers(pipeline_dataset, num_workers):
+    pipeline = Pipeline(Tensorize(dtype='float32'), Normalize(mean=1.0, std=2.0)).instrument()
+    loader = DataLoader(
+        pipeline_dataset(pipeline, 10, n_features=4), batch_size=2, num_workers=num_workers
+    )
+    for _ in loader:
+        pass
+    summary = pipeline.stats.summary()
+    assert summary['tensorize_0']['calls'] == 10
+    assert summary['normalize_1']['bytes'] == 10 * 4 * 4
+
+
+def test_stats_pickle():
+    stats = TransformStats(['a', 'b'], max_workers=2)
+    stats.record(1, 0.5, 10)
+    loaded = pickle.loads(pickle.dumps(stats))
+    loaded.record(1, 0.5, 10)
+    assert loaded.summary()['b'] == {'calls': 2, 'seconds': 1.0, 'bytes': 20}
+    assert repr(loaded) == "TransformStats(names=['a', 'b'], max_workers=2)"
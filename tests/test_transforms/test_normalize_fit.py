@@ -0,0 +1,86 @@
+from hearth.transforms import Normalize
+from hearth.datasets import XYDataset
+from torch.utils.data import DataLoader
+import torch
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def images():
+    g = torch.Generator().manual_seed(0)
+    return torch.randn(50, 6, 5, 3, generator=g) * torch.tensor([1.0, 5.0, 0.1]) + 100.0
+
+
+@pytest.mark.parametrize('unbiased', [True, False])
+def test_fit_matches_full_statistics(images, unbiased):
+    transform = Normalize.fit(images.split(7), dims=(0, 1, 2), unbiased=unbiased)
+    torch.testing.assert_allclose(transform.mean, images.mean(dim=(0, 1, 2)))
+    torch.testing.assert_allclose(
+        transform.std, images.std(dim=(0, 1, 2), unbiased=unbiased), rtol=1e-5, atol=1e-5
+    )
+
+
+def test_fit_all_dims_gives_floats(images):
+    transform = Normalize.fit(images.split(7))
+    assert isinstance(transform.mean, float)
+    assert isinstance(transform.std, float)
+    assert transform.mean == pytest.approx(images.double().mean().item())
+    assert transform.std == pytest.approx(images.double().std().item())
+
+
+def test_fit_is_numerically_stable():
+    # large offset with small variance loses all precision with naive sum of squares.
+    x = 1e8 + torch.arange(10000, dtype=torch.float64).remainder(2)[:, None]
+    transform = Normalize.fit(x.split(100))
+    assert transform.std == pytest.approx(x.std().item())
+
+
+def test_fit_dataset_and_dataloader(images):
+    y = torch.zeros(len(images))
+    from_dataset = Normalize.fit(XYDataset(images, y), dims=(0, 1, 2), batch_size=8)
+    from_loader = Normalize.fit(DataLoader(XYDataset(images, y), batch_size=16), dims=(0, 1, 2))
+    torch.testing.assert_allclose(from_dataset.mean, from_loader.mean)
+    torch.testing.assert_allclose(from_dataset.std, from_loader.std)
+
+
+def test_fit_numpy_batches():
+    x = np.random.rand(40, 3)
+    transform = Normalize.fit(np.array_split(x, 6), dims=(0,))
+    torch.testing.assert_allclose(transform.mean, torch.as_tensor(x.mean(0), dtype=torch.float32))
+
+
+@pytest.mark.parametrize('processes', [False, True])
+def test_fit_parallel_matches_serial(images, processes):
+    serial = Normalize.fit(images.split(5), dims=(0, 1, 2))
+    parallel = Normalize.fit(images.split(5), dims=(0, 1, 2), workers=3, processes=processes)
+    torch.testing.assert_allclose(parallel.mean, serial.mean)
+    torch.testing.assert_allclose(parallel.std, serial.std)
+
+
+def test_fit_result_normalizes(images):
+    transform = Normalize.fit(iter(images.split(10)), dims=(0, 1, 2))
+    y = transform(images)
+    torch.testing.assert_allclose(y.mean(dim=(0, 1, 2)), torch.zeros(3), atol=1e-4, rtol=0)
+    torch.testing.assert_allclose(y.std(dim=(0, 1, 2)), torch.ones(3), atol=1e-4, rtol=0)
+
+
+def test_fit_empty_data():
+    with pytest.raises(ValueError, match='can not fit statistics to empty data.'):
+        Normalize.fit([])
+
+
+@pytest.mark.parametrize('dims', [(1,), (1, 2), ()])
+def test_fit_dims_without_batch_dimension(images, dims):
+    with pytest.raises(ValueError, match='dims must include the batch dimension 0'):
+        Normalize.fit(images.split(7), dims=dims)
+
+
+@pytest.mark.parametrize('as_array', [False, True])
+def test_fit_whole_tensor_or_array(as_array):
+    x = torch.rand(1000, 3, dtype=torch.float64) * torch.tensor([1.0, 10.0, 100.0])
+    data = x.numpy() if as_array else x
+    transform = Normalize.fit(data, dims=(0,), batch_size=64)
+    assert transform.mean.shape == (3,)
+    torch.testing.assert_close(transform.mean, x.mean(0).float())
+    torch.testing.assert_close(transform.std, x.std(0).float())
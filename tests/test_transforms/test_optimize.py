@@ -0,0 +1,108 @@
+from hearth.transforms import Tensorize, Normalize, Cached, Pipeline, FusedNormalize
+import torch
+import numpy as np
+import pytest
+
+
+def _channel_normalize(seed):
+    g = torch.Generator().manual_seed(seed)
+    return Normalize(mean=torch.rand(3, generator=g), std=torch.rand(3, generator=g) + 0.5)
+
+
+@pytest.mark.parametrize(
+    'pipeline',
+    [
+        Pipeline(Tensorize(dtype='float32'), Normalize(mean=1.0, std=2.0)),
+        Pipeline(Tensorize(dtype='float32'), Normalize(1.0, 2.0), Normalize(-0.5, 0.25)),
+        Pipeline(Tensorize(dtype='float32'), _channel_normalize(0), _channel_normalize(1)),
+        Pipeline(Tensorize(dtype='float32'), Pipeline(_channel_normalize(0), Normalize(3.0, 1.5))),
+        Pipeline(Normalize(mean=np.array([1.0, 2.0, 3.0]), std=np.array([1.0, 0.5, 2.0]))),
+    ],
+)
+def test_optimize_is_equivalent(pipeline):
+    x = np.random.rand(4, 3) * 10
+    expected = pipeline(torch.as_tensor(x, dtype=torch.float32))
+    optimized = pipeline.optimize()
+    out = optimized(torch.as_tensor(x, dtype=torch.float32))
+    torch.testing.assert_allclose(out, expected)
+    torch.testing.assert_allclose(optimized.batch_call(x), pipeline.batch_call(x))
+
+
+def test_optimize_folds_into_single_fused_transform():
+    pipeline = Pipeline(
+        Tensorize(dtype='float32'), Normalize(1.0, 2.0), Normalize(-0.5, 0.25), Normalize(2, 4)
+    )
+    optimized = pipeline.optimize()
+    assert len(optimized) == 1
+    fused = optimized[0]
+    assert isinstance(fused, FusedNormalize)
+    assert fused.tensorize is pipeline[0]
+    assert fused.mean == 1.0 + -0.5 * 2.0 + 2 * 2.0 * 0.25
+    assert fused.std == 2.0 * 0.25 * 4
+
+
+def test_optimize_does_not_fuse_across_other_transforms():
+    cached = Cached(Tensorize(dtype='float32'))
+    optimized = Pipeline(cached, Normalize(1.0, 2.0)).optimize()
+    assert len(optimized) == 2
+    assert optimized[0] is cached
+    assert not optimized[1].inplace
+    x = torch.ones(3)
+    assert optimized(x, key=0) is not cached(x, key=0)
+    torch.testing.assert_allclose(cached(x, key=0), x)
+
+
+def test_fused_with_tensorize_normalizes_in_place():
+    fused = Pipeline(Tensorize(dtype='float32'), Normalize(1.0, 2.0)).optimize()[0]
+    x = torch.ones(3)
+    out = fused(x)
+    torch.testing.assert_allclose(out, torch.zeros(3))
+    torch.testing.assert_allclose(x, torch.ones(3))
+
+
+def test_optimize_inplace_modifies_owned_input():
+    optimized = Pipeline(Normalize(1.0, 2.0)).optimize(inplace=True)
+    x = torch.ones(3)
+    out = optimized(x)
+    assert out is x
+    torch.testing.assert_allclose(x, torch.zeros(3))
+
+
+def test_optimize_without_inplace_keeps_input():
+    optimized = Pipeline(Normalize(1.0, 2.0)).optimize()
+    x = torch.ones(3)
+    optimized(x)
+    torch.testing.assert_allclose(x, torch.ones(3))
+
+
+def test_fused_normalize_integer_input_is_not_in_place():
+    fused = FusedNormalize(mean=1, std=2, tensorize=Tensorize())
+    torch.testing.assert_allclose(fused([1, 3, 5]), torch.tensor([0.0, 1.0, 2.0]))
+
+
+def test_optimized_repr():
+    optimized = Pipeline(Normalize(1.0, 2.0), Normalize(0.0, 2.0)).optimize()
+    assert repr(optimized) == 'Pipeline(FusedNormalize(mean=1.0, std=4.0, inplace=False))'
+
+
+@pytest.mark.parametrize('inplace', [True, False])
+@pytest.mark.parametrize(
+    'transforms',
+    [
+        [Normalize(mean=np.array([1.0, 2.0, 3.0]), std=np.array([1.0, 0.5, 2.0]))],
+        [Tensorize(dtype='float32'), Normalize(np.array([1.0, 2.0, 3.0]), np.array([2.0] * 3))],
+        [Tensorize(dtype='float32'), Normalize(1.0, 2.0), Normalize(np.zeros(3), np.ones(3))],
+    ],
+)
+def test_optimize_with_float64_stats_keeps_dtype(transforms, inplace):
+    pipeline = Pipeline(*transforms)
+    optimized = pipeline.optimize(inplace=inplace)
+    x = np.random.rand(4, 3) * 10
+    expected = pipeline(torch.as_tensor(x, dtype=torch.float32))
+    out = optimized(torch.as_tensor(x, dtype=torch.float32))
+    assert out.dtype == expected.dtype == torch.float64
+    torch.testing.assert_close(out, expected)
+    batch = torch.as_tensor(x, dtype=torch.float32)
+    expected, out = pipeline.batch_call(batch.clone()), optimized.batch_call(batch.clone())
+    assert out.dtype == expected.dtype == torch.float32
+    torch.testing.assert_close(out, expected)
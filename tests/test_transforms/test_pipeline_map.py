@@ -0,0 +1,68 @@
+from hearth.transforms import Transform, Tensorize, Normalize, Pipeline
+import threading
+import time
+import torch
+import numpy as np
+import pytest
+
+
+class SlowIdentity(Transform):
+    def __init__(self):
+        self.threads = set()
+
+    def __call__(self, x):
+        self.threads.add(threading.get_ident())
+        # sleep longer for earlier samples so they finish out of order.
+        time.sleep(0.01 * (x % 3))
+        return x
+
+
+@pytest.mark.parametrize('workers', [1, 2, 4])
+def test_map_matches_serial(workers):
+    pipeline = Pipeline(Tensorize(dtype='float32'), Normalize(mean=1.0, std=2.0))
+    samples = [np.random.rand(5) for _ in range(20)]
+    out = list(pipeline.map(samples, workers=workers))
+    assert len(out) == 20
+    for sample, result in zip(samples, out):
+        torch.testing.assert_allclose(result, pipeline(sample))
+
+
+def test_map_preserves_order_with_threads():
+    slow = SlowIdentity()
+    out = list(Pipeline(slow).map(iter(range(12)), workers=3))
+    assert out == list(range(12))
+    assert len(slow.threads) > 1
+
+
+def test_map_bounds_in_flight_samples():
+    consumed = []
+
+    def samples():
+        for i in range(100):
+            consumed.append(i)
+            yield i
+
+    results = Pipeline(SlowIdentity()).map(samples(), workers=2, max_in_flight=3)
+    assert next(results) == 0
+    assert len(consumed) <= 4
+    results.close()
+
+
+def test_map_passes_keys():
+    pipeline = Pipeline(Tensorize(dtype='float32')).cache(1)
+    list(pipeline.map([[1.0], [2.0]], workers=2, keys=['a', 'b']))
+    cached = pipeline[0]
+    assert len(cached._memory) == 2
+    torch.testing.assert_allclose(cached._memory.get('b'), torch.tensor([2.0]))
+
+
+def test_map_is_lazy_when_serial():
+    pipeline = Pipeline(SlowIdentity())
+    results = pipeline.map(iter(range(3)))
+    assert not pipeline[0].threads
+    assert list(results) == [0, 1, 2]
+
+
+def test_map_bad_workers():
+    with pytest.raises(ValueError, match='workers must be at least 1 but got 0.'):
+        Pipeline().map([], workers=0)
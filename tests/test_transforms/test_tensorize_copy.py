@@ -0,0 +1,79 @@
+from hearth.transforms import Tensorize
+import torch
+import numpy as np
+import pytest
+
+
+def test_copy_false_shares_numpy_memory():
+    x = np.arange(6, dtype='float32')
+    out = Tensorize(dtype='float32', copy=False)(x)
+    assert out.data_ptr() == x.__array_interface__['data'][0]
+
+
+def test_copy_false_shares_tensor_memory():
+    x = torch.arange(6)
+    out = Tensorize(copy=False)(x)
+    assert out.data_ptr() == x.data_ptr()
+
+
+def test_copy_false_casts_when_dtype_differs():
+    x = np.arange(6, dtype='int64')
+    out = Tensorize(dtype='float32', copy=False)(x)
+    assert out.dtype == torch.float32
+    torch.testing.assert_allclose(out, torch.arange(6, dtype=torch.float32))
+
+
+@pytest.mark.parametrize('make', [bytearray, lambda b: memoryview(bytearray(b))])
+def test_copy_false_buffer_protocol(make):
+    buffer = make(bytes([1, 2, 3]))
+    out = Tensorize(copy=False)(buffer)
+    assert out.dtype == torch.uint8
+    assert out.tolist() == [1, 2, 3]
+    buffer[0] = 7
+    assert out[0] == 7
+
+
+def test_copy_false_falls_back_for_lists():
+    out = Tensorize(dtype='float32', copy=False)([1, 2, 3])
+    assert out.tolist() == [1.0, 2.0, 3.0]
+
+
+def test_copy_true_copies_tensors():
+    x = torch.arange(6)
+    out = Tensorize()(x)
+    assert out.data_ptr() != x.data_ptr()
+    assert torch.equal(out, x)
+
+
+@pytest.mark.parametrize('dtype', [None, 'float32'])
+@pytest.mark.parametrize('wrap', [list, tuple])
+def test_stacks_equal_shaped_arrays(dtype, wrap):
+    arrays = wrap(np.full((2, 3), i, dtype='float64') for i in range(4))
+    out = Tensorize(dtype=dtype)(arrays)
+    assert out.shape == (4, 2, 3)
+    assert out.dtype == (torch.float64 if dtype is None else torch.float32)
+    for i in range(4):
+        assert (out[i] == i).all()
+
+
+def test_stacks_mixed_tensors_and_arrays():
+    out = Tensorize()([torch.ones(2, dtype=torch.float64), np.zeros(2)])
+    torch.testing.assert_allclose(out, torch.tensor([[1.0, 1.0], [0.0, 0.0]], dtype=torch.float64))
+
+
+def test_ragged_arrays_are_not_stacked():
+    with pytest.raises((ValueError, TypeError)):
+        Tensorize()([np.ones(2), np.ones(3)])
+
+
+def test_repr():
+    assert repr(Tensorize(copy=False)) == 'Tensorize(dtype=None, device=None, copy=False)'
+
+
+@pytest.mark.parametrize('copy', [True, False])
+def test_keeps_tensors_on_their_device_by_default(copy):
+    transform = Tensorize(dtype='float16', copy=copy)
+    assert transform(torch.ones(3, device='meta')).device.type == 'meta'
+    assert transform.batch_call([torch.ones(3, device='meta')] * 2).device.type == 'meta'
+    assert transform([1, 2, 3]).device.type == 'cpu'
+    assert Tensorize(device='meta', copy=copy)([1, 2, 3]).device.type == 'meta'